@@ -4,17 +4,14 @@
 
 import os
 import glob
+import time
+import json
 import pickle
+import sqlite3
 import logging
 import statistics
 import traceback
 import numpy as np
-import seaborn as sns
-import scipy.stats as stats
-from scipy.stats import skew
-import matplotlib.pyplot as plt
-from scipy.stats import f_oneway
-from scipy.stats import mannwhitneyu
 from Enums import Directories, ProgramMetrics, MainProgramParameters, RunCI
     
 class FileOperations:
@@ -23,9 +20,11 @@ class FileOperations:
     
     def savePickleFile(self, directory, filename, data):
         self.createDirectoryIfNotExisting(directory)
-        with open(os.path.join(directory, filename), 'wb') as handle:
+        temporaryFilename = os.path.join(directory, filename + '.' + str(os.getpid()) + '.tmp') #written fully and then renamed, so a concurrent reader never sees a partial file
+        with open(temporaryFilename, 'wb') as handle:
             pickle.dump(data, handle, protocol = pickle.HIGHEST_PROTOCOL)
-            print('Saved ',directory, filename)
+        os.replace(temporaryFilename, os.path.join(directory, filename))
+        print('Saved ',directory, filename)
         
     def loadPickleFile(self, directory, filename):
         data = None #data will be loaded in exactly the same format it was stored in
@@ -55,17 +54,71 @@ class FileOperations:
     def getUniqueNameForFinishingTime(self, numGens, nameOfCI, terrainName, trialNumber, numImaginaryRobots):
         return str(numGens) + 'Gen_' + nameOfCI +  '_' + terrainName + str(trialNumber) + '_' + str(numImaginaryRobots) + self.dir.PICKLE_EXTN    
     
+    def getUniqueNameForTrace(self, nameOfCI, terrainName, trialNumber):#runs without a trial number get a timestamp, so they don't overwrite each other
+        return nameOfCI + '_' + terrainName + '_tr' + (time.strftime('%Y%m%d_%H%M%S') if trialNumber == None else str(trialNumber)) + '.json'
+    
     def loadAllPickleFilesFromDirectory(self, directory):
         return glob.glob(directory+'*'+self.dir.PICKLE_EXTN)
 
+class RunMetricsStore:#one append-only SQLite table of finishing results, instead of a pickle per run. Safe to append to from several processes
+    COLUMNS = [(ProgramMetrics.numGens, 'INTEGER'), (ProgramMetrics.runWhichCI, 'TEXT'), (ProgramMetrics.runWhichTerrain, 'TEXT'),
+               (ProgramMetrics.trialNumber, 'INTEGER'), (ProgramMetrics.numImaginaryRobots, 'INTEGER'), (ProgramMetrics.timeToCrossFinishLine, 'REAL'),
+               (ProgramMetrics.simulatedTimeToCrossFinishLine, 'REAL'), (ProgramMetrics.simulatedRealRobotTime, 'REAL'), (ProgramMetrics.physicsFrames, 'INTEGER'),
+               (ProgramMetrics.realGenerations, 'INTEGER'), (ProgramMetrics.imaginaryGenerations, 'INTEGER')] #typed columns. Other metrics go into otherMetrics as JSON
+    CONFIGURATION = [ProgramMetrics.numGens, ProgramMetrics.runWhichCI, ProgramMetrics.runWhichTerrain, ProgramMetrics.trialNumber, ProgramMetrics.numImaginaryRobots] #what getUniqueNameForFinishingTime named the pickles by
+
+    def __init__(self, directory=Directories.programMetricsFolder, filename=Directories.runMetricsDatabase):
+        self.fileOps = FileOperations()
+        self.fileOps.createDirectoryIfNotExisting(directory)
+        self.filename = os.path.join(directory, filename)
+        self.columnNames = [name for name, _ in RunMetricsStore.COLUMNS]
+        with self.connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL') #readers don't block the writer, and appends from other processes wait on the lock instead of failing
+            connection.execute('CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY AUTOINCREMENT, ' + ', '.join([name + ' ' + sqlType for name, sqlType in RunMetricsStore.COLUMNS]) + 
+                               ', otherMetrics TEXT, sourceFile TEXT UNIQUE, savedAt REAL)') #sourceFile is set for imported pickles, so importing twice adds nothing
+        
+    def connect(self):
+        return sqlite3.connect(self.filename, timeout=60) #seconds to wait for another process's append to finish
+
+    def append(self, metrics):#metrics is a dict in the format saveFinishingTime builds
+        with self.connect() as connection:#commits on leaving the block
+            self.insert(connection, metrics, None, time.time())
+            
+    def insert(self, connection, metrics, sourceFile, savedAt):
+        otherMetrics = {name: value for name, value in metrics.items() if name not in self.columnNames}
+        values = [metrics.get(name) for name in self.columnNames] + [json.dumps(otherMetrics, default=str), sourceFile, savedAt]
+        connection.execute('INSERT OR IGNORE INTO runs (' + ', '.join(self.columnNames) + ', otherMetrics, sourceFile, savedAt) VALUES (' + ', '.join(['?'] * len(values)) + ')', values)
+
+    def load(self, latestOnly=True):#list of dicts in the format of the pickles. latestOnly keeps the last saved run of each configuration, as overwriting the pickle did
+        query = 'SELECT ' + ', '.join(self.columnNames) + ', otherMetrics FROM runs'
+        if latestOnly: query += ' WHERE id IN (SELECT id FROM (SELECT id, MAX(savedAt) FROM runs GROUP BY ' + ', '.join(RunMetricsStore.CONFIGURATION) + '))' #by savedAt rather than id, since pickles can be imported after newer runs were appended. SQLite takes a bare column from the row holding the MAX
+        with self.connect() as connection:
+            rows = connection.execute(query + ' ORDER BY id').fetchall()
+        records = []
+        for row in rows:
+            d = {name: value for name, value in zip(self.columnNames, row) if value != None} #older runs don't have the simulated time columns
+            d.update(json.loads(row[-1]) if row[-1] else {})
+            records.append(d)
+        return records
+
+    def importPickleFiles(self, directory=Directories.programMetricsFolder):#imports the runMetrics pickles not already in the store. The pickles are left in place, so this runs on every load
+        fileList = self.fileOps.loadAllPickleFilesFromDirectory(directory)
+        with self.connect() as connection:#one transaction for all files
+            importedFiles = set([row[0] for row in connection.execute('SELECT sourceFile FROM runs WHERE sourceFile IS NOT NULL')])
+            newFiles = [filename for filename in fileList if os.path.basename(filename) not in importedFiles] #only these are opened
+            for filename in newFiles:
+                with open(filename, 'rb') as handle: self.insert(connection, pickle.load(handle), os.path.basename(filename), os.path.getmtime(filename))
+        if len(newFiles) > 0: print('Imported', len(newFiles), 'of', len(fileList), 'run metrics pickles into', self.filename)
+
 class ProgramAnalytics:
     def __init__(self):
         self.metricNames = ProgramMetrics()
         self.fileOps = FileOperations()
+        self.store = None #RunMetricsStore, opened when first needed
         self.roundingAccuracy = 2 #digits after decimal
         self.data = []
     
-    def saveFinishingTime(self, numGens, runWhichCI, runWhichTerrain, trialNumber, numImaginaryRobots, totalTimeTaken):
+    def saveFinishingTime(self, numGens, runWhichCI, runWhichTerrain, trialNumber, numImaginaryRobots, totalTimeTaken, simulationMetrics=None):#simulationMetrics is SimulationClock.getMetrics()
         filename = self.fileOps.getUniqueNameForFinishingTime(numGens, runWhichCI, runWhichTerrain, trialNumber, numImaginaryRobots)
         programMetrics = {
             self.metricNames.numGens: numGens,
@@ -75,55 +128,74 @@ class ProgramAnalytics:
             self.metricNames.trialNumber: trialNumber,
             self.metricNames.numImaginaryRobots: numImaginaryRobots
         }
-        self.fileOps.savePickleFile(self.fileOps.dir.programMetricsFolder, filename, programMetrics)
+        if simulationMetrics != None: programMetrics.update(simulationMetrics)
+        self.getStore().append(programMetrics)
+        print('Saved run metrics of', filename.replace(self.fileOps.dir.PICKLE_EXTN, ''), 'to', self.getStore().filename)
+    
+    def getStore(self):
+        if self.store == None: self.store = RunMetricsStore()
+        return self.store
         
     def loadProgramRunData(self):
-        fileList = self.fileOps.loadAllPickleFilesFromDirectory(self.fileOps.dir.programMetricsFolder)
-        #---go through all filenames and load dicts
-        trialNums = set(); robotNums = set(); genNums = set(); ciNames = set();
-        for filename in fileList:
-            d = self.fileOps.loadPickleFile(None, filename) #d is: {'numGens': 30, 'timeToCrossFinishLine': 991, 'runWhichCI': 'PSO', 'runWhichTerrain': 'RANDOM_SPHERE', 'trialNumber': 8, 'numImaginaryRobots': 30}
-            genNums.add(d[self.metricNames.numGens])
-            trialNums.add(d[self.metricNames.trialNumber])
-            robotNums.add(d[self.metricNames.numImaginaryRobots]) 
-            ciNames.add(d[self.metricNames.runWhichCI])
-            self.data.append(d)
-        print('\n----------------- Results of ',len(genNums),' maxGen types, ',len(trialNums),' trials and ', robotNums, ' robots:')#The +1 is because trials start with 0
-        print('Trial, numGens, numRobots, CI, Terrain, Real robot\'s Time (s)')
-        self.allData = {} #takes average of finishing time of all trials for specific combos of types of trials 
-        for t in trialNums:
-            for g in genNums:
-                for r in robotNums:
-                    for d in self.data:
-                        try:
-                            if d[self.metricNames.trialNumber] == t and d[self.metricNames.numImaginaryRobots] == r and d[self.metricNames.numGens] == g:
-                                totalTimeTaken = d[self.metricNames.timeToCrossFinishLine]
-                                totalTimeTakenByRealRobot = round(float(totalTimeTaken)/(g+1), self.roundingAccuracy)                                 
-                                print(str(t+1)+', '+str(g)+', '+str(r)+', '+d[self.metricNames.runWhichCI]+', '+d[self.metricNames.runWhichTerrain]+', '+str(totalTimeTakenByRealRobot))
-                                averagerKey = str(g)+'Gen_'+str(r)+'Popu_'+d[self.metricNames.runWhichCI]+'_'+d[self.metricNames.runWhichTerrain]
-                                if averagerKey in self.allData:
-                                    self.allData[averagerKey].append(totalTimeTakenByRealRobot)
-                                else:
-                                    self.allData[averagerKey] = [totalTimeTakenByRealRobot]
-                        except Exception as e:
-                            print(e)
-                            print('exception caught for trial ', t, ' gen ', g, ' numRobot ', r)
-                            logging.error(traceback.format_exc(None, True))
+        store = self.getStore()
+        store.importPickleFiles() #results saved as pickles before the store existed. Runs saved since then don't stop them being imported
+        self.data = store.load() #each d is: {'numGens': 30, 'timeToCrossFinishLine': 991, 'runWhichCI': 'PSO', 'runWhichTerrain': 'RANDOM_SPHERE', 'trialNumber': 8, 'numImaginaryRobots': 30}
+        runs = self.getRunArrays(self.data)
+        numRuns = len(runs['trial'])
+        print('\n----------------- Results of ',len(np.unique(runs['gens'])),' maxGen types, ',len(np.unique(runs['trial'])),' trials and ', set(np.unique(runs['robots']).tolist()), ' robots:')
+        print('Trial, numGens, numRobots, CI, Terrain, Real robot\'s Time (s), Clock')
+        order = np.lexsort((runs['robots'], runs['gens'], runs['trial'])) #by trial, then gens, then robots
+        for i in order:
+            print(str(runs['trial'][i]+1)+', '+str(runs['gens'][i])+', '+str(runs['robots'][i])+', '+runs['CI'][i]+', '+runs['terrain'][i]+', '+str(runs['realRobotTime'][i])+', '+runs['clock'][i])
+        #---one pass over the runs: each run's configuration gets an index, and the sums and counts are accumulated per index
+        configurations = np.char.add(np.char.add(np.char.add(runs['gens'].astype(str), 'Gen_'), np.char.add(runs['robots'].astype(str), 'Popu_')), 
+                                     np.char.add(np.char.add(runs['CI'], '_'), np.char.add(np.char.add(runs['terrain'], '_'), runs['clock']))) if numRuns > 0 else np.array([], dtype=str)
+        configurationKeys, configurationOfRun, numTrials = np.unique(configurations, return_inverse=True, return_counts=True)
+        means = np.bincount(configurationOfRun, weights=runs['realRobotTime'], minlength=len(configurationKeys)) / np.maximum(numTrials, 1)
+        runsByConfiguration = np.split(runs['realRobotTime'][np.argsort(configurationOfRun, kind='stable')], np.cumsum(numTrials)[:-1]) if numRuns > 0 else []
+        self.allData = {configurationKeys[k]: runsByConfiguration[k].tolist() for k in range(len(configurationKeys))} #finishing times of all trials for specific combos of types of trials 
         print('\n\n--- Displaying averages across trials')
-        for a in self.allData:
-            print('Avg: ', round(statistics.mean(self.allData[a]), self.roundingAccuracy), "  numTrials:",len(self.allData[a]), a, self.allData[a])
-        self.performHypothesisTesting(ciNames)
+        for k in range(len(configurationKeys)):
+            print('Avg: ', round(float(means[k]), self.roundingAccuracy), "  numTrials:", int(numTrials[k]), configurationKeys[k], self.allData[configurationKeys[k]])
+        #---test inputs, from the same arrays
+        completionTimesByCI = {ciName: runs['completionTime'][runs['CI'] == ciName].tolist() for ciName in np.unique(runs['CI']).tolist()}
+        self.performHypothesisTesting(completionTimesByCI)
+    
+    def getRunArrays(self, records):#one NumPy array per field, in the order of records. Records missing a field of the configuration are skipped
+        columns = {'trial': [], 'gens': [], 'robots': [], 'CI': [], 'terrain': [], 'realRobotTime': [], 'clock': [], 'completionTime': []}
+        for d in records:
+            try:
+                realRobotTime, clockName = self.getRealRobotTime(d)
+                row = {'trial': int(d[self.metricNames.trialNumber]), 'gens': int(d[self.metricNames.numGens]), 'robots': int(d[self.metricNames.numImaginaryRobots]), 
+                       'CI': d[self.metricNames.runWhichCI], 'terrain': d[self.metricNames.runWhichTerrain], 'realRobotTime': realRobotTime, 'clock': clockName, 'completionTime': self.getCompletionTime(d)}
+            except Exception as e:
+                print(e)
+                print('exception caught for run ', d)
+                logging.error(traceback.format_exc(None, True))
+                continue
+            for name in columns: columns[name].append(row[name])
+        return {'trial': np.array(columns['trial'], dtype=int), 'gens': np.array(columns['gens'], dtype=int), 'robots': np.array(columns['robots'], dtype=int),
+                'CI': np.array(columns['CI'], dtype=str), 'terrain': np.array(columns['terrain'], dtype=str), 'clock': np.array(columns['clock'], dtype=str),
+                'realRobotTime': np.array(columns['realRobotTime'], dtype=float), 'completionTime': np.array(columns['completionTime'], dtype=float)}
+    
+    def getRealRobotTime(self, d):#simulated time when the record has it. Older records only have wall time, which is apportioned across the gens
+        if self.metricNames.simulatedRealRobotTime in d:
+            return round(float(d[self.metricNames.simulatedRealRobotTime]), self.roundingAccuracy), 'simulated'
+        return round(float(d[self.metricNames.timeToCrossFinishLine])/(d[self.metricNames.numGens]+1), self.roundingAccuracy), 'wall'
+    
+    def getCompletionTime(self, d):#simulated time when available, else wall time (older records were throttled to real time, so they're roughly comparable)
+        if self.metricNames.simulatedTimeToCrossFinishLine in d:
+            return float(d[self.metricNames.simulatedTimeToCrossFinishLine])
+        return float(d[self.metricNames.timeToCrossFinishLine])
     
-    def performHypothesisTesting(self, ciNames):
+    def performHypothesisTesting(self, completionTimesByCI):#completionTimesByCI = {'DE': [], 'PSO': [], 'Random': []}
+        import seaborn as sns #plotting and statistics libraries take seconds to import, so they're imported only where they're used
+        import matplotlib.pyplot as plt
+        from scipy.stats import skew, f_oneway, mannwhitneyu
         fileOps = FileOperations()
         directory = 'hypothesisTestingResults/'
         fileOps.createDirectoryIfNotExisting(directory)
-        dat = {} #dat{'DE': [], 'PSO': [], 'Random': []}
-        for c in ciNames:
-            dat[c] = []
-        #---get each CI into a separate array
-        for d in self.data:
-            dat[d[self.metricNames.runWhichCI]].append(float(d[self.metricNames.timeToCrossFinishLine]))
+        dat = completionTimesByCI
         #---check for normal distribution
         _, ax = plt.subplots()
         sns.distplot(dat[RunCI.RANDOM], ax=ax, label=RunCI.RANDOM)
@@ -243,6 +315,7 @@ class TestAnalyticsForMovementAccuracy:
         self.multipleParameters(directory, robotAngles, surfaceTouch) #robotAngles = [[chAng, leg1Ang, leg2Ang, leg3Ang, leg4Ang], [], ...]  
         
     def multipleParameters(self, directory, angles, surfaceTouch):#[[[[chA1,lA1,lA2,lA3,lA4],[],...aNumFrames], [], []], []]. angles[0] gives all simulation run's for first trial = [[chA1,lA1,lA2,lA3,lA4], [], []], []]        
+        import matplotlib.pyplot as plt
         #angles is numTrials=20 long.
         #angles[0] is numSimulations=100. [[[360, 6, 3, 355, 358], [359, 12, 6, 349, 356], ...
         #angles[0][0] is numFrames=50. [[360, 6, 3, 355, 358], [359, 12, 6, 349, 356], ...
@@ -295,6 +368,7 @@ class TestAnalyticsForMovementAccuracy:
             #break          
 
     def groupedBarsMotorRates(self, directory, rates):
+        import matplotlib.pyplot as plt
         #print(rates)
         labels = []#the groups
         m1=[]; m2=[]; m3=[]; m4=[]
@@ -334,6 +408,7 @@ class TestAnalyticsForMovementAccuracy:
         #plt.show(block=False)     
         
     def groupedBarsSurfaceTouch(self, directory, surfaceTouch):#surfaceTouch=#[ [ [ [l1,l2,l3,l4], [], ...numFrames ], [], [], ... numSims ], [], []...numTrials ]
+        import matplotlib.pyplot as plt
         #print('surface touch: ',surfaceTouch)
         trialNum = 1
         labels = []#the groups
@@ -377,6 +452,7 @@ class TestAnalyticsForMovementAccuracy:
         plt.show(block=False)         
     
     def boxPlots(self, directory, xPositions, yPositions):
+        import matplotlib.pyplot as plt
         ticks = []
         for i in range(len(xPositions)):
             ticks.append(str(i+1))
@@ -399,6 +475,7 @@ class TestAnalyticsForMovementAccuracy:
         #plt.show(block=False) 
         
     def changeBoxColor(self, boxPlot, c):
+        import matplotlib.pyplot as plt
         plt.setp(boxPlot['boxes'], color=c)
         plt.setp(boxPlot['whiskers'], color=c)
         plt.setp(boxPlot['caps'], color=c)
@@ -0,0 +1,174 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+# Throughput of headless worlds. BenchmarkSuite runs fixed-seed scenarios (terrain x CI x population size x leg code), each in a
+# fresh process so its peak memory and startup time are its own, writes the results to benchmarkResults/ and compares them
+# with a stored baseline. It also times importing main, Worlds and Analytics in a fresh interpreter against a startup budget. TerrainBenchmark compares broadphases and compiled terrain in this process. Run with:
+# >>> python3 Benchmarks.py            (runs the suite and compares with the baseline)
+# >>> python3 Benchmarks.py baseline   (runs the suite and stores the results as the new baseline)
+# >>> python3 Benchmarks.py terrain    (runs TerrainBenchmark)
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import resource
+import subprocess
+import multiprocessing
+from Worlds import ImaginationTwin
+from Analytics import FileOperations
+from Enums import RunCI, Terrains, Broadphase, MainProgramParameters
+
+class TerrainBenchmark:#physics frames per second of a headless ImaginationTwin on each terrain, with each broadphase
+    def __init__(self, legCode=MainProgramParameters.LEGS, runWhichCI=RunCI.DE, numFrames=2000, seed=0):
+        self.legCode = legCode
+        self.runWhichCI = runWhichCI
+        self.numFrames = numFrames
+        self.seed = seed #the same seed gives every terrain and broadphase the same randomized terrain and motor rates
+        self.terrains = [Terrains.FLAT_GROUND, Terrains.RANDOM_BOXES_LOW_DENSE, Terrains.RANDOM_SPHERES_LOW_DENSE, Terrains.STAIRCASE_UP_DOWN, Terrains.ALTERNATOR]
+        self.broadphases = [Broadphase.TREE, Broadphase.SPATIAL_HASH]
+        self.compileOptions = [False, True] #stored terrain shapes, then TerrainCompiler's merged shapes
+
+    def run(self):
+        results = []
+        for terrain in self.terrains:
+            for broadphase in self.broadphases:
+                for compileTerrain in self.compileOptions:
+                    results.append(self.measure(terrain, broadphase, compileTerrain))
+                    print(self.getResultString(results[-1]))
+        return results
+
+    def measure(self, terrain, broadphase, compileTerrain=False):
+        random.seed(self.seed)
+        w = ImaginationTwin(self.legCode, self.runWhichCI, terrain, None)
+        w.headless = True; w.saveResults = False; w.broadphase = broadphase; w.compileTerrain = compileTerrain
+        w.initialize()
+        numShapes = len(w.space.shapes) + len(w.imaginationSpace.shapes)
+        startTime = time.time()
+        w.runWorld(self.numFrames)
+        elapsedTime = time.time() - startTime
+        frames = w.simClock.physicsFrames
+        w.delete()
+        return {'terrain': terrain, 'broadphase': broadphase, 'compiled': compileTerrain, 'shapes': numShapes, 'frames': frames, 'seconds': elapsedTime, 'framesPerSecond': frames / elapsedTime}
+
+    def getResultString(self, result):
+        return result['terrain'].ljust(15) + result['broadphase'].ljust(15) + ('compiled' if result['compiled'] else 'stored').ljust(10) + 'shapes: ' + str(result['shapes']).rjust(4) + ', frames/sec: ' + str(round(result['framesPerSecond'], 1))
+
+def runScenario(scenario, numFrames, seed, launchTime, resultQueue):#runs in a freshly spawned process, so imports count towards the startup time
+    random.seed(seed)
+    w = ImaginationTwin(scenario['legCode'], scenario['runWhichCI'], scenario['terrain'], None)
+    w.headless = True; w.saveResults = False
+    w.numImaginaryRobots = scenario['population']
+    w.initialize()
+    startupSeconds = time.time() - launchTime
+    startTime = time.time()
+    w.runWorld(numFrames)
+    elapsedTime = time.time() - startTime
+    generations = w.simClock.imaginaryGenerations + w.simClock.realGenerations
+    result = dict(scenario)
+    result.update({'frames': w.simClock.physicsFrames, 'generations': generations, 'seconds': elapsedTime,
+                   'framesPerSecond': w.simClock.physicsFrames / elapsedTime, 'generationsPerSecond': generations / elapsedTime,
+                   'phaseSeconds': w.phaseTimers.phaseSeconds, 'runStepSeconds': w.phaseTimers.runStepSeconds, 'startupSeconds': startupSeconds,
+                   'peakRSSMegabytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}) #ru_maxrss is in kilobytes on Linux
+    w.delete()
+    resultQueue.put(result)
+
+class BenchmarkSuite:#runs every combination of terrains, CIs, population sizes and leg codes headless, each for numFrames physics frames
+    def __init__(self, terrains=None, CIs=None, populations=None, legCodes=None, numFrames=1000, seed=0):
+        self.terrains = [Terrains.FLAT_GROUND, Terrains.RANDOM_BOXES_LOW_DENSE, Terrains.RANDOM_SPHERES_LOW_DENSE, Terrains.STAIRCASE_UP_DOWN, Terrains.ALTERNATOR] if terrains == None else terrains
+        self.CIs = [RunCI.RANDOM, RunCI.DE, RunCI.PSO] if CIs == None else CIs
+        self.populations = [4, 30, 100, 300] if populations == None else populations #DE needs at least 4
+        self.legCodes = [MainProgramParameters.LEGS] if legCodes == None else legCodes
+        self.numFrames = numFrames
+        self.seed = seed #every scenario starts from the same random state, so its terrain and motor rates are the same on every run
+        self.folder = 'benchmarkResults/'
+        self.resultsFilename = 'results.json'
+        self.baselineFilename = 'baseline.json'
+        self.tolerance = 0.15 #a throughput drop or memory and startup growth beyond this fraction of the baseline counts as a regression
+        self.startupModules = ['main', 'Worlds', 'Analytics'] #what a process pool worker or a short analysis run imports first
+        self.startupBudgetSeconds = 1.0 #importing any of startupModules in a fresh interpreter must take less than this
+        self.startupRepeats = 3 #the fastest of these many imports is kept, since the first one may read the files from disk
+        self.fileOps = FileOperations()
+
+    def getScenarios(self):
+        scenarios = []
+        for legCode in self.legCodes:
+            for terrain in self.terrains:
+                for runWhichCI in self.CIs:
+                    for population in self.populations:
+                        scenarios.append({'legCode': legCode, 'terrain': terrain, 'runWhichCI': runWhichCI, 'population': population})
+        return scenarios
+
+    def getScenarioKey(self, scenario):
+        return scenario['legCode'] + '_' + scenario['terrain'] + '_' + scenario['runWhichCI'] + '_' + str(scenario['population'])
+
+    def measureImportTimes(self):#seconds to import each of startupModules in a fresh interpreter, including the interpreter's own startup
+        importSeconds = {}
+        for module in self.startupModules:
+            times = []
+            for _ in range(self.startupRepeats):
+                startTime = time.time()
+                subprocess.run([sys.executable, '-c', 'import ' + module], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=dict(os.environ, SDL_VIDEODRIVER='dummy'))
+                times.append(time.time() - startTime)
+            importSeconds[module] = min(times)
+            print('import', module.ljust(12), str(round(importSeconds[module], 3)) + 's', '(over the budget of ' + str(self.startupBudgetSeconds) + 's)' if importSeconds[module] > self.startupBudgetSeconds else '')
+        return importSeconds
+
+    def run(self):
+        importSeconds = self.measureImportTimes()
+        context = multiprocessing.get_context('spawn') #a fork would inherit the parent's imports and memory
+        results = []
+        for scenario in self.getScenarios():
+            resultQueue = context.Queue()
+            process = context.Process(target=runScenario, args=(scenario, self.numFrames, self.seed, time.time(), resultQueue))
+            process.start()
+            results.append(resultQueue.get())
+            process.join()
+            print(self.getResultString(results[-1]))
+        return {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': platform.platform(), 'python': platform.python_version(),
+                'numFrames': self.numFrames, 'seed': self.seed, 'importSeconds': importSeconds, 'results': results}
+
+    def getResultString(self, result):
+        return self.getScenarioKey(result).ljust(32) + 'frames/sec: ' + str(round(result['framesPerSecond'], 1)).rjust(7) + ', gens/sec: ' + str(round(result['generationsPerSecond'], 2)).rjust(6) + \
+               ', startup: ' + str(round(result['startupSeconds'], 2)) + 's, peak RSS: ' + str(int(result['peakRSSMegabytes'])) + 'MB'
+
+    def save(self, report, filename):
+        self.fileOps.createDirectoryIfNotExisting(self.folder)
+        with open(os.path.join(self.folder, filename), 'w') as handle: json.dump(report, handle, indent=1)
+        print('Saved ', self.folder, filename)
+
+    def loadBaseline(self):
+        if not self.fileOps.checkIfFileExists(self.folder, self.baselineFilename): print('No baseline in', self.folder); return None
+        with open(os.path.join(self.folder, self.baselineFilename)) as handle: return json.load(handle)
+
+    def compare(self, report, baseline):#returns the regressions found, as strings. Scenarios missing from the baseline are skipped
+        regressions = []
+        for module, seconds in report.get('importSeconds', {}).items():#the budget holds even when the baseline was over it
+            if seconds > self.startupBudgetSeconds: regressions.append('import ' + module + ' ' + str(round(seconds, 2)) + 's is over the startup budget of ' + str(self.startupBudgetSeconds) + 's')
+        baselineResults = {self.getScenarioKey(r): r for r in baseline['results']}
+        for result in report['results']:
+            key = self.getScenarioKey(result)
+            if key not in baselineResults: continue
+            old = baselineResults[key]
+            for metric in ['framesPerSecond', 'generationsPerSecond']:#higher is better
+                if old[metric] > 0 and result[metric] < old[metric] * (1 - self.tolerance): regressions.append(key + ' ' + metric + ' ' + str(round(old[metric], 2)) + ' -> ' + str(round(result[metric], 2)))
+            for metric in ['startupSeconds', 'peakRSSMegabytes']:#lower is better
+                if result[metric] > old[metric] * (1 + self.tolerance): regressions.append(key + ' ' + metric + ' ' + str(round(old[metric], 2)) + ' -> ' + str(round(result[metric], 2)))
+        return regressions
+
+if __name__ == '__main__':
+    if 'terrain' in sys.argv[1:]: TerrainBenchmark().run()
+    else:
+        suite = BenchmarkSuite()
+        report = suite.run()
+        suite.save(report, suite.resultsFilename)
+        if 'baseline' in sys.argv[1:]: suite.save(report, suite.baselineFilename)
+        else:
+            baseline = suite.loadBaseline()
+            if baseline != None:
+                regressions = suite.compare(report, baseline)
+                for r in regressions: print('REGRESSION:', r)
+                print(len(regressions), 'regressions against the baseline of', baseline['created'])
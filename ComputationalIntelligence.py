@@ -2,8 +2,8 @@
 # Created: April 2019
 # License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
 
+import numpy as np
 from WalkingRobot import *
-from random import uniform
 from Enums import RunCode, Constants
 
 
@@ -16,30 +16,77 @@ from Enums import RunCode, Constants
 #------------------------------------------------------------------------------------------------
 #------------------------------------------------------------------------------------------------
 
+class PopulationEngine:#the population's motor rates and fitnesses as (population, legs) arrays, so the CIs work on all robots at once instead of robot by robot and leg by leg
+    def __init__(self, roboList):
+        self.robots = roboList
+        self.const = Constants()
+        self.numRobots = len(self.robots)
+        self.numLegs = len(self.robots[0].legs)
+        self.rateRanges = np.array([leg.motor.legRateRange for leg in self.robots[0].legs]) #(legs, rate choices)
+        self.minLegMotorRate, self.maxLegMotorRate = self.robots[0].getMinMaxLegRates()
+        self.rng = np.random.default_rng(random.getrandbits(64)) #seeded from random, so seeding random still seeds the CI
+        self.rates = np.zeros((self.numRobots, self.numLegs))
+        self.fitnesses = np.zeros(self.numRobots)
+        self.stateBuffer = getattr(self.robots[0], 'stateBuffer', None) #used when it holds exactly these robots. CandidateRobots have none
+        if self.stateBuffer != None and self.stateBuffer.robots != self.robots: self.stateBuffer = None
+    def pull(self):#bulk get of every robot's rates and fitness
+        if self.stateBuffer != None:
+            self.stateBuffer.refreshChassisPositions()
+            self.rates = self.stateBuffer.motorRates.copy()
+            self.fitnesses = self.stateBuffer.getFitnesses()
+            return
+        self.rates = np.array([robo.getLegMotorRates() for robo in self.robots], dtype=float)
+        self.fitnesses = np.array([robo.getFitness() for robo in self.robots], dtype=float)
+    def push(self, changed):#bulk set of the rates of the robots in the boolean mask changed
+        if self.stateBuffer != None: self.stateBuffer.motorRates[changed] = self.rates[changed]; return
+        for i in np.flatnonzero(changed):
+            self.robots[i].setLegMotorRates(self.rates[i].tolist())
+    def findFittest(self, fittestRobot):#the previous fittest stays unless some robot is strictly fitter. Ties go to the lowest index, like a sequential scan
+        currBestFit = 0 if fittestRobot == self.const.UNDETERMINED else self.fitnesses[fittestRobot]
+        best = int(np.argmax(self.fitnesses))
+        return best if self.fitnesses[best] > currBestFit else fittestRobot
+    def randomRates(self, numRobots):#like RobotBody.setRandomLegMotorRates, for numRobots robots
+        choices = self.rng.integers(0, self.rateRanges.shape[1], size=(numRobots, self.numLegs))
+        return self.rateRanges[np.arange(self.numLegs), choices]
+    def chooseOtherRobots(self, numChoices):#for each robot, numChoices distinct indexes of other robots
+        chosen = np.arange(self.numRobots)[:, None] #a robot's own index is excluded too
+        for j in range(numChoices):
+            pick = self.rng.integers(0, self.numRobots - 1 - j, size=self.numRobots)
+            excluded = np.sort(chosen, axis=1)
+            for c in range(excluded.shape[1]):#step past the excluded indexes in ascending order
+                pick += (pick >= excluded[:, c])
+            chosen = np.hstack((chosen, pick[:, None]))
+        return chosen[:, 1:]
+    def othersThan(self, robotIndex):#mask of all robots except robotIndex (UNDETERMINED excludes none)
+        mask = np.ones(self.numRobots, dtype=bool)
+        if robotIndex != self.const.UNDETERMINED: mask[robotIndex] = False
+        return mask
+
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+
 class RandomBest:#Use randomness instead of a CI algorithm  
     def __init__(self, roboList):
         self.robots = roboList
         self.infoString = ""
         self.const = Constants()
         self.motorRatesOfFittest = []
+        self.population = PopulationEngine(self.robots)
         self.reinitialize()
     def reinitialize(self):
         self.fittestRobot = self.const.UNDETERMINED
     def run(self):        
-        currBestFit = 0 if self.fittestRobot == self.const.UNDETERMINED else self.robots[self.fittestRobot].getFitness()
-        #---go through all robots to find if there's a new fittest one
-        for i in range(0, len(self.robots)):            
-            fit = self.robots[i].getFitness()
-            if fit > currBestFit:#if greater than zero
-                self.fittestRobot = i #if there was a previous generation's fittest, that won't get replaced, but everything gets reset when generations are reinitialized
-                self.motorRatesOfFittest = self.robots[i].getLegMotorRates()
-                currBestFit = fit
-        for i in range(0, len(self.robots)):
-            if self.fittestRobot == i:            
-                continue #don't change the motor rates for this
-            else:
-                self.robots[i].setRandomLegMotorRates()
-        self.infoString = ",  Random,  fittest robot: "+ ('-' if self.fittestRobot == self.const.UNDETERMINED else str(self.fittestRobot)) +",  fitness: "+str(self.robots[self.fittestRobot].getFitness())+",  motor rates: "+str([round(x,1) for x in self.motorRatesOfFittest])
+        self.population.pull()
+        #---find if there's a new fittest robot
+        fittest = self.population.findFittest(self.fittestRobot)
+        if fittest != self.fittestRobot: self.motorRatesOfFittest = self.population.rates[fittest].tolist()
+        self.fittestRobot = fittest #if there was a previous generation's fittest, that won't get replaced, but everything gets reset when generations are reinitialized
+        #---don't change the motor rates for the fittest
+        others = self.population.othersThan(self.fittestRobot)
+        self.population.rates[others] = self.population.randomRates(int(others.sum()))
+        self.population.push(others)
+        self.infoString = ",  Random,  fittest robot: "+ ('-' if self.fittestRobot == self.const.UNDETERMINED else str(self.fittestRobot)) +",  fitness: "+str(self.population.fitnesses[self.fittestRobot])+",  motor rates: "+str([round(x,1) for x in self.motorRatesOfFittest])
     def getInfoString(self):
         return self.infoString
     def getFittestRobot(self):
@@ -62,58 +109,37 @@ class SimpleDE:#Use randomness instead of a CI algorithm
         self.crProba = 0.3 #crossover probability range [0 -> 1]  
         self.randomReinitializationProba = 0.1 #probability range [0 -> 1]
         self.vBeta = self.masterBeta  
-        minRate, maxRate = self.robots[0].getMinMaxLegRates()
-        self.minLegMotorRate = minRate
-        self.maxLegMotorRate = maxRate
+        self.population = PopulationEngine(self.robots)
+        self.minLegMotorRate = self.population.minLegMotorRate
+        self.maxLegMotorRate = self.population.maxLegMotorRate
         self.reinitialize()
     def reinitialize(self):
         self.fittestRobot = self.const.UNDETERMINED
         self.vBeta = self.masterBeta
     def run(self):        
-        currBestFit = 0 if self.fittestRobot == self.const.UNDETERMINED else self.robots[self.fittestRobot].getFitness()
-        #---go through all robots to find if there's a new fittest one
-        robotIndexes = []
-        for i in range(0, len(self.robots)):
-            robotIndexes.append(i)            
-            fit = self.robots[i].getFitness()
-            if fit > currBestFit:#if greater than zero
-                self.fittestRobot = i #if there was a previous generation's fittest, that won't get replaced, but everything gets reset when generations are reinitialized
-                self.motorRatesOfFittest = self.robots[i].getLegMotorRates()
-                currBestFit = fit        
-        #---mutations for each robot
-        for i in range(0, len(self.robots)):
-            if self.fittestRobot == i: continue #don't change the motor rates for fittest
-            else:
-                tempIndexes = robotIndexes[:] #copying values instead of references
-                tempIndexes.remove(i) #remove influence of current robot
-                r1 = random.choice(tempIndexes); tempIndexes.remove(r1)
-                r2 = random.choice(tempIndexes); tempIndexes.remove(r2)
-                r3 = random.choice(tempIndexes); tempIndexes.remove(r3)
-                r1 = self.robots[r1].getLegMotorRates()
-                r2 = self.robots[r2].getLegMotorRates()
-                r3 = self.robots[r3].getLegMotorRates()
-                r = self.robots[i].getLegMotorRates() #current robot being iterated                
-                if uniform(0,1) > self.randomReinitializationProba:#ensuring that 10% of robots are re-initialized randomly 
-                    mutantMotorRates = []; hadMutated = False
-                    for ii in range(0, len(r1)):
-                        mutatedRateForOneMotor = r[ii] #the original motor rate for the robot being considered
-                        #print('mutated rate for one:', mutatedRateForOneMotor)
-                        if uniform(0,1) <= self.crProba: #if crossover required
-                            #print('mutations value:',r1[ii],self.vBeta,r2[ii], r3[ii])
-                            mutatedRateForOneMotor = r1[ii] + round(self.vBeta * (r2[ii] - r3[ii])) #mutate
-                        if mutatedRateForOneMotor < self.minLegMotorRate or mutatedRateForOneMotor > self.maxLegMotorRate: #bounds check
-                            mutantMotorRates.append(r[ii]) #no change to motor rate instead of clamping or re-initializing
-                        else:
-                            mutantMotorRates.append(mutatedRateForOneMotor); hadMutated = True
-                    if hadMutated:
-                        self.robots[i].setLegMotorRates(mutantMotorRates)                            
-                else:#reinitialize randomly
-                    self.robots[i].setRandomLegMotorRates()
+        pop = self.population
+        pop.pull()
+        #---find if there's a new fittest robot
+        fittest = pop.findFittest(self.fittestRobot)
+        if fittest != self.fittestRobot: self.motorRatesOfFittest = pop.rates[fittest].tolist()
+        self.fittestRobot = fittest #if there was a previous generation's fittest, that won't get replaced, but everything gets reset when generations are reinitialized
+        #---mutations for all robots except the fittest. Donors are the rates at the start of this generation
+        others = pop.othersThan(self.fittestRobot)
+        donors = pop.chooseOtherRobots(3) #r1, r2, r3 for each robot, all different from it and from each other
+        r1 = pop.rates[donors[:, 0]]; r2 = pop.rates[donors[:, 1]]; r3 = pop.rates[donors[:, 2]]
+        mutants = r1 + np.round(self.vBeta * (r2 - r3)) #mutate
+        crossover = pop.rng.random(pop.rates.shape) <= self.crProba
+        withinBounds = (mutants >= self.minLegMotorRate) & (mutants <= self.maxLegMotorRate) #no change to motor rate instead of clamping or re-initializing
+        mutatedRates = np.where(crossover & withinBounds, mutants, pop.rates)
+        reinitialize = pop.rng.random(pop.numRobots) <= self.randomReinitializationProba #ensuring that 10% of robots are re-initialized randomly 
+        mutatedRates[reinitialize] = pop.randomRates(int(reinitialize.sum()))
+        pop.rates[others] = mutatedRates[others]
+        pop.push(others)
         #---beta is reduced to encourage exploitation and reduce exploration
         if self.vBeta > self.vBetaReductionFactor: 
             self.vBeta = self.vBeta - self.vBetaReductionFactor    
 
-        self.infoString = ",  DE,  fittest robot: "+ ('-' if self.fittestRobot == self.const.UNDETERMINED else str(self.fittestRobot)) +",  fitness: "+str(self.robots[self.fittestRobot].getFitness())+",  motor rates: "+str([round(x,1) for x in self.motorRatesOfFittest])
+        self.infoString = ",  DE,  fittest robot: "+ ('-' if self.fittestRobot == self.const.UNDETERMINED else str(self.fittestRobot)) +",  fitness: "+str(pop.fitnesses[self.fittestRobot])+",  motor rates: "+str([round(x,1) for x in self.motorRatesOfFittest])
         
     def getInfoString(self):
         return self.infoString
@@ -130,60 +156,49 @@ class SimplePSO:#Use randomness instead of a CI algorithm
         self.robots = roboList
         self.infoString = ""
         self.const = Constants()        
-        self.numLegs = len(self.robots[0].legs)
+        self.population = PopulationEngine(self.robots)
+        self.numLegs = self.population.numLegs
         #---PSO parameters
         self.c1 = 1 #cognitive coefficient
         self.c2 = 2 #social coefficient
         self.randomReinitializationProba = 0.1 #ensuring that 10% of robots are re-initialized randomly         
         self.reinitialize() 
-        minRate, maxRate = self.robots[0].getMinMaxLegRates()
-        self.minLegMotorRate = minRate
-        self.maxLegMotorRate = maxRate        
+        self.minLegMotorRate = self.population.minLegMotorRate
+        self.maxLegMotorRate = self.population.maxLegMotorRate        
     def reinitialize(self):
         self.fittestRobot = self.const.UNDETERMINED
-        self.motorRatesOfFittest = [0] * len(self.robots) #creates [0,0,...,0] #global best rate
-        self.velocitiesPSO = self.__initializeLocalZeroArrays__(len(self.robots), self.numLegs)
-        self.personalBestRates = self.__initializeLocalZeroArrays__(len(self.robots), self.numLegs)
-        self.pastFitnesses = [0] * len(self.robots) #creates [0,0,...,0]         
+        self.motorRatesOfFittest = [0] * self.numLegs #creates [0,0,...,0] #global best rate
+        self.velocitiesPSO = np.zeros((self.population.numRobots, self.numLegs))
+        self.personalBestRates = np.zeros((self.population.numRobots, self.numLegs))
+        self.pastFitnesses = np.zeros(self.population.numRobots)
     def run(self):        
-        currBestFit = 0 if self.fittestRobot == self.const.UNDETERMINED else self.robots[self.fittestRobot].getFitness()
-        #---go through all robots to find if there's a new fittest one
-        robotIndexes = []
-        for i in range(len(self.robots)):
-            robotIndexes.append(i)            
-            fit = self.robots[i].getFitness()
-            if fit > currBestFit:#if greater than zero
-                self.fittestRobot = i #if there was a previous generation's fittest, that won't get replaced, but everything gets reset when generations are reinitialized
-                self.motorRatesOfFittest = self.robots[i].getLegMotorRates()
-                currBestFit = fit        
-        #---mutations for each robot
-        for i in range(len(self.robots)):
-            if self.fittestRobot == i: continue #don't change the motor rates for fittest
-            else:
-                if uniform(0,1) > self.randomReinitializationProba:#ensuring that 10% of robots are re-initialized randomly
-                    self.robots[i].setRandomLegMotorRates()
-                else: #do PSO
-                    currentRates = self.robots[i].getLegMotorRates()
-                    currentFitness = self.robots[i].getFitness()
-                    if currentFitness > self.pastFitnesses[i]:
-                        self.pastFitnesses[i] = currentFitness
-                        self.personalBestRates[i] = currentRates
-                    for ii in range(self.numLegs):
-                        cognitive = self.c1 * random.random() * (self.personalBestRates[i][ii] - currentRates[ii])
-                        social = self.c2 * random.random() * (self.motorRatesOfFittest[ii] - currentRates[ii])                    
-                        self.velocitiesPSO[i][ii] = self.velocitiesPSO[i][ii] + cognitive + social
-                        #---velocity clamping
-                        if self.velocitiesPSO[i][ii] > self.maxLegMotorRate / 2: self.velocitiesPSO[i][ii] = self.maxLegMotorRate / 2
-                        if self.velocitiesPSO[i][ii] < self.minLegMotorRate / 2: self.velocitiesPSO[i][ii] = self.minLegMotorRate / 2
-                        #---rate update 
-                        currentRates[ii] = currentRates[ii] + self.velocitiesPSO[i][ii]
-                        #---rate clamping
-                        if currentRates[ii] > self.maxLegMotorRate: currentRates[ii] = self.maxLegMotorRate
-                        if currentRates[ii] < self.minLegMotorRate: currentRates[ii] = self.minLegMotorRate
-                    self.robots[i].setLegMotorRates(currentRates)
+        pop = self.population
+        pop.pull()
+        #---find if there's a new fittest robot
+        fittest = pop.findFittest(self.fittestRobot)
+        if fittest != self.fittestRobot: self.motorRatesOfFittest = pop.rates[fittest].tolist()
+        self.fittestRobot = fittest #if there was a previous generation's fittest, that won't get replaced, but everything gets reset when generations are reinitialized
+        #---all robots except the fittest either get random rates or do PSO
+        others = pop.othersThan(self.fittestRobot)
+        randomize = others & (pop.rng.random(pop.numRobots) > self.randomReinitializationProba) #ensuring that 10% of robots are re-initialized randomly
+        doPSO = others & ~randomize
+        newRates = pop.rates.copy()
+        newRates[randomize] = pop.randomRates(int(randomize.sum()))
+        #---personal bests. A personal best set in this generation is the updated rates, and contributes no cognitive pull in this generation
+        improved = doPSO & (pop.fitnesses > self.pastFitnesses)
+        self.pastFitnesses[improved] = pop.fitnesses[improved]
+        self.personalBestRates[improved] = pop.rates[improved]
+        cognitive = self.c1 * pop.rng.random(pop.rates.shape) * (self.personalBestRates - pop.rates)
+        social = self.c2 * pop.rng.random(pop.rates.shape) * (np.asarray(self.motorRatesOfFittest, dtype=float) - pop.rates)
+        velocities = np.clip(self.velocitiesPSO + cognitive + social, self.minLegMotorRate / 2, self.maxLegMotorRate / 2) #velocity clamping
+        self.velocitiesPSO[doPSO] = velocities[doPSO]
+        newRates[doPSO] = np.clip(pop.rates[doPSO] + velocities[doPSO], self.minLegMotorRate, self.maxLegMotorRate) #rate update and clamping
+        self.personalBestRates[improved] = newRates[improved]
+        pop.rates = newRates
+        pop.push(others)
 
         fittestRobotString = "fittest robot: "+ ('-' if self.fittestRobot == self.const.UNDETERMINED else str(self.fittestRobot))
-        fitnessString = ",  fitness: "+str(self.robots[self.fittestRobot].getFitness())
+        fitnessString = ",  fitness: "+str(pop.fitnesses[self.fittestRobot])
         motorRatesString = ",  motor rates: "+str([round(x,1) for x in self.motorRatesOfFittest])
         self.infoString = ",  PSO,  " + fittestRobotString + fitnessString + motorRatesString
         
@@ -191,10 +206,3 @@ class SimplePSO:#Use randomness instead of a CI algorithm
         return self.infoString
     def getFittestRobot(self):
         return self.fittestRobot
-    def __initializeLocalZeroArrays__(self, numRobots, numLegs):
-        a = []
-        for _ in range(numRobots):
-            a.append([0] * numLegs) #[0,0,0,0] 
-        return a
-    
-    
\ No newline at end of file
@@ -5,6 +5,10 @@ class TestRunMode:
     CREATING_RESULTS = 1
     VIEWING_RESULTS = 2
     
+class Broadphase:
+    TREE = 'TREE' #pymunk's default bounding box tree
+    SPATIAL_HASH = 'SPATIAL_HASH' #cell size derived from the robot and terrain dimensions
+    
 class MainProgramParameters:
     MAX_TRIALS_TO_RUN = 10
     FINISH_LINE_POSITION_FROM_END = 100 #800 for near or 100 for far
@@ -15,6 +19,21 @@ class MainProgramParameters:
     DISTANCE_FOR_ASSUMING_STUCK = 20 #pixels
     GENERATIONS_TO_PERSIST_STUCK = 5
     TEST_MODE_RUN_STATE = TestRunMode.VIEWING_RESULTS #TestRunMode.CREATING_RESULTS or TestRunMode.VIEWING_RESULTS
+    NUM_PARALLEL_WORKERS = 1 #1 runs worlds one after another in this process. Any other number runs multi-trial worlds headless in that many processes (None for one per core)
+    NUM_EVALUATION_WORKERS = 0 #0 imagines in the world's own imagination space. More than 0 evaluates each imaginary generation's population in that many worker processes (see FitnessEvaluation.py)
+    EVALUATION_CACHE_SIZE = 0 #past evaluations kept by the fitness evaluator, so recurring (pose, terrain, motor rates) combinations aren't simulated again. 0 disables the cache
+    EVALUATION_CACHE_MIN_SAMPLES = 2 #simulations averaged into a cache entry before it's used instead of simulating. Above 1, the spread between samples of the same key is reported in ProgramMetrics
+    RENDER_EVERY_NTH_FRAME = 1 #draw only every Nth physics frame. The loop is still capped at the world's fps on drawn frames, so physics runs N times faster than real time
+    DISPLAY_FPS = None #when set, the display is redrawn at this rate by wall clock and the physics isn't throttled. Overrides RENDER_EVERY_NTH_FRAME
+    BROADPHASE = Broadphase.TREE #how each world's spaces find colliding shape pairs. Broadphase.TREE or Broadphase.SPATIAL_HASH
+    COMPILE_TERRAIN = False #True builds each terrain from TerrainCompiler's merged shapes instead of the stored boxes and spheres. The covered area stays the same
+    ADAPTIVE_SUBSTEPS = False #True picks each frame's physics sub-steps from the fastest body's speed and the number of touching shape pairs per dynamic body, between MIN_SUBSTEPS and the world's fixed iterations
+    MIN_SUBSTEPS = 4 #accuracy floor for ADAPTIVE_SUBSTEPS
+    BODY_SLEEP_TIME = None #simulated seconds a body must stay idle before pymunk puts it to sleep and stops solving it. None disables sleeping
+    IDLE_SPEED_THRESHOLD = 0 #speed below which a body counts as idle for BODY_SLEEP_TIME. 0 lets pymunk estimate it from gravity
+    SHOW_PHASE_TIMINGS = False #True adds each phase's share of the main loop's time to the on-screen stats
+    RECORD_TRACE = False #True saves a Chrome/Perfetto trace of each ImaginationTwin run to Directories.tracesFolder
+    HEADLESS = False #True runs worlds without a display, event polling or drawing, and steps physics as fast as the CPU allows
     
 #------------------------------------------------------------------
 #------------------------------------------------------------------
@@ -82,6 +101,8 @@ class Directories:
     PICKLE_EXTN = '.pickle' #file extension
     terrainObjectsFolder = 'terrainObjects/'
     programMetricsFolder = 'runMetrics/'
+    runMetricsDatabase = 'runMetrics.sqlite' #RunMetricsStore, in programMetricsFolder
+    tracesFolder = 'traces/'
     
 class ProgramMetrics:
     timeToCrossFinishLine = 'timeToCrossFinishLine'
@@ -90,5 +111,18 @@ class ProgramMetrics:
     trialNumber = 'trialNumber'
     numImaginaryRobots = 'numImaginaryRobots'
     numGens = 'numGens'
+    simulatedTimeToCrossFinishLine = 'simulatedTimeToCrossFinishLine' #physics frames / fps. timeToCrossFinishLine stays the wall time
+    simulatedRealRobotTime = 'simulatedRealRobotTime' #physics frames the real robot was active for / fps
+    physicsFrames = 'physicsFrames'
+    realGenerations = 'realGenerations'
+    imaginaryGenerations = 'imaginaryGenerations'
+    physicsSubsteps = 'physicsSubsteps' #space.step calls over the run, summed over every space
+    meanSubsteps = 'meanSubsteps' #sub-steps per space per frame
+    instrumentation = 'instrumentation' #PhaseTimers.getSummary(): loop time and its histogram per phase and per RunStep, and body, shape, constraint and contact counts
+    meanSleepingBodies = 'meanSleepingBodies' #sleeping bodies per space per frame, when BODY_SLEEP_TIME is set
+    evaluationCacheHits = 'evaluationCacheHits'
+    evaluationCacheMisses = 'evaluationCacheMisses'
+    evaluationCacheMeanSamples = 'evaluationCacheMeanSamples' #simulations per cached entry
+    evaluationCacheMeanFitnessVariance = 'evaluationCacheMeanFitnessVariance' #fitness variance between samples of the same key, averaged over entries with more than one. Nonzero when the same start state and rates don't simulate identically
                 
     
@@ -0,0 +1,276 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+# Evaluates a whole population of motor rates from one starting robot state, optionally spread across worker processes.
+# Each worker holds its own copy of the imagination (terrain, ground, boundary and robots), built once when the worker starts.
+# The CI classes (RandomBest, SimpleDE, SimplePSO) run unchanged on a CandidatePopulation, since CandidateRobot offers the
+# same motor rate and fitness functions as RobotBody. Usage:
+#     evaluator = BatchFitnessEvaluator(legCode, terrainObjects, populationSize, numWorkers)
+#     population = CandidatePopulation(evaluator, templateRobot, populationSize)
+#     bestRates = population.runGenerations(SimpleDE(population.robots), realRobot.takeSnapshot(), numGens, numFrames)
+#     evaluator.close()
+# Passing cacheSize > 0 to BatchFitnessEvaluator makes it look up each candidate in an EvaluationCache before simulating it.
+
+import math
+import random
+import collections
+import pymunk
+import multiprocessing
+from pymunk import Vec2d
+from Worlds import ImaginationTwin
+from Enums import RunCI, Terrains, Constants, ShapeTypes, ShapeProperties, ProgramMetrics
+from WalkingRobot import restoreSnapshotToRobots
+from StatesAndSensors import SimulationClock
+
+class ImaginationScene(ImaginationTwin):#only the imagination part of an ImaginationTwin, headless, in a space of its own
+    def __init__(self, legCode, terrainObjects, numRobots):
+        super(ImaginationScene, self).__init__(legCode, RunCI.RANDOM, Terrains.FLAT_GROUND, None)
+        self.headless = True
+        self.terrainObjects = terrainObjects
+        self.numImaginaryRobots = numRobots
+
+    def initialize(self):#deliberately not calling the base class initialize, which would create the real world, its robot and the display
+        self.space = pymunk.Space()
+        self.space.gravity = (0.0, -1900.0)
+        self.imaginationSpace = self.space
+        self.fps = 50 #frames per second
+        self.iterations = 20
+        self.simClock = SimulationClock(self.fps) #counts this scene's sub-steps
+        self.createWorldBoundary(0, self.imaginaryWorldYOffset, self.imaginationColor)
+        self.createTerrainObjectsInSpace(self.terrainObjects, self.imaginaryWorldYOffset, self.space)
+        self.createGround(0, self.imaginaryWorldYOffset, self.imaginationGroundColor)
+        self.createImaginaryRobots()
+        self.configureBroadphase(self.space)
+        self.configureSleeping(self.space)
+        self.createSubstepController(self.imaginaryRobots)
+
+    def stepPhysics(self):
+        self.stepSpace(self.space)
+
+    def evaluate(self, startSnapshot, motorRateVectors, numFrames, offset=(0, 0)):#returns [(displacement, fitness), ...] in the order of motorRateVectors
+        results = []
+        offset = Vec2d(offset[0], offset[1] + self.imaginaryWorldYOffset) #the snapshot is of the real world
+        for batchStart in range(0, len(motorRateVectors), len(self.imaginaryRobots)):#as many vectors at a time as there are robots
+            batch = motorRateVectors[batchStart : batchStart + len(self.imaginaryRobots)]
+            restoreSnapshotToRobots(startSnapshot, self.imaginaryRobots, offset) #robots without a vector in this batch just stand still
+            for robo in self.imaginaryRobots:
+                robo.makeRobotDynamic()
+            buffer = self.imaginaryStateBuffer
+            buffer.saveGenStartPositions()
+            buffer.stopMotion()
+            buffer.motorRates[:len(batch)] = batch
+            buffer.startMotion(len(batch))
+            for _ in range(numFrames):
+                self.stepPhysics()
+            buffer.refreshChassisPositions()
+            displacements = buffer.getDisplacements()[:len(batch)].tolist(); fitnesses = buffer.getFitnesses()[:len(batch)].tolist()
+            results.extend([((dx, dy), fitness) for (dx, dy), fitness in zip(displacements, fitnesses)])
+            buffer.stopMotion()
+        return results
+
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+
+workerScene = None #each evaluation worker process's own ImaginationScene
+
+def initializeEvaluationWorker(legCode, terrainObjects, numRobots):
+    global workerScene
+    workerScene = ImaginationScene(legCode, terrainObjects, numRobots)
+    workerScene.initialize()
+
+def evaluateInWorker(job):#job = (startSnapshot, motorRateVectors, numFrames, offset)
+    return workerScene.evaluate(*job)
+
+class BatchFitnessEvaluator:#numWorkers of 0 or 1 evaluates in this process. None uses one worker per core. cacheSize > 0 keeps an EvaluationCache
+    def __init__(self, legCode, terrainObjects, populationSize, numWorkers=None, cacheSize=0, boundaryEdges=None, cacheMinSamples=1):#boundaryEdges is ImaginationTwin.getBoundaryEdges() of the world the snapshots come from
+        self.numWorkers = multiprocessing.cpu_count() if numWorkers == None else numWorkers
+        self.pool = None; self.scene = None
+        self.cache = EvaluationCache(cacheSize, terrainObjects, boundaryEdges, cacheMinSamples) if cacheSize > 0 else None
+        if self.numWorkers <= 1:
+            self.scene = ImaginationScene(legCode, terrainObjects, populationSize)
+            self.scene.initialize()
+        else:
+            robotsPerWorker = math.ceil(populationSize / self.numWorkers)
+            self.pool = multiprocessing.Pool(self.numWorkers, initializer=initializeEvaluationWorker, initargs=(legCode, terrainObjects, robotsPerWorker))
+
+    def evaluate(self, startSnapshot, motorRateVectors, numFrames, offset=(0, 0)):#returns [(displacement, fitness), ...] in the order of motorRateVectors
+        motorRateVectors = [list(rates) for rates in motorRateVectors]
+        offset = (offset[0], offset[1])
+        if self.cache == None: return self.simulate(startSnapshot, motorRateVectors, numFrames, offset)
+        #---only the rates the cache doesn't know are simulated. Cached results are the mean of their samples
+        stateKey = self.cache.getStateKey(startSnapshot, numFrames, offset)
+        keys = [self.cache.getKey(stateKey, rates) for rates in motorRateVectors]
+        results = [self.cache.get(key) for key in keys]
+        toSimulate = [i for i in range(len(results)) if results[i] == None]
+        simulated = self.simulate(startSnapshot, [motorRateVectors[i] for i in toSimulate], numFrames, offset)
+        for i, (displacement, fitness) in zip(toSimulate, simulated):
+            self.cache.add(keys[i], displacement, fitness)
+            results[i] = (displacement, fitness)
+        return results
+
+    def simulate(self, startSnapshot, motorRateVectors, numFrames, offset):
+        if len(motorRateVectors) == 0: return []
+        if self.pool == None: return self.scene.evaluate(startSnapshot, motorRateVectors, numFrames, offset)
+        chunkSize = math.ceil(len(motorRateVectors) / self.numWorkers)
+        jobs = []
+        for chunkStart in range(0, len(motorRateVectors), chunkSize):
+            jobs.append((startSnapshot, motorRateVectors[chunkStart : chunkStart + chunkSize], numFrames, offset))
+        results = []
+        for chunkResults in self.pool.map(evaluateInWorker, jobs):#map keeps the order of the jobs
+            results.extend(chunkResults)
+        return results
+
+    def close(self):
+        if self.pool != None:
+            self.pool.close(); self.pool.join()
+            self.pool = None
+
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+
+#Bounded store of past evaluation outcomes with least-recently-used eviction. The key is the quantised starting state of the
+#robot, a hash of the terrain around it, the motor rates and the frame count. Robot x positions and the terrain window are
+#relative to the chassis, so the same pose on the same bit of terrain is a hit wherever it happens. Fitness variance is kept
+#with Welford's online algorithm. An entry with fewer than minSamples samples is a miss, so it gets simulated again
+class EvaluationCache:
+    def __init__(self, maxEntries, terrainObjects, boundaryEdges=None, minSamples=1, positionQuantum=2, angleQuantum=0.05, velocityQuantum=5, terrainWindow=150):
+        self.maxEntries = maxEntries
+        self.minSamples = minSamples
+        self.positionQuantum = positionQuantum #pixels
+        self.angleQuantum = angleQuantum #radians
+        self.velocityQuantum = velocityQuantum #pixels or radians per second
+        self.terrainWindow = terrainWindow #pixels on either side of the chassis
+        self.entries = collections.OrderedDict() #key: [numSamples, meanDisplacementX, meanDisplacementY, meanFitness, fitnessM2]
+        self.terrain = [] #(col, shapeType, row, width, height) sorted by col
+        if terrainObjects != None:
+            for shapeType in terrainObjects:
+                for o in terrainObjects[shapeType]:
+                    self.terrain.append((o[ShapeProperties.COL], shapeType, o[ShapeProperties.ROW], o[ShapeProperties.WIDTH], o.get(ShapeProperties.HEIGHT, 0)))
+        self.terrain.sort()
+        self.boundaryXs, self.boundaryYs = boundaryEdges if boundaryEdges != None else ([], []) #walls and finish line, in the coordinates of the snapshots
+        self.hits = 0; self.misses = 0; self.evictions = 0
+
+    def quantise(self, value, quantum):
+        return int(round(value / quantum))
+
+    def getStateKey(self, startSnapshot, numFrames, offset=(0, 0)):#everything in the key except the motor rates, so it's computed once per batch
+        chassisX = startSnapshot.bodyStates[0][0][0] + offset[0]
+        state = []
+        for pos, angle, vel, angularVel in startSnapshot.bodyStates:
+            state.append((self.quantise(pos[0] + offset[0] - chassisX, self.positionQuantum), self.quantise(pos[1] + offset[1], self.positionQuantum), 
+                          self.quantise(angle, self.angleQuantum), self.quantise(vel[0], self.velocityQuantum), self.quantise(vel[1], self.velocityQuantum), 
+                          self.quantise(angularVel, self.velocityQuantum)))
+        return (tuple(state), tuple(round(rate, 3) for rate in startSnapshot.motorRates), self.getTerrainWindowHash(chassisX), self.getBoundaryKey(chassisX), numFrames)
+
+    def getBoundaryKey(self, chassisX):#the walls and finish line within the terrain window, relative to the chassis like the terrain. The floor and ceiling are absolute, like the body heights
+        xs = tuple(self.quantise(x - chassisX, self.positionQuantum) for x in self.boundaryXs if abs(x - chassisX) <= self.terrainWindow)
+        return (xs, tuple(self.quantise(y, self.positionQuantum) for y in self.boundaryYs))
+
+    def getTerrainWindowHash(self, chassisX):
+        windowStart = chassisX - self.terrainWindow; windowEnd = chassisX + self.terrainWindow
+        window = []
+        for col, shapeType, row, width, height in self.terrain:
+            if col + width < windowStart: continue
+            if col - width > windowEnd: break #sorted by col
+            window.append((self.quantise(col - chassisX, self.positionQuantum), shapeType, row, width, height))
+        return hash(tuple(window))
+
+    def getKey(self, stateKey, motorRates):
+        return (stateKey, tuple(round(rate, 3) for rate in motorRates))
+
+    def get(self, key):#(meanDisplacement, meanFitness) or None on a miss
+        entry = self.entries.get(key)
+        if entry == None or entry[0] < self.minSamples:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return ((entry[1], entry[2]), entry[3])
+
+    def add(self, key, displacement, fitness):
+        entry = self.entries.get(key)
+        if entry == None:
+            entry = [0, 0.0, 0.0, 0.0, 0.0]; self.entries[key] = entry
+        else: self.entries.move_to_end(key)
+        entry[0] += 1
+        entry[1] += (displacement[0] - entry[1]) / entry[0]
+        entry[2] += (displacement[1] - entry[2]) / entry[0]
+        delta = fitness - entry[3] #Welford
+        entry[3] += delta / entry[0]
+        entry[4] += delta * (fitness - entry[3])
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False); self.evictions += 1
+
+    def getFitnessVariance(self, key):#sample variance. None if the key isn't cached, 0 for a single sample
+        entry = self.entries.get(key)
+        if entry == None: return None
+        return entry[4] / (entry[0] - 1) if entry[0] > 1 else 0.0
+
+    def getMeanSamples(self):
+        return sum(entry[0] for entry in self.entries.values()) / len(self.entries) if len(self.entries) > 0 else 0.0
+
+    def getMeanFitnessVariance(self):#over the entries with more than one sample. None if there are none, as with minSamples of 1
+        variances = [self.getFitnessVariance(key) for key, entry in self.entries.items() if entry[0] > 1]
+        return sum(variances) / len(variances) if len(variances) > 0 else None
+
+    def getHitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def getMetrics(self):
+        return {ProgramMetrics.evaluationCacheHits: self.hits, ProgramMetrics.evaluationCacheMisses: self.misses,
+                ProgramMetrics.evaluationCacheMeanSamples: self.getMeanSamples(), ProgramMetrics.evaluationCacheMeanFitnessVariance: self.getMeanFitnessVariance()}
+
+    def getInfoString(self):
+        return 'Evaluation cache: '+str(self.hits)+' hits, '+str(self.misses)+' misses ('+str(round(100 * self.getHitRate(), 1))+'% hit rate), '+str(len(self.entries))+'/'+str(self.maxEntries)+' entries, '+str(self.evictions)+' evictions, '+str(round(self.getMeanSamples(), 2))+' samples per entry, mean fitness variance '+str(self.getMeanFitnessVariance())
+
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+
+class CandidateRobot:#stands in for a RobotBody in the CI classes. Its rates are evaluated by a BatchFitnessEvaluator instead of moving it in a world
+    def __init__(self, templateRobot):
+        self.legs = templateRobot.legs #only used for the number of legs and their motor rate ranges
+        self.limbMotorRates = []
+        self.displacement = (0, 0)
+        self.fitness = Constants.NOTFIT
+        self.setRandomLegMotorRates()
+    def setRandomLegMotorRates(self):
+        self.limbMotorRates = []
+        for leg in self.legs:
+            self.limbMotorRates.append(random.choice(leg.motor.legRateRange))
+        return self.limbMotorRates
+    def getMinMaxLegRates(self):
+        return min(self.legs[0].motor.legRateRange), max(self.legs[0].motor.legRateRange)
+    def setLegMotorRates(self, motorRates):#passing an empty list to this will set rates to zero
+        if len(motorRates) == 0:
+            motorRates = [0] * len(self.legs)
+        self.limbMotorRates = list(motorRates[:len(self.legs)])
+    def getLegMotorRates(self):
+        return self.limbMotorRates
+    def setResult(self, displacement, fitness):
+        self.displacement = displacement
+        self.fitness = fitness
+    def getFitness(self):
+        return self.fitness
+
+class CandidatePopulation:
+    def __init__(self, evaluator, templateRobot, size):
+        self.evaluator = evaluator
+        self.robots = [CandidateRobot(templateRobot) for _ in range(size)]
+
+    def evaluate(self, startSnapshot, numFrames, offset=(0, 0)):
+        results = self.evaluator.evaluate(startSnapshot, [robo.getLegMotorRates() for robo in self.robots], numFrames, offset)
+        for robo, (displacement, fitness) in zip(self.robots, results):
+            robo.setResult(displacement, fitness)
+        return results
+
+    def runGenerations(self, CI, startSnapshot, numGens, numFrames, offset=(0, 0)):#same order as Generation.run: the CI works on the previous generation's fitnesses, then the new rates are evaluated
+        CI.reinitialize()
+        for _ in range(numGens):
+            CI.run()
+            self.evaluate(startSnapshot, numFrames, offset)
+        return CI.motorRatesOfFittest
@@ -0,0 +1,186 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+# Always-on timing of a world's main loop. Each iteration is split into phases by lap(), costing one perf_counter call per phase:
+#     timers.begin()
+#     stepPhysics(); timers.lap(PhaseTimers.PHYSICS)
+#     ...
+#     timers.endIteration(runStepTheIterationStartedIn)
+# Body, shape, constraint and contact counts are sampled every few iterations, since counting walks the spaces.
+# TraceRecorder writes a Chrome/Perfetto trace (open it at ui.perfetto.dev or chrome://tracing) of RunStep transitions,
+# generations, motor runs, CI runs and stuck mode. Every event is on a wall clock timeline and on a simulated time timeline.
+
+import os
+import json
+import time
+import bisect
+from Enums import RunStep
+
+class PhaseTimers:
+    EVENTS = 'events'
+    PHYSICS = 'physics'
+    CAMERA = 'camera' #camera and robot colours
+    STATE_MACHINE = 'stateMachine' #the RunStep states, including the CI's generations
+    INFO_STRING = 'infoString'
+    DRAW = 'draw'
+    CLOCK_TICK = 'clockTick' #time spent waiting to cap the frame rate
+    INSTRUMENTATION = 'instrumentation' #sampling the counts
+    HISTOGRAM_EDGES_MS = [0.01, 0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 500] #bucket i counts laps (or iterations) shorter than edge i. The last bucket counts the rest
+
+    def __init__(self, sampleCountsEveryNIterations=200):
+        self.sampleCountsEveryNIterations = sampleCountsEveryNIterations
+        self.runStepNames = {getattr(RunStep, name): name for name in dir(RunStep) if not name.startswith('_')}
+        self.reset()
+
+    def reset(self):
+        self.phaseSeconds = {} #phase: cumulative wall seconds
+        self.phaseHistograms = {} #phase: number of laps in each HISTOGRAM_EDGES_MS bucket
+        self.runStepSeconds = {} #RunStep name: cumulative wall seconds of the iterations that started in it
+        self.runStepIterations = {} #RunStep name: iterations that started in it
+        self.runStepHistograms = {} #RunStep name: number of its iterations in each HISTOGRAM_EDGES_MS bucket
+        self.iterations = 0
+        self.countSums = {'bodies': 0, 'shapes': 0, 'constraints': 0, 'contacts': 0} #summed over the samples
+        self.countMaxima = {'bodies': 0, 'shapes': 0, 'constraints': 0, 'contacts': 0}
+        self.countSamples = 0
+        self.iterationStartTime = None
+        self.lapStartTime = None
+
+    def begin(self):
+        self.iterationStartTime = self.lapStartTime = time.perf_counter()
+
+    def lap(self, phase):#charges the time since the previous lap (or begin) to phase
+        now = time.perf_counter()
+        elapsed = now - self.lapStartTime
+        self.lapStartTime = now
+        if phase not in self.phaseSeconds:
+            self.phaseSeconds[phase] = 0
+            self.phaseHistograms[phase] = [0] * (len(PhaseTimers.HISTOGRAM_EDGES_MS) + 1)
+        self.phaseSeconds[phase] += elapsed
+        self.phaseHistograms[phase][bisect.bisect_right(PhaseTimers.HISTOGRAM_EDGES_MS, elapsed * 1000)] += 1
+
+    def endIteration(self, runStep):
+        name = self.runStepNames.get(runStep, str(runStep))
+        elapsed = time.perf_counter() - self.iterationStartTime
+        if name not in self.runStepSeconds:
+            self.runStepSeconds[name] = 0; self.runStepIterations[name] = 0
+            self.runStepHistograms[name] = [0] * (len(PhaseTimers.HISTOGRAM_EDGES_MS) + 1)
+        self.runStepSeconds[name] += elapsed
+        self.runStepIterations[name] += 1
+        self.runStepHistograms[name][bisect.bisect_right(PhaseTimers.HISTOGRAM_EDGES_MS, elapsed * 1000)] += 1
+        self.iterations += 1
+
+    def isCountSampleDue(self):
+        return self.iterations % self.sampleCountsEveryNIterations == 0
+
+    def sampleCounts(self, spaces):
+        counts = {'bodies': 0, 'shapes': 0, 'constraints': 0, 'contacts': 0}
+        for space in spaces:
+            counts['bodies'] += len(space.bodies)
+            counts['shapes'] += len(space.shapes)
+            counts['constraints'] += len(space.constraints)
+            arbiters = set()
+            for body in space.bodies: body.each_arbiter(lambda arbiter: arbiters.add(tuple(sorted(id(shape) for shape in arbiter.shapes)))) #an arbiter is seen once from each of its two bodies
+            counts['contacts'] += len(arbiters)
+        for name in counts:
+            self.countSums[name] += counts[name]
+            self.countMaxima[name] = max(self.countMaxima[name], counts[name])
+        self.countSamples += 1
+
+    def getSummary(self):#plain dicts and numbers, so it pickles into a runMetrics record
+        return {'iterations': self.iterations,
+                'phaseSeconds': dict(self.phaseSeconds),
+                'phaseHistogramEdgesMs': list(PhaseTimers.HISTOGRAM_EDGES_MS),
+                'phaseHistograms': {phase: list(h) for phase, h in self.phaseHistograms.items()},
+                'runStepSeconds': dict(self.runStepSeconds),
+                'runStepIterations': dict(self.runStepIterations),
+                'runStepHistograms': {name: list(h) for name, h in self.runStepHistograms.items()},
+                'meanCounts': {name: self.countSums[name] / self.countSamples if self.countSamples > 0 else 0 for name in self.countSums},
+                'maxCounts': dict(self.countMaxima)}
+
+    def getInfoString(self):#share of the loop's time per phase, for the on-screen stats
+        totalSeconds = sum(self.phaseSeconds.values())
+        if totalSeconds <= 0: return ''
+        return ', '.join([phase + ' ' + str(int(100 * seconds / totalSeconds)) + '%' for phase, seconds in sorted(self.phaseSeconds.items(), key=lambda item: -item[1])])
+
+    def getReportString(self):
+        s = 'Loop time per phase (s): ' + ', '.join([phase + ' ' + str(round(seconds, 2)) for phase, seconds in self.phaseSeconds.items()])
+        s += '\nLoop time per RunStep (s): ' + ', '.join([name + ' ' + str(round(seconds, 2)) for name, seconds in self.runStepSeconds.items()])
+        if self.countSamples > 0: s += '\nMean ' + ', '.join([name + ' ' + str(round(self.countSums[name] / self.countSamples, 1)) for name in self.countSums])
+        return s
+
+class TraceRecorder:#does nothing unless enabled, so the calls can stay in the code
+    WALL_CLOCK_PID = 1
+    SIMULATED_TIME_PID = 2
+    RUN_STEP = 'RunStep' #tracks, shown as threads of each timeline
+    IMAGINARY_GENERATION = 'Imaginary generations'
+    REAL_GENERATION = 'Real generations'
+    IMAGINARY_MOTORS = 'Imaginary motors'
+    REAL_MOTORS = 'Real motors'
+    CI = 'CI'
+    STUCK = 'Stuck mode'
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.simClock = None
+        self.events = []
+        self.trackIDs = {} #track name: tid
+        self.openSpans = {} #track name: names of the spans begun and not yet ended on it, innermost last
+        self.runStepNames = {getattr(RunStep, name): name for name in dir(RunStep) if not name.startswith('_')}
+        self.currentRunStep = None
+        self.wallStartTime = time.perf_counter()
+
+    def start(self, simClock):#call when the world starts running. Clears any previous recording
+        if not self.enabled: return
+        self.simClock = simClock
+        self.events = []; self.trackIDs = {}; self.openSpans = {}; self.currentRunStep = None
+        self.wallStartTime = time.perf_counter()
+        for pid, name in [(TraceRecorder.WALL_CLOCK_PID, 'Wall clock'), (TraceRecorder.SIMULATED_TIME_PID, 'Simulated time')]:
+            self.events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}})
+
+    def getTrackID(self, track):
+        if track not in self.trackIDs:
+            self.trackIDs[track] = len(self.trackIDs) + 1
+            self.openSpans[track] = []
+            for pid in [TraceRecorder.WALL_CLOCK_PID, TraceRecorder.SIMULATED_TIME_PID]:
+                self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': self.trackIDs[track], 'args': {'name': track}})
+        return self.trackIDs[track]
+
+    def addEvent(self, name, phase, track, args=None):#the same event on both timelines. Timestamps are in microseconds
+        tid = self.getTrackID(track)
+        wallSeconds = time.perf_counter() - self.wallStartTime
+        simulatedSeconds = self.simClock.now()
+        args = {} if args == None else dict(args)
+        args.update({'wallSeconds': round(wallSeconds, 6), 'simulatedSeconds': simulatedSeconds, 'physicsFrame': self.simClock.physicsFrames})
+        for pid, seconds in [(TraceRecorder.WALL_CLOCK_PID, wallSeconds), (TraceRecorder.SIMULATED_TIME_PID, simulatedSeconds)]:
+            event = {'name': name, 'cat': track, 'ph': phase, 'ts': seconds * 1e6, 'pid': pid, 'tid': tid, 'args': args}
+            if phase == 'i': event['s'] = 't' #an instant marks only its own track
+            self.events.append(event)
+
+    def begin(self, name, track, args=None):
+        if not self.enabled: return
+        self.addEvent(name, 'B', track, args)
+        self.openSpans[track].append(name)
+
+    def end(self, track, args=None):#ends the innermost open span of the track
+        if not self.enabled or len(self.openSpans.get(track, [])) == 0: return
+        self.addEvent(self.openSpans[track].pop(), 'E', track, args)
+
+    def instant(self, name, track, args=None):
+        if not self.enabled: return
+        self.addEvent(name, 'i', track, args)
+
+    def setRunStep(self, runStep):#ends the previous RunStep's span, if the RunStep changed
+        if not self.enabled or runStep == self.currentRunStep: return
+        self.end(TraceRecorder.RUN_STEP)
+        self.begin(self.runStepNames.get(runStep, str(runStep)), TraceRecorder.RUN_STEP)
+        self.currentRunStep = runStep
+
+    def save(self, directory, filename):#spans still open are ended first, so the trace shows them up to now
+        if not self.enabled: return
+        for track in self.openSpans:
+            while len(self.openSpans[track]) > 0: self.end(track)
+        if not os.path.exists(directory): os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, filename), 'w') as handle:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, handle)
+        print('Saved trace ', directory, filename, 'with', len(self.events), 'events')
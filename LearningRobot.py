@@ -13,12 +13,9 @@ import numpy as np
 from ComputationalIntelligence import Constants
 from collections import deque
 from StatesAndSensors import *
-import matplotlib.pyplot as plt
 from pymunk import Vec2d, shapes
-from pygame import _numpysurfarray
 from collections import defaultdict
-from WalkingRobot import Directions
-from matplotlib.animation import FuncAnimation
+from WalkingRobot import legDirections, getMomentForBox, getRange, getMorphologyTemplate
 from StatesAndSensors import TactileSensor
 
 class LegAppendage:
@@ -35,9 +32,11 @@ class LiveGraph:#to display sensory info of robot
         self.val = []; self.maxLen = 100
         for i in range(0, numSenses, 1):
             self.val.append(deque())
+        import matplotlib.pyplot as plt #only a robot that shows its senses needs matplotlib
         self.fig = plt.figure()
         self.fig.patch.set_facecolor('white')
     def showPlot(self, sensed, names):
+        import matplotlib.pyplot as plt
         i = 0
         plt.clf(); styles = ['-r','-b','-g','-c','-m','-y','-k','--r','--b','--g','--c','--m','--y','--k','-.r','-.b','-.g','-.c','-.m','-.y','-.k',':r',':b',':g',':c',':m',':y',':k']        
         for v in sensed:
@@ -53,9 +52,7 @@ class LiveGraph:#to display sensory info of robot
         
 class LearningRobotLegPart:#This is one leg part. Could be part A that's connected to the chassis or part B that's connected to part A
     def __init__(self, pymunkSpace, ownBodyShapeFilter, prevBody, prevBodyWidth, leftOrRight):
-        self.space = pymunk.Space()
-        d = Directions()
-        self.ori = d.getDirn()
+        self.ori = legDirections
         self.leftRight = self.ori['LEFT']  # default. Will be overridden in ctor. Whether the leg is at the right of the chassis or the left
         self.prevBodyXY = 0
         self.chassisWd = 0  # chassis width
@@ -78,7 +75,7 @@ class LearningRobotLegPart:#This is one leg part. Could be part A that's connect
         self.decimalPrecision = 2
     
     def __createLegPart__(self):
-        self.obj_body = pymunk.Body(self.legMass, pymunk.moment_for_box(self.legMass, (self.legWd, self.legHt)))
+        self.obj_body = pymunk.Body(self.legMass, getMomentForBox(self.legMass, (self.legWd, self.legHt)))
         if self.leftRight == self.ori['LEFT']: self.obj_body.position = self.prevBodyXY - ((self.chassisWd / 2) + (self.legWd / 2), 0)            
         if self.leftRight == self.ori['RIGHT']: self.obj_body.position = self.prevBodyXY + ((self.chassisWd / 2) + (self.legWd / 2), 0)
         self.leg_shape = pymunk.Poly.create_box(self.obj_body, (self.legWd, self.legHt))            
@@ -107,10 +104,9 @@ class LearningRobotLegPart:#This is one leg part. Could be part A that's connect
         self.space.add(self.pinJoint, self.motor)
         self.motor.rate = 0
         self.motor.max_force = 10000000
-        self.motor.legRateRange = np.linspace(-maxMotorRate, maxMotorRate, motorRateRangePieces) 
-        self.motor.legMovtDurationRange = np.linspace(minMovtDuration, maxMovtDuration, fractionOfSec)         
+        self.motor.legRateRange = getRange(-maxMotorRate, maxMotorRate, motorRateRangePieces) 
+        self.motor.legMovtDurationRange = getRange(minMovtDuration, maxMovtDuration, fractionOfSec)         
         
-    def updatePosition(self, offsetXY): self.obj_body.position = self.obj_body.position + offsetXY
     def __getNodeUID__(self, quadrant):        
         return (self.id, self.leftRight, quadrant)         
 #     def getLegAngle(self): return round(math.degrees(self.obj_body.angle)%360)        
@@ -122,8 +118,7 @@ class LearningRobot:#Used in the actual imagination world
         #self.actions = actionNet
         self.showImagination = showImagination
         self.ownBodyShapeFilter = pymunk.ShapeFilter(group=1) #to prevent collisions between robot body parts
-        d = Directions()  #leg at left or right of chassis
-        self.ori = d.getDirn()
+        self.ori = legDirections #leg at left or right of chassis
         self.chassisWd = 30 #chassis width 
         self.chassisHt = 20 #chassis height
         self.chassisMass = 5 #kg
@@ -181,41 +176,7 @@ class LearningRobot:#Used in the actual imagination world
     
     def setState(self, aState): self.state = aState
     def createLegs(self):
-        s = self.legsCode.split("#")
-        lt = s[0]; rt = s[1]; rt = rt[::-1]#reverse string rt
-
-        for s in lt.split(","):#number of left legs
-            if len(s) == 1:
-                leftLegA = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['LEFT']); 
-                leftLegA.id = LegAppendage.A; self.legs.append(leftLegA)
-            if len(s) == 2:
-                leftLegA = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['LEFT']); 
-                leftLegA.id = LegAppendage.A; self.legs.append(leftLegA)
-                leftLegB = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, leftLegA.obj_body, leftLegA.legWd, self.ori['LEFT']); 
-                leftLegB.id = LegAppendage.B; self.legs.append(leftLegB)                
-            if len(s) == 3:
-                leftLegA = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['LEFT']); 
-                leftLegA.id = LegAppendage.A; self.legs.append(leftLegA)
-                leftLegB = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, leftLegA.obj_body, leftLegA.legWd, self.ori['LEFT']); 
-                leftLegB.id = LegAppendage.B; self.legs.append(leftLegB)                 
-                leftLegC = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, leftLegB.obj_body, leftLegB.legWd, self.ori['LEFT']); 
-                leftLegC.id = LegAppendage.C; self.legs.append(leftLegC)                                 
-        for s in rt.split(","):#number of right legs
-            if len(s) == 1:
-                rightLegA = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['RIGHT']); 
-                rightLegA.id = LegAppendage.A; self.legs.append(rightLegA)
-            if len(s) == 2:
-                rightLegA = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['RIGHT']); 
-                rightLegA.id = LegAppendage.A; self.legs.append(rightLegA) 
-                rightLegB = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, rightLegA.obj_body, rightLegA.legWd, self.ori['RIGHT']); 
-                rightLegB.id = LegAppendage.B; self.legs.append(rightLegB)                        
-            if len(s) == 3:
-                rightLegA = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['RIGHT']); 
-                rightLegA.id = LegAppendage.A; self.legs.append(rightLegA)
-                rightLegB = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, rightLegA.obj_body, rightLegA.legWd, self.ori['RIGHT']); 
-                rightLegB.id = LegAppendage.B; self.legs.append(rightLegB)                 
-                rightLegC = LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, rightLegB.obj_body, rightLegB.legWd, self.ori['RIGHT']); 
-                rightLegC.id = LegAppendage.C; self.legs.append(rightLegC)                                 
+        self.legs = getMorphologyTemplate(self.legsCode).buildLegs(lambda prevBody, prevBodyWidth, leftOrRight, limbOrder: LearningRobotLegPart(self.world.space, self.ownBodyShapeFilter, prevBody, prevBodyWidth, leftOrRight), self.obj_body, self.chassisWd)
         id = 0
         for leg in self.legs:
             leg.id = id; id += 1
@@ -246,11 +207,6 @@ class LearningRobot:#Used in the actual imagination world
     def getNodeUID(self, legRef):        
         return legRef.__getNodeUID__(self.getQuadrantForLeg(legRef))    
     
-    def updatePosition(self, offsetXY):
-        self.obj_body.position += offsetXY 
-        self.obj_body.startPosition += offsetXY
-        for leg in self.legs: leg.updatePosition(offsetXY)
-
     def getLegQuadrants(self):
         quads = []
         for i in range(0, len(self.legs), 1):
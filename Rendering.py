@@ -0,0 +1,199 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import time
+import math
+import pymunk
+import numpy as np
+from pymunk import Vec2d
+from pymunk.space_debug_draw_options import SpaceDebugColor
+
+#pygame is imported only by the methods that draw, since headless worlds never need it and it's most of a world's import time
+
+class CameraDrawOptions(pymunk.SpaceDebugDrawOptions):#draws everything shifted by the camera's view offset, so moving the camera never moves a body
+    def __init__(self, surface):
+        import pymunk.pygame_util #imports pygame
+        super(CameraDrawOptions, self).__init__()
+        self.pygameOptions = pymunk.pygame_util.DrawOptions(surface) #does the drawing
+        self.viewOffset = Vec2d(0, 0) #added to world coordinates to get the drawn position
+
+    def color_for_shape(self, shape):#shape colours in this program are RGB. Pymunk wants RGBA, and would otherwise raise (and print) inside its draw callback for every shape
+        if hasattr(shape, 'color') and len(shape.color) == 3: return SpaceDebugColor(shape.color[0], shape.color[1], shape.color[2], 255)
+        return super(CameraDrawOptions, self).color_for_shape(shape)
+
+    def draw_circle(self, pos, angle, radius, outline_color, fill_color):
+        self.pygameOptions.draw_circle(pos + self.viewOffset, angle, radius, outline_color, fill_color)
+
+    def draw_segment(self, a, b, color):
+        self.pygameOptions.draw_segment(a + self.viewOffset, b + self.viewOffset, color)
+
+    def draw_fat_segment(self, a, b, radius, outline_color, fill_color):
+        self.pygameOptions.draw_fat_segment(a + self.viewOffset, b + self.viewOffset, radius, outline_color, fill_color)
+
+    def draw_polygon(self, verts, radius, outline_color, fill_color):
+        self.pygameOptions.draw_polygon([v + self.viewOffset for v in verts], radius, outline_color, fill_color)
+
+    def draw_dot(self, size, pos, color):
+        self.pygameOptions.draw_dot(size, pos + self.viewOffset, color)
+
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+
+#Draws a world's spaces onto its screen. Shapes the world reports as static (boundaries and terrain) are drawn once onto a
+#background surface, which is redrawn only when the camera moves or the static shapes change. Everything else is drawn each
+#rendered frame, skipping shapes outside the view. Text is rendered only when it changes. Rendering can be decimated to every
+#Nth physics frame, or paced to a display FPS of its own, in which case the physics isn't throttled at all
+class Renderer:
+    def __init__(self, screen, font, renderEveryNthFrame=1, displayFPS=None):
+        import pygame
+        from pygame.color import THECOLORS
+        self.screen = screen
+        self.font = font
+        self.renderEveryNthFrame = max(1, renderEveryNthFrame)
+        self.displayFPS = displayFPS #None to render by frame count
+        self.backgroundColor = (30, 30, 30)
+        self.textColor = THECOLORS["gray"]
+        self.lineSeparation = 15
+        self.draw_options = CameraDrawOptions(self.screen)
+        self.draw_options.constraint_color = 140,140,140
+        self.background = pygame.Surface(self.screen.get_size()).convert()
+        self.backgroundOptions = CameraDrawOptions(self.background)
+        self.backgroundSignature = None #what the background was drawn for
+        self.textSurfaces = [] #(string, surface) per line of text
+        self.frameNumber = 0
+        self.lastRenderTime = 0
+        self.renderedLastFrame = False
+        self.renderedFrames = 0; self.skippedFrames = 0; self.culledShapes = 0
+
+    def isRenderDue(self):#call once per physics frame
+        self.frameNumber += 1
+        if self.displayFPS != None: 
+            due = time.time() - self.lastRenderTime >= 1.0 / self.displayFPS
+        else:
+            due = self.frameNumber % self.renderEveryNthFrame == 0
+        self.renderedLastFrame = due
+        if not due: self.skippedFrames += 1
+        return due
+
+    def isThrottled(self):#whether the world loop should still be capped at the physics fps on rendered frames
+        return self.displayFPS == None
+
+    def render(self, spaces, staticShapes, viewOffset, text, statsPos=(0, 0), overlay=None):#overlay is drawn over the shapes, e.g. a SensedWorldOverlay
+        self.lastRenderTime = time.time(); self.renderedFrames += 1
+        self.draw_options.viewOffset = viewOffset
+        viewBB = self.getViewBB(viewOffset)
+        self.updateBackground(staticShapes, viewOffset, viewBB)
+        self.screen.blit(self.background, (0, 0))
+        staticIDs = set(id(shape) for shape in staticShapes)
+        for space in spaces:
+            for shape in space.shapes:
+                if id(shape) in staticIDs: continue
+                if not viewBB.intersects(shape.bb): 
+                    self.culledShapes += 1; continue
+                self.drawShape(shape, self.draw_options)
+            for constraint in space.constraints:
+                if isinstance(constraint, pymunk.PinJoint): self.drawPinJoint(constraint, viewBB)
+        if overlay != None: overlay.draw(self.screen, self.draw_options, viewOffset)
+        self.drawText(text, statsPos)
+        import pygame
+        pygame.display.flip()#flip the display buffer
+
+    def getViewBB(self, viewOffset):#the part of the world that's on screen, in world coordinates
+        width, height = self.screen.get_size()
+        return pymunk.BB(-viewOffset[0], -viewOffset[1], width - viewOffset[0], height - viewOffset[1])
+
+    def updateBackground(self, staticShapes, viewOffset, viewBB):
+        signature = (len(staticShapes), viewOffset[0], viewOffset[1])
+        if signature == self.backgroundSignature: return
+        self.backgroundSignature = signature
+        self.backgroundOptions.viewOffset = Vec2d(viewOffset[0], viewOffset[1])
+        self.background.fill(self.backgroundColor)
+        for shape in staticShapes:
+            if viewBB.intersects(shape.bb): self.drawShape(shape, self.backgroundOptions)
+
+    def drawShape(self, shape, options):#the same drawing debug_draw does, for one shape
+        fill = options.color_for_shape(shape)
+        outline = options.shape_outline_color
+        body = shape.body
+        if isinstance(shape, pymunk.Poly):
+            options.draw_polygon([body.local_to_world(v) for v in shape.get_vertices()], shape.radius, outline, fill)
+        elif isinstance(shape, pymunk.Circle):
+            options.draw_circle(body.local_to_world(shape.offset), body.angle, shape.radius, outline, fill)
+        elif isinstance(shape, pymunk.Segment):
+            options.draw_fat_segment(body.local_to_world(shape.a), body.local_to_world(shape.b), shape.radius, outline, fill)
+
+    def drawPinJoint(self, joint, viewBB):
+        a = joint.a.local_to_world(joint.anchor_a); b = joint.b.local_to_world(joint.anchor_b)
+        if not (viewBB.contains_vect(a) or viewBB.contains_vect(b)): return
+        color = self.draw_options.constraint_color
+        self.draw_options.draw_dot(5, a, color); self.draw_options.draw_dot(5, b, color)
+        self.draw_options.draw_segment(a, b, color)
+
+    def drawText(self, text, statsPos):#a string or a list of strings, one per line. Each line is rendered again only if it changed
+        lines = [text] if isinstance(text, str) else text
+        del self.textSurfaces[len(lines):]
+        for i in range(len(lines)):
+            if i == len(self.textSurfaces): self.textSurfaces.append((None, None))
+            if self.textSurfaces[i][0] != lines[i]:
+                self.textSurfaces[i] = (lines[i], self.font.render(lines[i], 1, self.textColor))
+            self.screen.blit(self.textSurfaces[i][1], (statsPos[0], statsPos[1] + i * self.lineSeparation))
+
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+#------------------------------------------------------------------------------------------------
+
+#What a blind robot has felt, drawn straight onto the screen instead of being added to a space as bodies, so the physics
+#doesn't grow as the robot explores. Sensed points come from an OccupancyGrid and are written into the screen's pixels.
+#Sensors set markers (boxes at a position and angle) that are drawn each rendered frame until removed
+class SensedWorldOverlay:
+    def __init__(self, occupancyGrid, yOffset, pointColor=(200, 200, 200)):
+        self.occupancyGrid = occupancyGrid
+        self.yOffset = yOffset #sensed points are drawn this much above where they were felt, in the imagination part of the world
+        self.pointColor = pointColor
+        self.showPoints = False #set by a TactileSensor of a robot that shows its imagination. Points are still marked in occupancyGrid either way
+        self.markers = {} #key: (world position, (width, height), angle in radians, colour)
+        self.pointMask = None #screen pixels holding a sensed point
+        self.pointMaskSignature = None #what pointMask was computed for
+
+    def setMarker(self, key, position, size, angle, color):#key is anything hashable, typically the sensor that owns the marker
+        self.markers[key] = (position, size, angle, color)
+
+    def removeMarker(self, key):
+        self.markers.pop(key, None)
+
+    def clear(self):
+        self.markers = {}; self.pointMask = None; self.pointMaskSignature = None
+
+    def draw(self, surface, options, viewOffset):
+        if self.showPoints: self.drawPoints(surface, viewOffset)
+        for position, size, angle, color in self.markers.values():
+            options.draw_polygon(self.getBoxVertices(position, size, angle), 0, options.shape_outline_color, SpaceDebugColor(color[0], color[1], color[2], 255))
+
+    def drawPoints(self, surface, viewOffset):#recomputes which pixels are sensed only when more points were sensed or the camera moved
+        width, height = surface.get_size()
+        signature = (self.occupancyGrid.numOccupied, viewOffset[0], viewOffset[1], width, height)
+        if signature != self.pointMaskSignature:
+            self.pointMaskSignature = signature
+            self.pointMask = self.getPointMask(width, height, int(viewOffset[0]), int(viewOffset[1]))
+        if self.pointMask is None: return
+        import pygame.surfarray
+        pixels = pygame.surfarray.pixels3d(surface) #indexed [screen x, screen y]. The surface stays locked until pixels is deleted
+        pixels[self.pointMask] = self.pointColor
+        del pixels
+
+    def getPointMask(self, width, height, offsetX, offsetY):#screen x = world x + offsetX, screen y = height - (world y + yOffset + offsetY), as pymunk draws with positive y up
+        grid = self.occupancyGrid.getLevel(1)
+        worldX0 = max(0, -offsetX); worldX1 = min(grid.shape[0], width - offsetX)
+        worldY0 = max(0, 1 - self.yOffset - offsetY); worldY1 = min(grid.shape[1], height + 1 - self.yOffset - offsetY)
+        if worldX0 >= worldX1 or worldY0 >= worldY1: return None
+        mask = np.zeros((width, height), dtype=bool)
+        screenX0 = worldX0 + offsetX
+        screenY0 = height - (worldY1 - 1 + self.yOffset + offsetY) #the highest visible world row is the lowest screen row
+        mask[screenX0: screenX0 + worldX1 - worldX0, screenY0: screenY0 + worldY1 - worldY0] = grid[worldX0:worldX1, worldY0:worldY1][:, ::-1] == 1
+        return mask if mask.any() else None
+
+    def getBoxVertices(self, position, size, angle):
+        halfWidth = size[0] / 2.0; halfHeight = size[1] / 2.0; cos = math.cos(angle); sin = math.sin(angle)
+        return [Vec2d(position[0] + x * cos - y * sin, position[1] + x * sin + y * cos) for x, y in [(-halfWidth, -halfHeight), (halfWidth, -halfHeight), (halfWidth, halfHeight), (-halfWidth, halfHeight)]]
@@ -6,22 +6,186 @@ import math
 import time
 import pymunk
 import random
+import collections
+import numpy as np
 from pymunk import Vec2d
+from Enums import ProgramMetrics
 
 class RunState:
     DONE = 0
     RUNNING = 1
 
+class SimulationClock:#counts physics frames and generations, so time metrics don't depend on frame pacing, machine load or rendering cost
+    def __init__(self, fps):
+        self.fps = fps
+        self.reset()
+    def reset(self):
+        self.physicsFrames = 0
+        self.realFrames = 0 #frames during which the real robot was moving or being evaluated
+        self.realGenerations = 0
+        self.imaginaryGenerations = 0
+        self.physicsSubsteps = 0 #space.step calls, summed over every space
+        self.substepHistogram = collections.Counter() #number of sub-steps a space was stepped in for a frame: how often that happened
+        self.sleepingBodies = 0 #sleeping bodies counted after each space step, summed over the run
+        self.sleepCountedSteps = 0 #space steps after which sleeping bodies were counted
+        self.wallStartTime = time.time()
+    def tick(self, isRealFrame):#call once per physics frame (not once per sub-step)
+        self.physicsFrames += 1
+        if isRealFrame: self.realFrames += 1
+    def advance(self, numFrames, isRealFrame):#for frames simulated elsewhere, such as by fitness evaluation workers
+        self.physicsFrames += numFrames
+        if isRealFrame: self.realFrames += numFrames
+    def countSubsteps(self, substeps):#call once per space stepped in a frame
+        self.physicsSubsteps += substeps
+        self.substepHistogram[substeps] += 1
+    def getMeanSubsteps(self):#per space per frame
+        numSpaceSteps = sum(self.substepHistogram.values())
+        return self.physicsSubsteps / numSpaceSteps if numSpaceSteps > 0 else 0
+    def countSleepingBodies(self, numSleeping):#call once per space stepped in a frame, when bodies are allowed to sleep
+        self.sleepingBodies += numSleeping
+        self.sleepCountedSteps += 1
+    def getMeanSleepingBodies(self):#per space per frame
+        return self.sleepingBodies / self.sleepCountedSteps if self.sleepCountedSteps > 0 else 0
+    def countGeneration(self, isReal):
+        if isReal: self.realGenerations += 1
+        else: self.imaginaryGenerations += 1
+    def now(self):#simulated seconds
+        return self.physicsFrames / self.fps
+    def getRealTime(self):#simulated seconds of real robot activity
+        return self.realFrames / self.fps
+    def getWallTime(self):
+        return time.time() - self.wallStartTime
+    def getMetrics(self):
+        return {ProgramMetrics.simulatedTimeToCrossFinishLine: self.now(),
+                ProgramMetrics.simulatedRealRobotTime: self.getRealTime(),
+                ProgramMetrics.physicsFrames: self.physicsFrames,
+                ProgramMetrics.realGenerations: self.realGenerations,
+                ProgramMetrics.imaginaryGenerations: self.imaginaryGenerations,
+                ProgramMetrics.physicsSubsteps: self.physicsSubsteps,
+                ProgramMetrics.meanSubsteps: self.getMeanSubsteps(),
+                ProgramMetrics.meanSleepingBodies: self.getMeanSleepingBodies()}
+
+class SubstepController:#picks how many sub-steps a space is stepped in for the next frame. Always maxSubsteps unless adaptive
+    def __init__(self, maxSubsteps, minSubsteps, adaptive, bodyRadius, maxTravelPerSubstep=1.0, substepsPerContact=4, decideEveryNFrames=2):
+        self.maxSubsteps = maxSubsteps
+        self.minSubsteps = minSubsteps #accuracy floor. No frame gets fewer sub-steps than this
+        self.adaptive = adaptive
+        self.bodyRadius = bodyRadius #distance from a body's centre to its farthest point, for how far a spinning body's edge travels
+        self.maxTravelPerSubstep = maxTravelPerSubstep #pixels any body point may move in one sub-step
+        self.substepsPerContact = substepsPerContact #added per touching shape pair per dynamic body
+        self.decideEveryNFrames = decideEveryNFrames #the decision is reused for this many frames, since scanning the bodies costs about as much as a few sub-steps
+        self.touchingPairs = {} #space: shape pairs in contact, kept up to date by a collision handler
+        self.substeps = {} #space: sub-steps last decided
+        self.framesSinceDecision = {} #space: frames the last decision was used for
+        
+    def step(self, space, frameDuration, contactRecorder=None):#one frame of physics. contactRecorder's handler runs only in the last sub-step, so its callbacks scale with contacts, not contacts x sub-steps
+        substeps = self.getSubsteps(space, frameDuration)
+        dt = frameDuration / float(substeps)
+        for i in range(substeps - 1): #iterations to get a more stable simulation
+            space.step(dt)
+        if contactRecorder != None: contactRecorder.startRecording(space)
+        space.step(dt)
+        if contactRecorder != None: contactRecorder.stopRecording(space)
+        return substeps
+        
+    def getSubsteps(self, space, frameDuration):#judged from the state the previous frame left the space in
+        if not self.adaptive: return self.maxSubsteps
+        if space not in self.touchingPairs: self.watchContacts(space)
+        self.framesSinceDecision[space] += 1
+        if self.framesSinceDecision[space] >= self.decideEveryNFrames:
+            self.substeps[space] = self.decideSubsteps(space, frameDuration)
+            self.framesSinceDecision[space] = 0
+        return self.substeps[space]
+    
+    def decideSubsteps(self, space, frameDuration):
+        maxSpeed = 0; numDynamicBodies = 0
+        for body in space.bodies:
+            if body.body_type != pymunk.Body.DYNAMIC: continue #static and kinematic bodies (frozen robots, sensor markers) don't need solving
+            maxSpeed = max(maxSpeed, body.velocity.length + abs(body.angular_velocity) * self.bodyRadius)
+            numDynamicBodies += 1
+        if numDynamicBodies == 0: return self.minSubsteps
+        substeps = max(math.ceil(maxSpeed * frameDuration / self.maxTravelPerSubstep), 
+                       self.minSubsteps + math.ceil(self.substepsPerContact * self.touchingPairs[space] / numDynamicBodies))
+        return min(max(substeps, self.minSubsteps), self.maxSubsteps)
+    
+    def watchContacts(self, space):#counts touching pairs as contacts begin and end, instead of walking every body's arbiters each frame
+        self.touchingPairs[space] = 0
+        self.substeps[space] = self.maxSubsteps #until the first decision
+        self.framesSinceDecision[space] = self.decideEveryNFrames - 1
+        handler = space.add_default_collision_handler()
+        handler.begin = self.beginContact
+        handler.separate = self.separateContact
+        
+    def beginContact(self, arbiter, space, data):
+        self.touchingPairs[space] += 1
+        return True #let the collision happen
+    
+    def separateContact(self, arbiter, space, data):
+        self.touchingPairs[space] = max(0, self.touchingPairs[space] - 1) #pairs that began before the handler was added also separate
+
+class ContactRecorder:#contacts of robot parts, written by one collision handler per space into arrays indexed [robotIndex, partIndex]
+    COLLISION_TYPE = 1 #given to every watched part's shape. Terrain and boundaries keep pymunk's default of 0
+    def __init__(self, maxPointsPerPart=4):
+        self.maxPointsPerPart = maxPointsPerPart #contact positions kept per part. Counts include the points beyond this
+        self.watchedSpaces = []
+        self.postSolveFuncs = {} #space: (handler, recordContact's callback, Chipmunk's do-nothing callback). Swapped in and out so Python isn't called on the other sub-steps
+        self.robots = []
+        self.numParts = 0
+        self.allocate(0, 0)
+    def allocate(self, numRobots, numParts):
+        self.touchCounts = np.zeros((numRobots, numParts), dtype=np.int32) #shapes each part touches
+        self.pointCounts = np.zeros((numRobots, numParts), dtype=np.int32) #contact points of each part, summed over the shapes it touches
+        self.points = np.zeros((numRobots, numParts, self.maxPointsPerPart, 2)) #x, y of the first maxPointsPerPart contact points
+    def watch(self, space, robots, includeChassis=False):#part 0 is the chassis if includeChassis, followed by the legs. Call once the robots exist
+        if space not in self.watchedSpaces:
+            self.watchedSpaces.append(space)
+            handler = space.add_wildcard_collision_handler(ContactRecorder.COLLISION_TYPE) #post_solve, since begin and separate of a wildcard aren't called once SubstepController sets the default handler's
+            doNothing = handler._handler.postSolveFunc #what a new wildcard handler starts with. pymunk 5.7 has no way to unset a callback
+            handler.post_solve = self.recordContact #the handler keeps the cffi callback alive
+            self.postSolveFuncs[space] = (handler, handler._handler.postSolveFunc, doNothing)
+            handler._handler.postSolveFunc = doNothing #until startRecording
+        for robo in robots:
+            parts = ([(robo, robo.chassis_shape)] if includeChassis else []) + [(leg, leg.leg_shape) for leg in robo.legs]
+            robo.contactRecorder = self; robo.robotIndex = len(self.robots)
+            for partIndex in range(len(parts)):
+                part, shape = parts[partIndex]
+                shape.collision_type = ContactRecorder.COLLISION_TYPE
+                shape.robotIndex = part.robotIndex = robo.robotIndex; shape.partIndex = part.partIndex = partIndex
+            self.robots.append(robo); self.numParts = max(self.numParts, len(parts))
+        self.allocate(len(self.robots), self.numParts)
+    def startRecording(self, space):#call just before the last sub-step of a frame, so the arrays hold the contacts that step ended with
+        self.touchCounts[:] = 0; self.pointCounts[:] = 0
+        if space in self.postSolveFuncs:
+            handler, recordFunc, doNothing = self.postSolveFuncs[space]
+            handler._handler.postSolveFunc = recordFunc
+    def stopRecording(self, space):
+        if space in self.postSolveFuncs:
+            handler, recordFunc, doNothing = self.postSolveFuncs[space]
+            handler._handler.postSolveFunc = doNothing
+    def recordContact(self, arbiter, space, data):#shapes[0] is the watched part. A pair of watched parts calls this once for each
+        shape = arbiter.shapes[0]; r = shape.robotIndex; p = shape.partIndex
+        n = self.pointCounts[r, p]
+        for point in arbiter.contact_point_set.points:
+            if n < self.maxPointsPerPart: self.points[r, p, n] = point.point_b
+            n += 1
+        self.pointCounts[r, p] = n
+        self.touchCounts[r, p] += 1
+    def getPointCounts(self, robotIndex):#contact points per part. pointCounts holds every robot's at once
+        return self.pointCounts[robotIndex]
+    def getPoints(self, robotIndex, partIndex):#(x, y) of the part's recorded contact points
+        return self.points[robotIndex, partIndex, :min(self.pointCounts[robotIndex, partIndex], self.maxPointsPerPart)]
+
 class RandomMovement:    
-    def __init__(self, leg, motorRate, duration):
+    def __init__(self, leg, motorRate, duration, clock):
         self.runState = RunState.RUNNING
         self.leg = leg
         self.leg.motor.rate = motorRate
-        self.startTime = time.time()
+        self.clock = clock #SimulationClock, so durations are the same whether or not the world is throttled
+        self.startTime = self.clock.now()
         self.duration = duration
     def run(self):
         if self.runState == RunState.RUNNING:
-            if time.time() - self.startTime > self.duration:
+            if self.clock.now() - self.startTime > self.duration:
                 self.leg.motor.rate = 0
                 self.runState = RunState.DONE
     
@@ -47,7 +211,7 @@ class BrainState_RandomMovement:#used by Heaven World
         leg.currentRate = random.choice(leg.motor.legRateRange)
         leg.currentDura = random.choice(leg.motor.legMovtDurationRange)
         leg.oldNode = self.bodyPart.getNodeUID(leg)#node before leg starts moving     
-        leg.state = RandomMovement(leg, leg.currentRate, leg.currentDura)                    
+        leg.state = RandomMovement(leg, leg.currentRate, leg.currentDura, self.bodyPart.world.simClock)                    
     def run(self):
         for leg in self.bodyPart.legs:
             leg.state.run()
@@ -67,7 +231,7 @@ class BrainState_WhatHappensIfITryThis:
         leg.currentRate = random.choice(leg.motor.legRateRange)
         leg.currentDura = random.choice(leg.motor.legMovtDurationRange)
         leg.oldNode = self.robo.getNodeUID(leg)#node before leg starts moving     
-        leg.state = RandomMovement(leg, leg.currentRate, leg.currentDura)                    
+        leg.state = RandomMovement(leg, leg.currentRate, leg.currentDura, self.robo.world.simClock)                    
     def run(self):
         for leg in self.robo.legs:
             leg.state.run()
@@ -99,78 +263,73 @@ class BodyAngleSensor:
         self.world = world; self.robo = robo; self.showImagination = showImagination
         self.prevAngle = robo.getBodyAngle(); 
         self.angleChange = None; self.decimalAccuracy = 2
-        self.addedObjects = []
-        if showImagination:
-            sz = 1; mass = 1; moment = 0; pos = self.robo.getPosition()
-            self.ob_body = pymunk.Body(mass, moment)
-            self.ob_body.body_type = pymunk.Body.KINEMATIC
-            self.ob_body.position = Vec2d(pos[0], pos[1] + self.world.imaginaryWorldYOffset)
-            ob_shape = pymunk.Poly.create_box(self.ob_body, (self.robo.chassisWd, sz)); ob_shape.color = (110, 110, 110)
-            self.world.space.add(self.ob_body, ob_shape); self.addedObjects.append(self.ob_body); self.addedObjects.append(ob_shape)        
+        self.markerColor = (110, 110, 110)
+        if showImagination: self.setMarker(self.prevAngle)
     def get(self): 
         ang = self.robo.getBodyAngle()
         self.angleChange = (self.prevAngle - ang) / 360.0 #normalizing
         self.prevAngle = ang
-        if self.showImagination:
-            self.ob_body.angle = math.radians(ang); pos = self.robo.getPosition()
-            self.ob_body.position = Vec2d(pos[0], pos[1]+self.world.imaginaryWorldYOffset)
+        if self.showImagination: self.setMarker(ang)
         return round(self.angleChange)
+    def setMarker(self, ang):#drawn by the world's overlay, so no marker body is added to the space
+        sz = 1; pos = self.robo.getPosition()
+        self.world.overlay.setMarker(self, Vec2d(pos[0], pos[1]+self.world.imaginaryWorldYOffset), (self.robo.chassisWd, sz), math.radians(ang), self.markerColor)
     def delete(self):
-        for ob in self.addedObjects: 
-            self.world.space.remove(ob)
-        self.addedObjects[:] = []
+        if self.showImagination: self.world.overlay.removeMarker(self)
     
 class LegTipQuadrantSensor:
     def __init__(self, world, robo, leg, showImagination):
         self.world = world; self.robo = robo; self.leg = leg; self.showImagination = showImagination
-        self.addedObjects = []
-        if self.showImagination:
-            sz = 1; mass = 1; moment = 0; pos = leg.getTip()
-            self.tip_body = pymunk.Body(mass, moment); self.tip_body.body_type = pymunk.Body.KINEMATIC
-            self.tip_body.position = Vec2d(pos[0], pos[1]+self.world.imaginaryWorldYOffset)
-            tip_shape = pymunk.Poly.create_box(self.tip_body, (sz, sz)); tip_shape.color = (255, 0, 0)  
-            self.world.space.add(self.tip_body, tip_shape); self.addedObjects.append(self.tip_body); self.addedObjects.append(tip_shape)        
+        self.markerColor = (255, 0, 0)
+        if self.showImagination: self.setMarker()
     def get(self):  
-        if self.showImagination:       
-            pos = self.leg.getTip()
-            self.tip_body.position = Vec2d(pos[0], pos[1]+self.world.imaginaryWorldYOffset)
+        if self.showImagination: self.setMarker()
         return self.robo.getQuadrantForLeg(self.leg)
+    def setMarker(self):#drawn by the world's overlay, so no marker body is added to the space
+        sz = 1; pos = self.leg.getTip()
+        self.world.overlay.setMarker(self, Vec2d(pos[0], pos[1]+self.world.imaginaryWorldYOffset), (sz, sz), 0, self.markerColor)
     def delete(self):
-        for ob in self.addedObjects: 
-            self.world.space.remove(ob)
-        self.addedObjects[:] = []
+        if self.showImagination: self.world.overlay.removeMarker(self)
         
+class OccupancyGrid:#which integer points of the world were sensed. Coarser levels mark the cells of cellSize x cellSize points that hold any sensed point
+    def __init__(self, width, height, cellSizes=(1, 4, 16, 64)):
+        self.width = width; self.height = height
+        self.cellSizes = sorted(cellSizes)
+        if self.cellSizes[0] != 1: self.cellSizes.insert(0, 1)
+        self.levels = {s: np.zeros((-(-width // s), -(-height // s)), dtype=np.uint8) for s in self.cellSizes} #cellSize: grid indexed [x // cellSize, y // cellSize]
+        self.numOccupied = 0
+    def markPoints(self, points):#marks the points in bulk and returns the (x, y) of the ones that weren't marked before. Points outside the world are ignored
+        if len(points) == 0: return []
+        xy = np.array(list(points), dtype=np.int64).reshape(-1, 2)
+        xy = xy[(xy[:, 0] >= 0) & (xy[:, 0] < self.width) & (xy[:, 1] >= 0) & (xy[:, 1] < self.height)]
+        xy = np.unique(xy[self.levels[1][xy[:, 0], xy[:, 1]] == 0], axis=0)
+        if len(xy) == 0: return []
+        for s in self.cellSizes: self.levels[s][xy[:, 0] // s, xy[:, 1] // s] = 1
+        self.numOccupied += len(xy)
+        return [(int(x), int(y)) for x, y in xy]
+    def isOccupied(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and self.levels[1][x, y] == 1
+    def isRegionOccupied(self, x0, y0, x1, y1, cellSize=1):#whether any point in x0 <= x < x1, y0 <= y < y1 was sensed, checked at the resolution of cellSize (coarser is faster, and may include neighbouring points)
+        grid = self.levels[cellSize]
+        return bool(grid[max(x0, 0) // cellSize: -(-min(x1, self.width) // cellSize), max(y0, 0) // cellSize: -(-min(y1, self.height) // cellSize)].any())
+    def getLevel(self, cellSize):#the grid at cellSize resolution. Do not modify it
+        return self.levels[cellSize]
+    def getOccupiedPoints(self, cellSize=1):#(x, y) of the lower left corner of each occupied cell
+        return np.argwhere(self.levels[cellSize] == 1) * cellSize
+    def clear(self):
+        for s in self.cellSizes: self.levels[s][:] = 0
+        self.numOccupied = 0
+    def getMemoryBytes(self):
+        return sum([grid.nbytes for grid in self.levels.values()])
+
 class TactileSensor:
     def __init__(self, world, bodyPart, showImagination):
         self.world = world; self.bodyPart = bodyPart; self.showImagination = showImagination
         self.points = set()
-        self.addedObjects = []
-    def get(self):
-        self.bodyPart.obj_body.each_arbiter(self.contactInfo)#invoke callback fn
-        for p in self.points:
-            x = p[0]; y = p[1]; sz = 1; mass = 1; moment = 0
-            if self.world.sensedObjects[x][y] == 0: #point is not in imagination
-                self.world.sensedObjects[x][y] = 1
-                if self.showImagination:
-                    ob_body = pymunk.Body(mass, moment)
-                    ob_body.body_type = pymunk.Body.KINEMATIC
-                    ob_body.position = Vec2d(x, self.world.imaginaryWorldYOffset+y)
-                    ob_shape = pymunk.Poly.create_box(ob_body, (sz, sz))
-                    self.world.space.add(ob_body, ob_shape); self.addedObjects.append(ob_body); self.addedObjects.append(ob_shape)
+        if showImagination: self.world.overlay.showPoints = True #sensed points are drawn only for robots that show their imagination
+    def get(self):#the world's ContactRecorder records the contacts while the space steps, so no arbiters are walked here
+        self.points = set([(round(float(x)), round(float(y))) for x, y in self.world.contactRecorder.getPoints(self.bodyPart.robotIndex, self.bodyPart.partIndex)])
+        self.world.sensedObjects.markPoints(self.points) #the world's overlay draws the sensed points from sensedObjects, so none are added to the space
         return self.points
-    def contactInfo(self, arbiter):#callback fn  
-#         print(arbiter.shapes)#gives the type of objects that are colliding [chassis,line seg]
-#         print(arbiter.contact_point_set.normal)#direction of contact
-#         print(arbiter.contact_point_set.points[0].distance)#distance is the penetration distance of the two shapes. Overlapping means it will be negative. This value is calculated as dot(point2 - point1), normal) and is ignored when you set the Arbiter.contact_point_set.
-#         print(arbiter.total_impulse)#Returns the impulse that was applied this step to resolve the collision Vec2d(xImpulse, yImpulse)
-#         print(arbiter.contact_point_set.points[0].point_a)#point_a and point_b are the contact position on the surface of each shape.
-#         print(arbiter.contact_point_set.points[0].point_b)
-        self.points = set()
-        for p in arbiter.contact_point_set.points:
-            self.points.add((round(p.point_b[0]), round(p.point_b[1])))
     def delete(self):
-        for ob in self.addedObjects:
-            self.world.space.remove(ob)
-        self.addedObjects[:] = []
-        
-    
\ No newline at end of file
+        pass
@@ -0,0 +1,110 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+# Compiles a terrain description into fewer collision shapes that cover exactly the same area.
+# The description stays in the format ImaginationTwin.createTerrainObjects takes, so the pickles in terrainObjects/ load and compile unchanged.
+# Report the reduction for the stored terrains with:
+# >>> python3 TerrainCompiler.py
+
+import numpy as np
+from Enums import ShapeTypes, ShapeProperties
+from Analytics import FileOperations
+
+class TerrainCompiler:
+    PRUNED = 'pruned' #the original boxes, minus the ones that other boxes already cover
+    COLUMNS = 'columns' #the covered area cut into rectangles along vertical runs, merged sideways
+    ROWS = 'rows' #the covered area cut into rectangles along horizontal runs, merged up and down
+
+    def __init__(self):
+        self.inputShapes = 0
+        self.outputShapes = 0
+        self.rectangleMethod = None #which of PRUNED, COLUMNS or ROWS gave the fewest rectangles
+
+    def compile(self, terrainObjects):#returns a new description with the same covered area. The input is left untouched
+        self.inputShapes = 0; self.outputShapes = 0; self.rectangleMethod = None
+        if terrainObjects == None: return None
+        compiledObjects = {}
+        for shapeType in terrainObjects:
+            self.inputShapes += len(terrainObjects[shapeType])
+            if shapeType == ShapeTypes.RECTANGLE: compiledObjects[shapeType] = self.compileRectangles(terrainObjects[shapeType])
+            elif shapeType == ShapeTypes.CIRCLE: compiledObjects[shapeType] = self.compileCircles(terrainObjects[shapeType])
+            else: compiledObjects[shapeType] = list(terrainObjects[shapeType])
+            self.outputShapes += len(compiledObjects[shapeType])
+        return compiledObjects
+
+    def compileCircles(self, circles):#drops circles lying inside a bigger circle
+        kept = []
+        for c in sorted(circles, key=lambda c: -c[ShapeProperties.WIDTH]):#biggest first, so a circle is only compared with the ones that could contain it
+            contained = False
+            for k in kept:
+                dist = np.hypot(c[ShapeProperties.COL] - k[ShapeProperties.COL], c[ShapeProperties.ROW] - k[ShapeProperties.ROW])
+                if dist + c[ShapeProperties.WIDTH] <= k[ShapeProperties.WIDTH]: contained = True; break
+            if not contained: kept.append(c)
+        return kept
+
+    def compileRectangles(self, rectangles):
+        if len(rectangles) == 0: return []
+        bounds = np.array([self.getBounds(r) for r in rectangles], dtype=float) #x0, y0, x1, y1 of each rectangle
+        xs = np.unique(np.concatenate((bounds[:, 0], bounds[:, 2])))
+        ys = np.unique(np.concatenate((bounds[:, 1], bounds[:, 3])))
+        cells = np.stack((np.searchsorted(xs, bounds[:, 0]), np.searchsorted(ys, bounds[:, 1]), np.searchsorted(xs, bounds[:, 2]), np.searchsorted(ys, bounds[:, 3])), axis=1) #the grid cells each rectangle spans
+        coverCount = np.zeros((len(xs)-1, len(ys)-1), dtype=int) #number of rectangles covering each cell of the grid formed by all the rectangle edges
+        for i0, j0, i1, j1 in cells: coverCount[i0:i1, j0:j1] += 1
+        candidates = {}
+        candidates[TerrainCompiler.PRUNED] = self.pruneCoveredRectangles(rectangles, bounds, cells, coverCount)
+        candidates[TerrainCompiler.COLUMNS] = self.decompose(coverCount > 0, xs, ys)
+        candidates[TerrainCompiler.ROWS] = [self.transpose(r) for r in self.decompose((coverCount > 0).T, ys, xs)]
+        self.rectangleMethod = min(candidates, key=lambda method: len(candidates[method]))
+        return candidates[self.rectangleMethod]
+
+    def pruneCoveredRectangles(self, rectangles, bounds, cells, coverCount):
+        coverCount = coverCount.copy()
+        areas = (bounds[:, 2] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 1])
+        kept = [True] * len(rectangles)
+        for k in np.argsort(areas):#smallest first, since they are the likeliest to be covered
+            i0, j0, i1, j1 = cells[k]
+            if coverCount[i0:i1, j0:j1].min() >= 2:#every cell of this rectangle is covered by some other rectangle too
+                coverCount[i0:i1, j0:j1] -= 1
+                kept[k] = False
+        return [r for r, keep in zip(rectangles, kept) if keep]
+
+    def decompose(self, covered, xs, ys):#cuts the covered cells into disjoint rectangles. Vertical runs of cells in each column are merged with identical runs in the next columns
+        rectangles = []
+        openRuns = {} #(j0, j1) of a run: index of the column it started in
+        for i in range(covered.shape[0]):
+            runs = set(self.getRuns(covered[i]))
+            for run in list(openRuns):
+                if run not in runs: rectangles.append(self.getRectangle(xs[openRuns.pop(run)], ys[run[0]], xs[i], ys[run[1]]))
+            for run in runs:
+                if run not in openRuns: openRuns[run] = i
+        for run in openRuns: rectangles.append(self.getRectangle(xs[openRuns[run]], ys[run[0]], xs[covered.shape[0]], ys[run[1]]))
+        return rectangles
+
+    def getRuns(self, column):#(start, end) indices of consecutive covered cells
+        edges = np.diff(np.concatenate(([0], column.astype(np.int8), [0])))
+        return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+    def getBounds(self, r):
+        halfWidth = r[ShapeProperties.WIDTH] / 2; halfHeight = r[ShapeProperties.HEIGHT] / 2
+        return r[ShapeProperties.COL] - halfWidth, r[ShapeProperties.ROW] - halfHeight, r[ShapeProperties.COL] + halfWidth, r[ShapeProperties.ROW] + halfHeight
+
+    def getRectangle(self, x0, y0, x1, y1):
+        return {ShapeProperties.COL: float(x0 + x1) / 2, ShapeProperties.ROW: float(y0 + y1) / 2, ShapeProperties.WIDTH: float(x1 - x0), ShapeProperties.HEIGHT: float(y1 - y0)}
+
+    def transpose(self, r):
+        return {ShapeProperties.COL: r[ShapeProperties.ROW], ShapeProperties.ROW: r[ShapeProperties.COL], ShapeProperties.WIDTH: r[ShapeProperties.HEIGHT], ShapeProperties.HEIGHT: r[ShapeProperties.WIDTH]}
+
+    def getReductionString(self):
+        s = 'Terrain compiled from ' + str(self.inputShapes) + ' to ' + str(self.outputShapes) + ' shapes'
+        if self.rectangleMethod != None: s += ' (rectangles ' + self.rectangleMethod + ')'
+        return s
+
+    def reportStoredTerrains(self):#compiles every pickled terrain in terrainObjects/ and prints the reduction. The files are not modified
+        fileOps = FileOperations()
+        for filename in sorted(fileOps.loadAllPickleFilesFromDirectory(fileOps.dir.terrainObjectsFolder)):
+            self.compile(fileOps.loadPickleFile(None, filename))
+            print(filename, ':', self.getReductionString())
+
+if __name__ == '__main__':
+    TerrainCompiler().reportStoredTerrains()
@@ -12,17 +12,60 @@ from pymunk import Vec2d
 from Enums import Directions
 from ComputationalIntelligence import Constants  
 
+legDirections = Directions().getDirn() #every robot and leg only reads it, so one dict is shared
+legMoments = {} #(mass, (width, height)): moment. Legs of the same size share one
+legRanges = {} #(start, stop, pieces): array. Shared by every motor asking for the same range, so never modify one
+morphologyTemplates = {} #leg code: MorphologyTemplate
+
+def getMomentForBox(mass, size):
+    if (mass, size) not in legMoments: legMoments[(mass, size)] = pymunk.moment_for_box(mass, size)
+    return legMoments[(mass, size)]
+
+def getRange(start, stop, pieces):
+    if (start, stop, pieces) not in legRanges: legRanges[(start, stop, pieces)] = np.linspace(start, stop, pieces)
+    return legRanges[(start, stop, pieces)]
+
+def getMorphologyTemplate(legCode):
+    if legCode not in morphologyTemplates: morphologyTemplates[legCode] = MorphologyTemplate(legCode)
+    return morphologyTemplates[legCode]
+
+class MorphologyTemplate:#a leg code parsed once into the list of leg parts to build, so RobotBody and LearningRobot build legs without re-parsing it
+    def __init__(self, legCode):#legCode like '--#--'. Left legs are before the #, right legs after it. Each comma separated group is a leg of 1 to 3 parts
+        self.legsCode = legCode
+        self.legSpecs = [] #(leftOrRight, limbOrder, parentIndex) in creation order. parentIndex is the index of the leg part it hangs from, or -1 for the chassis
+        s = legCode.split("#")
+        lt = s[0]; rt = s[1]; rt = rt[::-1]#reverse string rt
+        for leftOrRight, legs in [(legDirections['LEFT'], lt), (legDirections['RIGHT'], rt)]:
+            for leg in legs.split(","):
+                if len(leg) < 1 or len(leg) > 3: continue
+                for k in range(len(leg)):
+                    self.legSpecs.append((leftOrRight, 'ABC'[k], -1 if k == 0 else len(self.legSpecs) - 1))
+        self.partOffsets = {} #(chassisWidth, legWidth): each leg part's position relative to the body part it hangs from, as the robot is built
+        
+    def getPartOffsets(self, chassisWidth, legWidth):#in legSpecs order. Parts are built in a horizontal line, so the offsets depend only on the widths
+        if (chassisWidth, legWidth) not in self.partOffsets:
+            offsets = []
+            for leftOrRight, limbOrder, parentIndex in self.legSpecs:
+                halfWidths = (chassisWidth if parentIndex < 0 else legWidth) / 2 + legWidth / 2
+                offsets.append(Vec2d(-halfWidths if leftOrRight == legDirections['LEFT'] else halfWidths, 0))
+            self.partOffsets[(chassisWidth, legWidth)] = offsets
+        return self.partOffsets[(chassisWidth, legWidth)]
+        
+    def buildLegs(self, createLegPart, chassisBody, chassisWidth):#createLegPart(prevBody, prevBodyWidth, leftOrRight, limbOrder) returns a leg part with obj_body and legWd
+        legs = []
+        for leftOrRight, limbOrder, parentIndex in self.legSpecs:
+            if parentIndex < 0: legs.append(createLegPart(chassisBody, chassisWidth, leftOrRight, limbOrder))
+            else: legs.append(createLegPart(legs[parentIndex].obj_body, legs[parentIndex].legWd, leftOrRight, limbOrder))
+        return legs
+
 class LegPart:#This is one leg part. Could be part A that's connected to the chassis or part B that's connected to part A
-    def __init__(self, pymunkSpace, ownBodyShapeFilter, prevBody, prevBodyWidth, leftOrRight, limbOrder):
-        self.space = pymunk.Space()
-        d = Directions()
-        self.ori = d.getDirn()
+    legWd = 20 #leg thickness (width)
+    legHt = 2 #leg height
+    legMass = 0.5
+    def __init__(self, pymunkSpace, ownBodyShapeFilter, prevBody, prevBodyWidth, leftOrRight, limbOrder, position):#position is from MorphologyTemplate.getPartOffsets, so the previous body's position isn't read back from pymunk
+        self.ori = legDirections
         self.leftRight = self.ori['LEFT']  # default. Will be overridden in ctor. Whether the leg is at the right of the chassis or the left
-        self.prevBodyXY = 0
         self.chassisWd = 0  # chassis width
-        self.legWd = 20 #leg thickness (width)
-        self.legHt = 2 #leg height
-        self.legMass = 0.5
         self.relativeAnguVel = 0
         self.obj_body = None
         self.leg_shape = None
@@ -32,24 +75,35 @@ class LegPart:#This is one leg part. Could be part A that's connected to the cha
         self.attr = None #L1_A etc. Gets assigned in the function that creates legs
         self.space = pymunkSpace
         self.shapeFilter = ownBodyShapeFilter
-        self.prevBodyXY = prevBody.position
         self.chassisWd = prevBodyWidth
         self.leftRight = leftOrRight
-        self.__createLegPart__()
+        self.__createLegPart__(position)
         self.__linkLegPartWithPrevBodyPart__(prevBody)
         #self.experience = []
     
-    def __createLegPart__(self):
-        self.obj_body = pymunk.Body(self.legMass, pymunk.moment_for_box(self.legMass, (self.legWd, self.legHt)))
-        if self.leftRight == self.ori['LEFT']: self.obj_body.position = self.prevBodyXY - ((self.chassisWd / 2) + (self.legWd / 2), 0)            
-        if self.leftRight == self.ori['RIGHT']: self.obj_body.position = self.prevBodyXY + ((self.chassisWd / 2) + (self.legWd / 2), 0)
+    def __createLegPart__(self, position):#the caller adds the leg to the space, so a whole robot is added in one call
+        self.obj_body = self.__createBody__(position)
         self.leg_shape = pymunk.Poly.create_box(self.obj_body, (self.legWd, self.legHt))            
         self.leg_shape.filter = self.shapeFilter
         self.leg_shape.color = 200, 200, 200  
         self.leg_shape.friction = 20.0 
-        self.space.add(self.leg_shape, self.obj_body) 
         
-    def delete(self): self.space.remove(self.leg_shape, self.obj_body, self.pinJoint, self.motor)
+    def __createBody__(self, position):
+        body = pymunk.Body(self.legMass, getMomentForBox(self.legMass, (self.legWd, self.legHt)))
+        body.position = position
+        return body
+        
+    def reset(self, pymunkSpace, prevBody, position):#moves the leg's shape onto a new body with new joints, since the old ones keep solver state (bias velocity, idle time, accumulated impulses) that pymunk can't reset
+        self.space = pymunkSpace
+        self.obj_body = self.__createBody__(position)
+        self.leg_shape.body = self.obj_body
+        self.leg_shape.color = 200, 200, 200
+        self.leg_shape.collision_type = 0
+        self.__linkLegPartWithPrevBodyPart__(prevBody)
+        
+    def getSpaceObjects(self): return [self.leg_shape, self.obj_body, self.pinJoint, self.motor]
+        
+    def delete(self): self.space.remove(*self.getSpaceObjects())
     
     def getTip(self):  
         v = self.leg_shape.get_vertices()    
@@ -66,21 +120,19 @@ class LegPart:#This is one leg part. Could be part A that's connected to the cha
         if self.leftRight == self.ori['RIGHT']:
             self.pinJoint = pymunk.PinJoint(self.obj_body, prevBody, (-self.legWd / 2, 0), (self.chassisWd / 2, 0))            
         self.motor = pymunk.SimpleMotor(self.obj_body, prevBody, self.relativeAnguVel) 
-        self.space.add(self.pinJoint, self.motor)
         self.motor.rate = 0
         self.motor.max_force = 10000000
-        self.motor.legRateRange = np.linspace(-maxMotorRate, maxMotorRate, motorRateRangePieces)
+        self.motor.legRateRange = getRange(-maxMotorRate, maxMotorRate, motorRateRangePieces)
         #print('legRateRange: ',str(self.motor.legRateRange), 'len:', len(self.motor.legRateRange))         
         
-    def updatePosition(self, offsetXY): self.obj_body.position = self.obj_body.position + offsetXY         
     def getLegAngle(self): return round(math.degrees(self.obj_body.angle) % 360)        
 
 class RobotBody:
     def __init__(self, pymunkSpace, chassisCenterPoint, legCode, maxMotorMovementDuration):#the maxMotorMovementDuration can be changed to any value. It's kept at the fps falue just to keep movements short
         self.legsCode = legCode
         self.ownBodyShapeFilter = pymunk.ShapeFilter(group=1) #to prevent collisions between robot body parts
-        d = Directions()  #leg at left or right of chassis
-        self.ori = d.getDirn()
+        self.ori = legDirections #leg at left or right of chassis
+        self.template = getMorphologyTemplate(legCode)
         self.chassisWd = 30 #chassis width 
         self.chassisHt = 20 #chassis height
         self.chassisMass = 5
@@ -89,58 +141,50 @@ class RobotBody:
         self.legs = []
         self.limbMotorRates = []
         self.motorMovementDuration = 50 #set according to the frames per second, but will be changed by CI classes
-        self.motorMovementDurationRange = np.linspace(0, maxMotorMovementDuration, int(maxMotorMovementDuration/5))
+        self.maxMotorMovementDuration = maxMotorMovementDuration
+        self.motorMovementDurationRange = getRange(0, maxMotorMovementDuration, int(maxMotorMovementDuration/5))
         #print('motorMovementDurationRange: ',str(self.motorMovementDurationRange), 'len:', len(self.motorMovementDurationRange))
         self.direction = self.ori['RIGHT'] #direction the robot needs to go in
         #self.currentActionNode = []#node on the action network        
         #self.brain = None       
         self.space = pymunkSpace
         self.quadrantAccuracy = 3 #pixels
+        self.stateBuffer = None #set when a RobotStateBuffer holds this robot's state. limbMotorRates is then a row of the buffer's motorRates
+        self.bufferIndex = None
         self.__createBody__(chassisCenterPoint)
         self.decimalPrecision = 2
         self.const = Constants()              
         
     def __createBody__(self, chassisXY):
-        self.obj_body = pymunk.Body(self.chassisMass, pymunk.moment_for_box(self.chassisMass, (self.chassisWd, self.chassisHt)))
-        self.obj_body.body_type = pymunk.Body.KINEMATIC
-        self.obj_body.position = chassisXY
-        self.obj_body.startPosition = Vec2d(self.obj_body.position[0], self.obj_body.position[1])
+        self.obj_body = self.__createChassisBody__(chassisXY)
         #self.brain = Brain(self.obj_body.startPosition)    
         self.chassis_shape = pymunk.Poly.create_box(self.obj_body, (self.chassisWd, self.chassisHt))
         self.chassis_shape.filter = self.ownBodyShapeFilter
         self.setNormalRobotColor() 
         self.chassis_shape.friction = 20.0
-        self.space.add(self.chassis_shape, self.obj_body) 
         self.createLegs()
+        self.space.add(*self.getSpaceObjects()) #the whole robot in one call
         self.makeRobotDynamic()
-        self.robotGenStartPos = Vec2d(self.getPosition()[0], self.getPosition()[1])
-        self.tactileSensor = Tactile_Sensor()  
-        for leg in self.legs:
-            self.tactileSensor.add(leg)#adding the chassis also will affect the analytics code which needs points of contact, so check that part     
+        self.robotGenStartPos = Vec2d(self.obj_body.startPosition[0], self.obj_body.startPosition[1])
+        self.contactRecorder = None #set when a world's ContactRecorder watches this robot. Only the legs are watched, since the analytics code needs the legs' points of contact
+        self.robotIndex = None
+    
+    def __createChassisBody__(self, chassisXY):
+        body = pymunk.Body(self.chassisMass, getMomentForBox(self.chassisMass, (self.chassisWd, self.chassisHt)))
+        body.body_type = pymunk.Body.KINEMATIC
+        body.position = chassisXY
+        body.startPosition = Vec2d(body.position[0], body.position[1])
+        return body
     
     def createLegs(self):
-        s = self.legsCode.split("#")
-        lt = s[0]; rt = s[1]; rt = rt[::-1]#reverse string rt
-        for s in lt.split(","):#number of left legs
-            if len(s) == 1:
-                leftLegA = LegPart(self.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['LEFT'], 'A'); self.legs.append(leftLegA)
-            if len(s) == 2:
-                leftLegA = LegPart(self.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['LEFT'], 'A'); self.legs.append(leftLegA)
-                leftLegB = LegPart(self.space, self.ownBodyShapeFilter, leftLegA.obj_body, leftLegA.legWd, self.ori['LEFT'], 'B'); self.legs.append(leftLegB)                
-            if len(s) == 3:
-                leftLegA = LegPart(self.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['LEFT'], 'A'); self.legs.append(leftLegA)
-                leftLegB = LegPart(self.space, self.ownBodyShapeFilter, leftLegA.obj_body, leftLegA.legWd, self.ori['LEFT'], 'B'); self.legs.append(leftLegB)                 
-                leftLegC = LegPart(self.space, self.ownBodyShapeFilter, leftLegB.obj_body, leftLegB.legWd, self.ori['LEFT'], 'C'); self.legs.append(leftLegC)                                 
-        for s in rt.split(","):#number of right legs
-            if len(s) == 1:
-                rightLegA = LegPart(self.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['RIGHT'], 'A'); self.legs.append(rightLegA)
-            if len(s) == 2:
-                rightLegA = LegPart(self.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['RIGHT'], 'A'); self.legs.append(rightLegA) 
-                rightLegB = LegPart(self.space, self.ownBodyShapeFilter, rightLegA.obj_body, rightLegA.legWd, self.ori['RIGHT'], 'B'); self.legs.append(rightLegB)                        
-            if len(s) == 3:
-                leftLegA = LegPart(self.space, self.ownBodyShapeFilter, self.obj_body, self.chassisWd, self.ori['RIGHT'], 'A'); self.legs.append(leftLegA)
-                leftLegB = LegPart(self.space, self.ownBodyShapeFilter, leftLegA.obj_body, leftLegA.legWd, self.ori['RIGHT'], 'B'); self.legs.append(leftLegB)                 
-                leftLegC = LegPart(self.space, self.ownBodyShapeFilter, leftLegB.obj_body, leftLegB.legWd, self.ori['RIGHT'], 'C'); self.legs.append(leftLegC)
+        self.legs = []
+        positions = [] #of the leg parts, worked out from the template instead of read back from each body
+        for (leftOrRight, limbOrder, parentIndex), offset in zip(self.template.legSpecs, self.template.getPartOffsets(self.chassisWd, LegPart.legWd)):
+            if parentIndex < 0: prevBody = self.obj_body; prevBodyWidth = self.chassisWd; prevBodyXY = self.obj_body.startPosition
+            else: prevBody = self.legs[parentIndex].obj_body; prevBodyWidth = LegPart.legWd; prevBodyXY = positions[parentIndex]
+            positions.append(prevBodyXY + offset)
+            self.legs.append(LegPart(self.space, self.ownBodyShapeFilter, prevBody, prevBodyWidth, leftOrRight, limbOrder, positions[-1]))
+        self.builtOffsets = [position - self.obj_body.startPosition for position in positions] #where each leg part sits relative to the chassis when built, for reset()
         i = 0
         for limb in self.legs:
             limb.attr = 'L' + str(i) + '_' + str(limb.id) #L1_A, L0_C ... etc.
@@ -168,13 +212,19 @@ class RobotBody:
             leg.motor.rate = 0
             
     def startMotion(self):
+        self.wake()
         for i in range(0, len(self.legs)):
             self.legs[i].motor.rate = self.limbMotorRates[i]
             
+    def wake(self):#a sleeping body isn't simulated until something wakes it, so motors about to run wake the robot explicitly
+        for body in self.getBodies():
+            if body.body_type == pymunk.Body.DYNAMIC: body.activate()
+            
     def setRandomLegMotorRates(self):
-        self.limbMotorRates = []
+        rates = []
         for leg in self.legs:
-            self.limbMotorRates.append(random.choice(leg.motor.legRateRange))
+            rates.append(random.choice(leg.motor.legRateRange))
+        self.storeLegMotorRates(rates)
         return self.limbMotorRates
             
     def getMinMaxLegRates(self):
@@ -183,9 +233,11 @@ class RobotBody:
     def setLegMotorRates(self, motorRates):#passing an empty list to this will set rates to zero
         if len(motorRates) == 0: 
             motorRates = [0] * len(self.legs) #[0,0,0,0]
-        self.limbMotorRates = []
-        for i in range(0, len(self.legs)):
-            self.limbMotorRates.append(motorRates[i])
+        self.storeLegMotorRates([motorRates[i] for i in range(0, len(self.legs))])
+            
+    def storeLegMotorRates(self, rates):#written into the state buffer's row when there is one, so the buffer always has every robot's rates
+        if self.stateBuffer != None: self.limbMotorRates[:] = rates
+        else: self.limbMotorRates = rates
             
     def getLegMotorRates(self):
         return self.limbMotorRates                                           
@@ -202,61 +254,71 @@ class RobotBody:
     def makeRobotStatic(self):
         self.obj_body.body_type = pymunk.Body.KINEMATIC
         
+    def isStatic(self):
+        return self.obj_body.body_type == pymunk.Body.KINEMATIC
+        
     def makeRobotDynamic(self):
         self.obj_body.body_type = pymunk.Body.DYNAMIC
         self.obj_body.mass = self.chassisMass
-        self.obj_body.moment = pymunk.moment_for_box(self.chassisMass, (self.chassisWd, self.chassisHt))            
+        self.obj_body.moment = getMomentForBox(self.chassisMass, (self.chassisWd, self.chassisHt))            
         
     def delete(self):
-        self.space.remove(self.chassis_shape); self.space.remove(self.obj_body)
-        for legPart in self.legs: legPart.delete()
+        self.removeFromSpace()
         self.legs[:] = [] #clear the list
         
+    def getSpaceObjects(self):#in the order a new robot adds them, since pymunk's results depend on it
+        objects = [self.chassis_shape, self.obj_body]
+        for leg in self.legs: objects.extend(leg.getSpaceObjects())
+        return objects
+        
+    def removeFromSpace(self):#the robot's shapes are kept, so reset() can put it in a space again
+        self.space.remove(*self.getSpaceObjects())
+        
+    def reset(self, pymunkSpace, chassisCenterPoint):#puts a robot taken out by removeFromSpace in pymunkSpace, in the state a new RobotBody at chassisCenterPoint would have. Only the shapes are reused. See LegPart.reset
+        self.space = pymunkSpace
+        self.stateBuffer = None; self.bufferIndex = None; self.contactRecorder = None; self.robotIndex = None
+        self.limbMotorRates = []
+        self.motorMovementDuration = 50
+        self.direction = self.ori['RIGHT']
+        chassisXY = Vec2d(chassisCenterPoint[0], chassisCenterPoint[1])
+        self.obj_body = self.__createChassisBody__(chassisXY)
+        self.chassis_shape.body = self.obj_body
+        self.setNormalRobotColor()
+        self.chassis_shape.collision_type = 0
+        for leg, (leftOrRight, limbOrder, parentIndex), offset in zip(self.legs, self.template.legSpecs, self.builtOffsets):
+            leg.reset(pymunkSpace, self.obj_body if parentIndex < 0 else self.legs[parentIndex].obj_body, chassisXY + offset)
+        self.space.add(*self.getSpaceObjects())
+        self.makeRobotDynamic()
+        self.robotGenStartPos = Vec2d(self.obj_body.startPosition[0], self.obj_body.startPosition[1])
+        self.setRandomLegMotorRates() #draws the same random numbers a new robot would
+        self.stopMotion()
+        
     def getPosition(self):
         return self.obj_body.position
     
     def saveGenStartPos(self):        
         self.robotGenStartPos = Vec2d(self.getPosition()[0], self.getPosition()[1])#current position
+        if self.stateBuffer != None: self.stateBuffer.genStartPositions[self.bufferIndex] = self.robotGenStartPos
     
     def getFitness(self):#returns 0 if movement is not in desired direction or an absolute positive value of the magnitude of displacement in desired direction
         return self.__getFitnessBasedOnDirection__(self.robotGenStartPos, self.getPosition())
         
-    def updatePosition(self, offsetXY):
-        self.obj_body.position += offsetXY 
-        self.obj_body.startPosition += offsetXY
-        for leg in self.legs: 
-            leg.updatePosition(offsetXY)
-    
     def getBodyAngle(self): return round(math.degrees(self.obj_body.angle) % 360)
     
-    def getUniqueBodyAngles(self):
-        ang = [self.roundToNearest(self.getBodyAngle())]
-        for leg in self.legs: ang.append(self.roundToNearest(leg.getLegAngle()))
-        return ang
+    def getBodies(self):#chassis first, then legs in the order they were created
+        return [self.obj_body] + [leg.obj_body for leg in self.legs]
     
-    def setBodyPositionAndAngles(self, pos, angles, offset):
-        p = pos.pop(0)
-        self.obj_body.position = Vec2d(p[0], p[1]) + offset
-        self.obj_body.startPosition = Vec2d(p[0], p[1]) + offset
-        self.obj_body.angle = math.radians(angles.pop(0))
-        for leg in self.legs:
-            p = pos.pop(0)
-            leg.obj_body.position = Vec2d(p[0], p[1]) + offset
-            leg.obj_body.angle = math.radians(angles.pop(0))
-        return pos    
+    def takeSnapshot(self):
+        return RobotSnapshot(self)
+    
+    def restoreSnapshot(self, snapshot, offset=(0, 0)):#resets this robot to the exact state of a snapshot, translated by offset
+        restoreSnapshotToRobots(snapshot, [self], offset)
     
     def getPositions(self):
         pos = [Vec2d(self.obj_body.position)]
         for leg in self.legs: pos.append(Vec2d(leg.obj_body.position))
         return pos
         
-    def roundToNearest(self, num):
-        roundOffPrecision = 5
-        rem = num % roundOffPrecision
-        if rem < roundOffPrecision / 2: num = int(num/roundOffPrecision) * roundOffPrecision
-        else: num = int((num+roundOffPrecision) / roundOffPrecision) * roundOffPrecision
-        return num
-    
     def getLegQuadrants(self):
         quads = []
         for i in range(0, len(self.body.legs), 1):
@@ -271,30 +333,103 @@ class RobotBody:
         tPt[1] = tPt[0] * math.sin(theta) + tPt[1] * math.cos(theta) #rotate
         return (math.floor(tPt[0]/self.quadrantAccuracy), math.floor(tPt[1]/self.quadrantAccuracy))
         
-    def getNumContactPointsForEachLeg(self):#can use this only if tactile sensor is added
-        return self.tactileSensor.get() #[numContactPointsForLeg1, numContactPointsForLeg2, numContactPointsForLeg3, numContactPointsForLeg4]
+    def getNumContactPointsForEachLeg(self):#can use this only if a ContactRecorder watches the robot
+        return self.contactRecorder.getPointCounts(self.robotIndex).tolist() #[numContactPointsForLeg1, numContactPointsForLeg2, numContactPointsForLeg3, numContactPointsForLeg4]
 
-class Tactile_Sensor:
-    def __init__(self):
-        self.bodyParts = [] 
-        self.partPointMap = {}
-        self.points = None
-        self.bodyPartBeingArbited = None
+class RobotPool:#robots taken out of their space when a world is deleted, kept to be reset into a space again instead of being rebuilt. Owned by a world, or shared by worlds run one after another
+    def __init__(self, maxRobots):
+        self.maxRobots = maxRobots #released robots beyond this are dropped
+        self.robots = {} #(legCode, maxMotorMovementDuration): released robots
+        self.numPooled = 0
+        self.numCreated = 0 #robots acquire() had to build
+        self.numReused = 0
+    
+    def acquire(self, pymunkSpace, chassisCenterPoint, legCode, maxMotorMovementDuration):#same arguments as RobotBody
+        released = self.robots.get((legCode, maxMotorMovementDuration))
+        if released:
+            robo = released.pop(0); self.numPooled -= 1; self.numReused += 1 #in the order they were released, so a world gets its robots back in the order it built them
+            robo.reset(pymunkSpace, chassisCenterPoint)
+            return robo
+        self.numCreated += 1
+        return RobotBody(pymunkSpace, chassisCenterPoint, legCode, maxMotorMovementDuration)
     
-    def add(self, bodyPart):
-        self.bodyParts.append(bodyPart)
+    def release(self, robo):#removes the robot from its space. Don't use it after this, since acquire() may hand it out again
+        robo.removeFromSpace()
+        if robo.stateBuffer != None: robo.limbMotorRates = list(robo.limbMotorRates) #detach the row, so the buffer can be freed
+        robo.stateBuffer = None; robo.bufferIndex = None; robo.contactRecorder = None; robo.robotIndex = None
+        if self.numPooled >= self.maxRobots: return
+        self.robots.setdefault((robo.legsCode, robo.maxMotorMovementDuration), []).append(robo)
+        self.numPooled += 1
     
-    def get(self):
-        self.partPointMap = {}
-        for bodyPart in self.bodyParts: self.partPointMap[bodyPart.attr] = 0       
-        self.points = []
-        for bodyPart in self.bodyParts:            
-            self.bodyPartBeingArbited = bodyPart
-            bodyPart.obj_body.each_arbiter(self.__contactInfo__) #invoke callback fn
-            self.points.append(self.partPointMap[self.bodyPartBeingArbited.attr])
-        return self.points
+    def clear(self):
+        self.robots = {}; self.numPooled = 0
+
+class RobotStateBuffer:#the chassis positions and motor rates of a population of RobotBodies as arrays indexed by robot. Fitness needs nothing else, so leg states aren't buffered
+    def __init__(self, robots):#robots must all have the same legs
+        self.robots = robots
+        self.numRobots = len(robots)
+        self.numLegs = len(robots[0].legs)
+        self.chassisBodies = [robo.obj_body for robo in robots]
+        self.motors = [leg.motor for robo in robots for leg in robo.legs]
+        self.chassisPositions = np.zeros((self.numRobots, 2)) #refreshed by refreshChassisPositions()
+        self.genStartPositions = np.zeros((self.numRobots, 2)) #chassis position at the start of the generation
+        self.motorRates = np.zeros((self.numRobots, self.numLegs)) #the rates startMotion runs the motors at. Each robot's limbMotorRates is its row
+        ori = Directions().getDirn()
+        self.directions = np.array([robo.direction for robo in robots])
+        self.directionCodes = np.array([ori['RIGHT'], ori['UP'], ori['LEFT'], ori['DOWN']])
+        self.decimalPrecision = robots[0].decimalPrecision
+        self.notFit = robots[0].const.NOTFIT
+        for i in range(self.numRobots):
+            robo = robots[i]
+            self.motorRates[i] = robo.limbMotorRates
+            self.genStartPositions[i] = robo.robotGenStartPos
+            robo.limbMotorRates = self.motorRates[i] #a view, so the robot's own rate functions read and write the buffer
+            robo.stateBuffer = self; robo.bufferIndex = i
     
-    def __contactInfo__(self, arbiter): #callback fn    
-        self.partPointMap[self.bodyPartBeingArbited.attr] = self.partPointMap[self.bodyPartBeingArbited.attr] + len(arbiter.contact_point_set.points)
+    def refreshChassisPositions(self):#pymunk has no bulk read, so call it when a population-wide read is due rather than every step
+        self.chassisPositions.reshape(-1)[:] = [c for body in self.chassisBodies for c in body.position] #flat floats convert faster than a list of Vec2d
+        
+    def saveGenStartPositions(self):#RobotBody.saveGenStartPos for every robot
+        self.refreshChassisPositions()
+        self.genStartPositions[:] = self.chassisPositions
+        for robo, (x, y) in zip(self.robots, self.genStartPositions.tolist()): robo.robotGenStartPos = Vec2d(x, y)
         
+    def getFitnesses(self):#RobotBody.getFitness for every robot, from the chassis positions of the last refresh
+        displacements = self.chassisPositions - self.genStartPositions
+        angles = np.round(np.degrees(np.arctan2(displacements[:, 1], displacements[:, 0]))) % 360
+        directionIndexes = np.select([(angles > 270) | (angles <= 91), angles <= 135, angles <= 225], [0, 1, 2], 3) #same bands as RobotBody.robotDirection
+        distances = np.round(np.sqrt(displacements[:, 0]**2 + displacements[:, 1]**2), self.decimalPrecision)
+        return np.where(self.directionCodes[directionIndexes] == self.directions, distances, self.notFit)
+    
+    def getDisplacements(self):#chassis displacement since the generation started, from the last refresh
+        return self.chassisPositions - self.genStartPositions
         
+    def startMotion(self, numRobots=None):#RobotBody.startMotion for the first numRobots robots (all by default), in one pass
+        numRobots = self.numRobots if numRobots == None else numRobots
+        for robo in self.robots[:numRobots]: robo.wake()
+        rates = self.motorRates[:numRobots].reshape(-1).tolist()
+        for k in range(len(rates)): self.motors[k].rate = rates[k]
+        
+    def stopMotion(self):
+        for motor in self.motors: motor.rate = 0
+        
+class RobotSnapshot:#exact physical state of a robot. Plain tuples, so it can be pickled and sent to other processes
+    def __init__(self, robo):
+        self.bodyStates = [] #(position, angle, velocity, angularVelocity) of the chassis followed by each leg
+        for body in robo.getBodies():
+            self.bodyStates.append(((body.position[0], body.position[1]), body.angle, (body.velocity[0], body.velocity[1]), body.angular_velocity))
+        self.motorRates = [leg.motor.rate for leg in robo.legs]
+        
+def restoreSnapshotToRobots(snapshot, robots, offset=(0, 0)):#resets all robots to the snapshot. Offset positions are computed once for the whole population
+    states = []
+    for pos, angle, vel, angularVel in snapshot.bodyStates:
+        states.append((Vec2d(pos[0] + offset[0], pos[1] + offset[1]), angle, Vec2d(vel[0], vel[1]), angularVel))
+    for robo in robots:
+        i = 0
+        for body in robo.getBodies():
+            pos, angle, vel, angularVel = states[i]
+            body.position = pos; body.angle = angle; body.velocity = vel; body.angular_velocity = angularVel
+            i += 1
+        robo.obj_body.startPosition = Vec2d(states[0][0])
+        for i in range(len(robo.legs)):
+            robo.legs[i].motor.rate = snapshot.motorRates[i]
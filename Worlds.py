@@ -6,32 +6,33 @@ import os
 import sys
 import time
 import math
-import pygame
 import random
 import pymunk
+import multiprocessing
 import statistics
 import numpy as np
 import collections
 from pymunk import Vec2d
-import pymunk.pygame_util
-from pygame.color import *
-from pygame.locals import *
-from pygame.locals import *
 from StatesAndSensors import *
-import matplotlib.pyplot as plt
-from WalkingRobot import RobotBody
+from WalkingRobot import RobotBody, RobotStateBuffer, RobotPool, restoreSnapshotToRobots
 from WalkingRobot import Constants
-from LearningRobot import LearningRobot
 from pymunk.shape_filter import ShapeFilter
 from ComputationalIntelligence import SimpleDE, RunCode, RandomBest, SimplePSO
+from Rendering import Renderer, SensedWorldOverlay
+from TerrainCompiler import TerrainCompiler
+from Instrumentation import PhaseTimers, TraceRecorder
 from Analytics import TestAnalyticsForMovementAccuracy, FileOperations, ProgramAnalytics
-from Enums import RunStep, RunCI, Terrains, ShapeTypes, ShapeProperties, MainProgramParameters, TestRunMode
+from Enums import RunStep, RunCI, Terrains, ShapeTypes, ShapeProperties, MainProgramParameters, TestRunMode, Broadphase, ProgramMetrics
+
+pygame = None #imported by initializeDisplay, since headless worlds never need it and it takes most of this module's import time
 
 class Worlds(object):
     def __init__(self):
         #self.focusRobotXY = Vec2d(0, 0)#will be overridden below        
         self.screen = None
         self.draw_options = None       
+        self.renderer = None #draws the spaces when there's a display
+        self.overlay = None #drawn over the spaces, e.g. a SensedWorldOverlay. May get set in child class
         self.decimalPrecision = 2
         #NOTE: Pymunk physics coordinates start from the lower right-hand corner of the screen
         self.screenWidth = 1300; #can get overridden in child class
@@ -55,8 +56,16 @@ class Worlds(object):
         self.prevCameraXY = Vec2d(self.screenWidth/2, self.screenHeight/2)
         self.cameraXY = Vec2d(self.screenWidth/2, self.screenHeight/2) 
         self.cameraMoveDist = Vec2d(100, 50)
+        self.viewOffset = Vec2d(0, 0) #added to world coordinates when drawing. Camera moves only change this, so bodies stay where the physics put them
         self.UNDETERMINED = -1
         self.highFriction = 20
+        self.broadphase = MainProgramParameters.BROADPHASE
+        self.adaptiveSubsteps = MainProgramParameters.ADAPTIVE_SUBSTEPS
+        self.substepController = None
+        self.contactRecorder = None #records the contacts of robot parts in worlds that read them. See createContactRecorder
+        self.bodySleepTime = MainProgramParameters.BODY_SLEEP_TIME
+        self.sleepCountEveryNFrames = 10 #sleeping bodies are counted on a sample of the frames, since walking every body each frame costs more than the sleeping saves
+        self.headless = MainProgramParameters.HEADLESS #when True, no display is created, events aren't polled, nothing is drawn and the frame rate isn't capped
         #self.maxMovtTime = 50 #how often in time the sequences of the robot get executed        
 
     def initialize(self):
@@ -65,75 +74,134 @@ class Worlds(object):
         self.fps = 50 #frames per second
         self.movtTime = 0 #start value of movt time. Can be anything from 0 to maxMovtTime
         self.iterations = 20        
+        self.simClock = SimulationClock(self.fps) #simulated time, independent of how fast frames are actually processed
         #self.space.damping = 0.999 
         #self.focusRobotChanged = False
         self.prevFocusRobotID = self.UNDETERMINED #At first none of the robots will be in focus since fitness hasn't been determined
         self.focusRobotID = self.UNDETERMINED #At first none of the robots will be in focus since fitness hasn't been determined
         self.infoString = ""           
         self.createWorldBoundary(0, 0, self.boundaryColor)
-            
+        if not self.headless: self.initializeDisplay()
+        self.initializeRobots()
+        if len(self.robots) <= 0: print('Create at least one robot'); return
+        self.configureBroadphase(self.space)
+        self.configureSleeping(self.space)
+        self.createSubstepController()
+        
+    def configureSleeping(self, space):#idle bodies sleep until a collision, a joint or an explicit wake (RobotBody.wake) activates them
+        if self.bodySleepTime != None:
+            space.sleep_time_threshold = self.bodySleepTime
+            space.idle_speed_threshold = MainProgramParameters.IDLE_SPEED_THRESHOLD
+        
+    def configureBroadphase(self, space):#call again once more shapes are added. Switching the index keeps the shapes already in it
+        if self.broadphase == Broadphase.SPATIAL_HASH:
+            space.use_spatial_hash(self.getSpatialHashCellSize(), max(1000, 10 * len(space.shapes)))
+        
+    def getSpatialHashCellSize(self):#about the size of a typical shape. Long ground and boundary boxes span many cells either way
+        sizes = self.getTerrainObjectSizes()
+        if len(self.robots) > 0: sizes = sizes + [self.robots[0].chassisWd] + [leg.legWd for leg in self.robots[0].legs]
+        return statistics.median(sizes) if len(sizes) > 0 else 20
+    
+    def getTerrainObjectSizes(self):#may get overridden in child class that has terrain
+        return []
+
+    def initializeDisplay(self):
+        global pygame
+        import pygame
         pygame.init()
         pygame.mixer.quit()#disable sound output that causes annoying sound effects if any other external music player is playing
         self.screen = pygame.display.set_mode((self.screenWidth, self.screenHeight), self.display_flags)
         self.font = pygame.font.SysFont("arial", 14)
         #width, height = self.screen.get_size()
-        self.draw_options = pymunk.pygame_util.DrawOptions(self.screen)
-        self.draw_options.constraint_color = 140,140,140
+        self.renderer = Renderer(self.screen, self.font, MainProgramParameters.RENDER_EVERY_NTH_FRAME, MainProgramParameters.DISPLAY_FPS)
+        self.draw_options = self.renderer.draw_options
         #self.draw_options.flags = pymunk.SpaceDebugDrawOptions.DRAW_SHAPES
         #self.draw_options.flags |= pymunk.SpaceDebugDrawOptions.DRAW_COLLISION_POINTS
 
-        self.initializeRobots()
-        if len(self.robots) <= 0: print('Create at least one robot'); return
-
-    def createWorldBoundary(self, worldX, worldY, bouColor):
+    def createWorldBoundary(self, worldX, worldY, bouColor, space=None):#space defaults to the world's main space
+        space = self.space if space == None else space
         #---top boundary        
-        body = pymunk.Body(body_type=pymunk.Body.KINEMATIC); body.position = Vec2d(worldX+self.worldWidth/2, worldY+self.worldHeight-self.wallThickness/2)
+        body = pymunk.Body(body_type=pymunk.Body.STATIC); body.position = Vec2d(worldX+self.worldWidth/2, worldY+self.worldHeight-self.wallThickness/2)
         shape = pymunk.Poly.create_box(body, (self.worldWidth, self.wallThickness)); shape.color = bouColor; shape.friction = self.highFriction
-        self.space.add(shape); self.boundaryObjects.append(shape)
+        space.add(shape); self.boundaryObjects.append(shape)
         #---bottom boundary
-        body = pymunk.Body(body_type=pymunk.Body.KINEMATIC); body.position = Vec2d(worldX+self.worldWidth/2, worldY+self.wallThickness/2) 
+        body = pymunk.Body(body_type=pymunk.Body.STATIC); body.position = Vec2d(worldX+self.worldWidth/2, worldY+self.wallThickness/2) 
         shape = pymunk.Poly.create_box(body, (self.worldWidth, self.wallThickness)); shape.color = bouColor; shape.friction = self.highFriction
-        self.space.add(shape); self.boundaryObjects.append(shape)
+        space.add(shape); self.boundaryObjects.append(shape)
         #---left boundary
-        body = pymunk.Body(body_type=pymunk.Body.KINEMATIC); body.position = Vec2d(worldX+self.wallThickness/2, worldY+self.worldHeight/2)
+        body = pymunk.Body(body_type=pymunk.Body.STATIC); body.position = Vec2d(worldX+self.wallThickness/2, worldY+self.worldHeight/2)
         shape = pymunk.Poly.create_box(body, (self.wallThickness, self.worldHeight)); shape.color = bouColor; shape.friction = self.highFriction
-        self.space.add(shape); self.boundaryObjects.append(shape)
+        space.add(shape); self.boundaryObjects.append(shape)
         #---right boundary
-        body = pymunk.Body(body_type=pymunk.Body.KINEMATIC); body.position = Vec2d(worldX+self.worldWidth-self.wallThickness/2, worldY+self.worldHeight/2)
+        body = pymunk.Body(body_type=pymunk.Body.STATIC); body.position = Vec2d(worldX+self.worldWidth-self.wallThickness/2, worldY+self.worldHeight/2)
         shape = pymunk.Poly.create_box(body, (self.wallThickness, self.worldHeight)); shape.color = bouColor; shape.friction = self.highFriction
-        self.space.add(shape); self.boundaryObjects.append(shape)
+        space.add(shape); self.boundaryObjects.append(shape)
         
     def delete(self):
         for ob in self.boundaryObjects:
-            self.space.remove(ob)
+            ob.space.remove(ob) #boundaries may be in more than one space
         self.boundaryObjects[:] = []#clear the list
         for ob in self.robots:
             ob.delete()
         self.robots[:] = []
 
     def draw(self):        
-        #self.screen.fill(THECOLORS["black"])# Clear screen
-        self.screen.fill((30, 30, 30))# Clear screen  
-        #self.screen.fill((255, 243, 202))# Clear screen        
-        self.space.debug_draw(self.draw_options)# Draw space
-        self.displayStats(self.infoString);        
-        pygame.display.flip()#flip the display buffer
+        if self.headless or not self.renderer.isRenderDue(): return
+        self.renderer.render(self.getSpaces(), self.getStaticShapes(), self.viewOffset, self.infoString, self.statsPos, self.overlay)
+        
+    def stepPhysics(self):
+        self.stepSpace(self.space)
+        self.simClock.tick(self.isRealFrame())
+        
+    def stepSpace(self, space):#one frame of physics, in as many sub-steps as the substep controller picks
+        frameDuration = 1.0 / float(self.fps)
+        substeps = self.substepController.step(space, frameDuration, self.contactRecorder)
+        self.simClock.countSubsteps(substeps)
+        if self.bodySleepTime != None and self.simClock.physicsFrames % self.sleepCountEveryNFrames == 0: self.simClock.countSleepingBodies(self.countSleepingBodies(space))
+        
+    def countSleepingBodies(self, space):
+        numSleeping = 0
+        for body in space.bodies:
+            if body.is_sleeping: numSleeping += 1
+        return numSleeping
+        
+    def createSubstepController(self, robots=None):#call once the robots exist, since their size bounds how far a spinning body travels. robots defaults to the world's robots
+        robots = self.robots if robots == None else robots
+        bodyRadius = max(robots[0].chassisWd, max([leg.legWd for leg in robots[0].legs])) / 2 if len(robots) > 0 else 0
+        self.substepController = SubstepController(self.iterations, min(MainProgramParameters.MIN_SUBSTEPS, self.iterations), self.adaptiveSubsteps, bodyRadius)
+    
+    def createContactRecorder(self, space, robots, includeChassis=False):#only for worlds that read contacts, since the handler costs a callback per touching part per frame
+        if self.contactRecorder == None: self.contactRecorder = ContactRecorder()
+        self.contactRecorder.watch(space, robots, includeChassis)
+    
+    def isRealFrame(self):#may get overridden in child class that also has imaginary robots
+        return True
+    
+    def getEvents(self):#no event polling when headless, since there's no display to send events
+        return [] if self.headless else pygame.event.get()
+    
+    def createClock(self):
+        return None if self.headless else pygame.time.Clock()
+    
+    def tickClock(self, clock):#caps the loop at fps only on frames that were drawn, and not at all when the renderer paces itself by wall clock
+        if clock != None and self.renderer.renderedLastFrame and self.renderer.isThrottled(): clock.tick(self.fps)
+        
+    def getSpaces(self):#may get overridden in child class that has more than one space
+        return [self.space]
+    
+    def getStaticShapes(self):#shapes that never move, which the renderer draws once onto its background. May get overridden in child class
+        return self.boundaryObjects + self.worldObjects
         
     def processRobot(self):
         for r in self.robots:
             r.brainActivity()        
 
-    def updatePosition(self):   
+    def updateCamera(self):#camera moves only change the view offset used for drawing. No body is moved
         #self.robots[self.focusRobotID].setFocusRobotColor()            
         updateBy = self.cameraXY - self.prevCameraXY #self.calcUpdateBy(self.robots[self.focusRobotID].chassis_body.position)
         self.cameraXY = Vec2d(self.prevCameraXY[0], self.prevCameraXY[1])
         if updateBy != (0, 0):
-            for ob in self.boundaryObjects:
-                ob.body.position += updateBy  
-            for obj in self.robots:#update all robot positions
-                obj.updatePosition(updateBy)
-            self.robotInitPos += updateBy
-            #self.statsPos += updateBy
+            self.viewOffset += updateBy
         return updateBy           
     
     def updateColor(self):
@@ -160,26 +228,20 @@ class Worlds(object):
         for _ in range(0, self.numRobots, 1):
             self.robots.append(RobotBody(self.space, self.robotInitPos, self.legsCode, self.fps))             
     
-    def displayStats(self, displayStr):
-        if isinstance(displayStr, str): self.screen.blit(self.font.render(displayStr, 1, THECOLORS["gray"]), self.statsPos)
-        else:
-            sep = 15
-            for i in range(0,len(displayStr),1): self.screen.blit(self.font.render(displayStr[i], 1, THECOLORS["gray"]), self.statsPos+(0,i*sep))
-
     def runWorld(self): #may get overridden in child class
         runState = RunCode.CONTINUE
-        clock = pygame.time.Clock()
+        clock = self.createClock()
         simulating = True        
         #prevTime = time.time();
         while simulating:
-            for event in pygame.event.get():
-                if event.type == QUIT or (event.type == KEYDOWN and event.key in (K_q, K_ESCAPE)):
+            for event in self.getEvents():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key in (pygame.K_q, pygame.K_ESCAPE)):
                     sys.exit(0)
-                if event.type == KEYDOWN:
-                    if event.key == K_UP: self.cameraXY += Vec2d(0, -self.cameraMoveDist[1])
-                    if event.key == K_DOWN: self.cameraXY += Vec2d(0, self.cameraMoveDist[1])
-                    if event.key == K_LEFT: self.cameraXY += Vec2d(self.cameraMoveDist[0], 0)
-                    if event.key == K_RIGHT: self.cameraXY += Vec2d(-self.cameraMoveDist[0], 0)                    
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_UP: self.cameraXY += Vec2d(0, -self.cameraMoveDist[1])
+                    if event.key == pygame.K_DOWN: self.cameraXY += Vec2d(0, self.cameraMoveDist[1])
+                    if event.key == pygame.K_LEFT: self.cameraXY += Vec2d(self.cameraMoveDist[0], 0)
+                    if event.key == pygame.K_RIGHT: self.cameraXY += Vec2d(-self.cameraMoveDist[0], 0)                    
 #                     if event.key == K_RIGHTBRACKET:
 #                         self.focusRobotID += 1; self.focusRobotChanged = True
 #                         if self.focusRobotID == self.numRobots: self.focusRobotID = 0
@@ -188,11 +250,9 @@ class Worlds(object):
 #                         if self.focusRobotID < 0: self.focusRobotID = self.numRobots - 1
 
             #---Update physics
-            dt = 1.0 / float(self.fps) / float(self.iterations)
-            for _ in range(self.iterations): #iterations to get a more stable simulation
-                self.space.step(dt)
-            #---Update world based on player focus
-            self.updatePosition()
+            self.stepPhysics()
+            #---Update view based on player focus
+            self.updateCamera()
             if self.prevFocusRobotID != self.focusRobotID: 
                 self.updateColor()
                 self.prevFocusRobotID = self.focusRobotID
@@ -206,7 +266,7 @@ class Worlds(object):
             self.draw()
             
             #self.focusRobotXY = self.robots[self.focusRobotID].chassis_body.position#use getter
-            clock.tick(self.fps)
+            self.tickClock(clock)
             if runState == RunCode.STOP:
                 break  
             
@@ -235,14 +295,20 @@ class MoveMotors:#to move the motors for time n*dT, where n is the number of fra
                 #---do something 
                 self.currDuration += 1
     def start(self):
+        self.world.trace.begin('Motors running', self.getTraceTrack(), {'duration': self.maxDuration})
+        if self.robots[0].stateBuffer != None: self.robots[0].stateBuffer.startMotion(); return
         for robo in self.robots:
             robo.startMotion()
     def stop(self):
+        self.world.trace.end(self.getTraceTrack())
         self.currDuration = 0 #ready for next movement when state switches back to this object
+        if self.robots[0].stateBuffer != None: self.robots[0].stateBuffer.stopMotion(); return
         for robo in self.robots:
             robo.stopMotion()
             if self.isMainRobot:
                 robo.setLegMotorRates([]) #passing empty list sets rate store list to zeroes            
+    def getTraceTrack(self):
+        return TraceRecorder.REAL_MOTORS if self.isMainRobot else TraceRecorder.IMAGINARY_MOTORS
 
 class Generation:#to run MoveMotors for g generations where each g = n*dT
     def __init__(self, listOfRobots, parent):
@@ -258,11 +324,20 @@ class Generation:#to run MoveMotors for g generations where each g = n*dT
             self.maxGens = MainProgramParameters.MAX_GENS
         self.currGen = 0
         if not self.isMainRobot:
-            if self.world.runWhichCI == RunCI.RANDOM: self.CI = RandomBest(self.robots)
-            if self.world.runWhichCI == RunCI.DE: self.CI = SimpleDE(self.robots)
-            if self.world.runWhichCI == RunCI.PSO: self.CI = SimplePSO(self.robots)
+            self.candidatePopulation = self.world.candidatePopulation
+            ciRobots = self.robots if self.candidatePopulation == None else self.candidatePopulation.robots
+            if self.world.runWhichCI == RunCI.RANDOM: self.CI = RandomBest(ciRobots)
+            if self.world.runWhichCI == RunCI.DE: self.CI = SimpleDE(ciRobots)
+            if self.world.runWhichCI == RunCI.PSO: self.CI = SimplePSO(ciRobots)
 
-    def run(self):        
+    def run(self):
+        track = TraceRecorder.REAL_GENERATION if self.isMainRobot else TraceRecorder.IMAGINARY_GENERATION
+        self.world.trace.begin('Generation.run', track, {'currGen': self.currGen, 'maxGens': self.maxGens})
+        self.runGeneration()
+        self.world.trace.end(track)
+    def runGeneration(self):        
+        if not self.isMainRobot and self.candidatePopulation != None:
+            self.runCandidateGenerations(); return
         if self.currGen == 0:#first generation
             for robo in self.robots:
                 robo.makeRobotDynamic()
@@ -280,7 +355,9 @@ class Generation:#to run MoveMotors for g generations where each g = n*dT
             #has to exit this run() function now            
         else:
             if not self.isMainRobot:
+                self.world.trace.begin(self.world.runWhichCI + ' run', TraceRecorder.CI)
                 self.CI.run()
+                self.world.trace.end(TraceRecorder.CI)
             self.start()
             #---state switching etc
             if self.isMainRobot:
@@ -292,6 +369,17 @@ class Generation:#to run MoveMotors for g generations where each g = n*dT
             else: 
                 self.world.runState = RunStep.IMAGINARY_MOTOR_EXEC
             self.currGen += 1                  
+            self.world.simClock.countGeneration(self.isMainRobot)
+    def runCandidateGenerations(self):#the whole epoch is evaluated by the fitness evaluator in one frame, with the CI running exactly as it does on imaginary robots
+        realRobot = self.world.robots[self.world.cons.mainRobotID]
+        moveDuration = self.world.moveMotorsStateImagined.maxDuration
+        self.world.trace.begin(self.world.runWhichCI + ' epoch in the fitness evaluator', TraceRecorder.CI, {'generations': self.maxGens})
+        self.candidatePopulation.runGenerations(self.CI, realRobot.takeSnapshot(), self.maxGens, moveDuration)
+        self.world.trace.end(TraceRecorder.CI)
+        for _ in range(self.maxGens):
+            self.world.simClock.countGeneration(self.isMainRobot)
+        self.world.simClock.advance(self.maxGens * (moveDuration + 1), False) #frames the epoch would have taken in the imagination space, where each generation's last motor frame also starts the next generation. This frame is ticked as usual
+        self.world.runState = RunStep.REAL_GENERATION
     def start(self):
         if not self.isMainRobot:
             self.world.setImaginaryRobotPositionAndAnglesToRealRobot()
@@ -304,7 +392,7 @@ class Generation:#to run MoveMotors for g generations where each g = n*dT
         return self.CI.getFittestRobot()
     def checkIfStuck(self):#runs only for main robot        
         if self.stuckForTooLong:
-            if self.persistStuckState == 0: self.stuckForTooLong = False
+            if self.persistStuckState == 0: self.stuckForTooLong = False; self.world.trace.end(TraceRecorder.STUCK)
             else: self.persistStuckState -= 1
         if not self.stuckForTooLong: #not kept as part of else of previous if, deliberately       
             position = None  
@@ -323,6 +411,7 @@ class Generation:#to run MoveMotors for g generations where each g = n*dT
                         if dis < MainProgramParameters.DISTANCE_FOR_ASSUMING_STUCK: numStuckGens = numStuckGens + 1
                 if numStuckGens >= len(self.samePosCheck)-1: 
                     self.stuckForTooLong = True #the -1 accounts for the continue statement above
+                    self.world.trace.begin('Stuck', TraceRecorder.STUCK, {'position': tuple(position)})
                     self.persistStuckState = MainProgramParameters.GENERATIONS_TO_PERSIST_STUCK
     def isMainRobotStuck(self):
         return self.stuckForTooLong
@@ -344,6 +433,11 @@ class ImaginationTwin(Worlds):#inherits
         self.numRobots = 1        
         self.numImaginaryRobots = MainProgramParameters.NUM_IMAGINARY_ROBOTS #min 4 robots required for DE's ComputationalIntelligence
         self.imaginaryRobots = []
+        self.imaginaryStateBuffer = None #RobotStateBuffer of imaginaryRobots
+        self.robotPool = None #RobotPool the imaginary robots are taken from and released to. Created for this world's population unless given one to share with other worlds
+        self.imaginationSpace = None #the imagination runs in its own space, so the real world and the imagination don't pay for each other's physics
+        self.imaginationObjects = [] #terrain shapes in the imagination space
+        self.terrainObjects = None #description of the terrain, built once into each space
         self.debrisElevFromBottomWall = 0
         self.groundThickness = 10
         self.robotInitPos = Vec2d(100, 100) #overrides the base class pos
@@ -359,22 +453,32 @@ class ImaginationTwin(Worlds):#inherits
         self.fileOps = FileOperations()
         self.analytics = ProgramAnalytics()
         self.startTime = None        
+        self.saveResults = True #the parallel trial runner sets this False and saves the results in its parent process instead
+        self.finishingResult = None #arguments for ProgramAnalytics.saveFinishingTime, available once the robot crosses the finish line
+        self.fitnessEvaluator = None #when NUM_EVALUATION_WORKERS or EVALUATION_CACHE_SIZE > 0, evaluates imaginary generations in worker processes instead of the imagination space
+        self.candidatePopulation = None #stand-ins for the imaginary robots that the CI works on when the fitness evaluator is used
+        self.compileTerrain = MainProgramParameters.COMPILE_TERRAIN
+        self.phaseTimers = PhaseTimers() #always on. Where each main loop iteration's wall time goes
+        self.showPhaseTimings = MainProgramParameters.SHOW_PHASE_TIMINGS
+        self.trace = TraceRecorder(MainProgramParameters.RECORD_TRACE) #Chrome/Perfetto trace of the run, saved when runWorld ends
         
     def initialize(self):
         super(ImaginationTwin, self).initialize()
-        if self.runWhichTerrain == Terrains.FLAT_GROUND: pass #no need to create any obstacles
-        if self.runWhichTerrain == Terrains.RANDOM_BOXES_LOW_DENSE: self.createTerrainRandomBoxesLowDense()
-        if self.runWhichTerrain == Terrains.RANDOM_SPHERES_LOW_DENSE: self.createSpheresTerrain()
-        if self.runWhichTerrain == Terrains.STAIRCASE_UP_DOWN: self.createStaircaseUpDownTerrain()
-        if self.runWhichTerrain == Terrains.ALTERNATOR: self.createAlternatorTerrain()
+        self.imaginationSpace = pymunk.Space()
+        self.imaginationSpace.gravity = self.space.gravity
+        self.terrainObjects = self.getTerrainObjects()
+        if self.compileTerrain: self.terrainObjects = self.compileTerrainObjects(self.terrainObjects)
+        self.createTerrainObjects(self.terrainObjects)
 
         #self.replicateDebrisToImaginary(self.imaginaryWorldYOffset, self.imaginationColor)       
         self.createGround(0, self.debrisElevFromBottomWall, self.groundColor)
-        self.createWorldBoundary(0, self.imaginaryWorldYOffset, self.imaginationColor) 
+        self.createWorldBoundary(0, self.imaginaryWorldYOffset, self.imaginationColor, self.imaginationSpace) 
         self.__addFinishLine__()      
-        self.createGround(0, self.imaginaryWorldYOffset, self.imaginationGroundColor)        
-        self.cumulativePosUpdateBy = Vec2d(0,0)      
+        self.createGround(0, self.imaginaryWorldYOffset, self.imaginationGroundColor, self.imaginationSpace)        
         self.createImaginaryRobots()
+        self.configureBroadphase(self.space); self.configureBroadphase(self.imaginationSpace)
+        self.configureSleeping(self.imaginationSpace)
+        if MainProgramParameters.NUM_EVALUATION_WORKERS > 0 or MainProgramParameters.EVALUATION_CACHE_SIZE > 0: self.createFitnessEvaluator()
         #---to run imaginary robots
         self.moveMotorsStateImagined = MoveMotors(self.imaginaryRobots, self)
         self.genStateImagined = Generation(self.imaginaryRobots, self)
@@ -382,66 +486,116 @@ class ImaginationTwin(Worlds):#inherits
         self.moveMotorsStateReal = MoveMotors(self.robots, self)
         self.genStateReal = Generation(self.robots, self)        
 
-    def runWorld(self):
-        clock = pygame.time.Clock()
+    def runWorld(self, maxFrames=None):#maxFrames stops the run early, e.g. for benchmarks. None runs until the finish line
+        clock = self.createClock()
         simulating = True        
         self.startTime = time.time()
+        self.simClock.reset()
+        self.phaseTimers.reset()
+        self.trace.start(self.simClock)
+        self.trace.setRunStep(self.runState)
 #         deletemeStartTime = time.time() 
 #         deletemeRunStateTracker = self.runState 
 #         deletemeImaginaryRunTimeSum = 0
 #         deletemeRealRunTimeSum = 0
         abortRun = False
         while simulating:
-            for event in pygame.event.get():
-                if event.type == QUIT:# or (event.type == KEYDOWN and event.key in (K_q, K_ESCAPE)):
+            self.phaseTimers.begin()
+            runStepAtStart = self.runState
+            for event in self.getEvents():
+                if event.type == pygame.QUIT:# or (event.type == KEYDOWN and event.key in (K_q, K_ESCAPE)):
                     #sys.exit(0)
                     print('Command to quit registered')
                     simulating = False
-                if event.type == KEYDOWN:
+                if event.type == pygame.KEYDOWN:
                     #if event.key == K_UP: self.cameraXY += Vec2d(0, -self.cameraMoveDist[1])
                     #if event.key == K_DOWN: self.cameraXY += Vec2d(0, self.cameraMoveDist[1])
-                    if event.key == K_LEFT: self.moveCameraBy(self.cameraMoveDist[0])
-                    if event.key == K_RIGHT: self.moveCameraBy(-self.cameraMoveDist[0])
-                    if event.key == K_a: abortRun = True
+                    if event.key == pygame.K_LEFT: self.moveCameraBy(self.cameraMoveDist[0])
+                    if event.key == pygame.K_RIGHT: self.moveCameraBy(-self.cameraMoveDist[0])
+                    if event.key == pygame.K_a: abortRun = True
             if not simulating: break #coz break within event for loop won't exit while
+            if maxFrames != None and self.simClock.physicsFrames >= maxFrames: break
+            self.phaseTimers.lap(PhaseTimers.EVENTS)
             #---camera follow robot
             #self.__makeCameraFollowRobot__()
             #---Update physics
-            dt = 1.0 / float(self.fps) / float(self.iterations)
-            for _ in range(self.iterations): #iterations to get a more stable simulation
-                self.space.step(dt)
-            #---Update world based on camera focus
-            self.updatePosition()
+            self.stepPhysics()
+            self.phaseTimers.lap(PhaseTimers.PHYSICS)
+            #---Update view based on camera focus
+            self.updateCamera()
             self.updateColor()
+            self.phaseTimers.lap(PhaseTimers.CAMERA)
             
-            if self.runState == RunStep.IMAGINARY_GENERATION: self.genStateImagined.run()
-            if self.runState == RunStep.IMAGINARY_MOTOR_EXEC: self.moveMotorsStateImagined.run()                    
-            if self.runState == RunStep.REAL_MOTOR_EXEC: self.moveMotorsStateReal.run()
-            if self.runState == RunStep.REAL_GENERATION: self.genStateReal.run()
-            self.generateInfoString()
+            if self.runState == RunStep.IMAGINARY_GENERATION: self.genStateImagined.run(); self.trace.setRunStep(self.runState) #a state can hand over to the next one within the same frame
+            if self.runState == RunStep.IMAGINARY_MOTOR_EXEC: self.moveMotorsStateImagined.run(); self.trace.setRunStep(self.runState)
+            if self.runState == RunStep.REAL_MOTOR_EXEC: self.moveMotorsStateReal.run(); self.trace.setRunStep(self.runState)
+            if self.runState == RunStep.REAL_GENERATION: self.genStateReal.run(); self.trace.setRunStep(self.runState)
+            self.phaseTimers.lap(PhaseTimers.STATE_MACHINE)
+            if not self.headless: self.generateInfoString()
+            self.phaseTimers.lap(PhaseTimers.INFO_STRING)
             
             #---if robot reaches goal, stop
-            if abortRun or self.robots[self.cons.mainRobotID].getPosition()[self.cons.xID] - self.cumulativePosUpdateBy[0] > self.finishLine:#reached end of world
+            if abortRun or self.robots[self.cons.mainRobotID].getPosition()[self.cons.xID] > self.finishLine:#reached end of world
                 totalTimeTaken = int(time.time() - self.startTime)
-                finishMessage = 'Aborted_run_' if abortRun else 'Crossed_finish_line_'  + '_in_'+str(totalTimeTaken)+ '_seconds_for_trial_'+str(self.trialNumber)+'_CI_'+ self.runWhichCI+'_Terrain_'+self.runWhichTerrain
+                simulatedTimeTaken = round(self.simClock.now(), self.decimalPrecision)
+                finishMessage = 'Aborted_run_' if abortRun else 'Crossed_finish_line_'  + '_in_'+str(simulatedTimeTaken)+ '_simulated_seconds_for_trial_'+str(self.trialNumber)+'_CI_'+ self.runWhichCI+'_Terrain_'+self.runWhichTerrain
                 print(finishMessage)
-                print('Real robot would have been active for: ', str(totalTimeTaken * 1/MainProgramParameters.MAX_GENS),'s')
-                os.system('spd-say '+finishMessage)
+                print('Wall time taken: ', str(totalTimeTaken), 's. Physics frames: ', self.simClock.physicsFrames, ', real generations: ', self.simClock.realGenerations, ', imaginary generations: ', self.simClock.imaginaryGenerations)
+                print('Real robot was active for: ', str(round(self.simClock.getRealTime(), self.decimalPrecision)),'simulated s')
+                print('Physics sub-steps: ', self.simClock.physicsSubsteps, ', per space per frame: ', round(self.simClock.getMeanSubsteps(), self.decimalPrecision))
+                if self.bodySleepTime != None: print('Sleeping bodies per space per frame: ', round(self.simClock.getMeanSleepingBodies(), self.decimalPrecision))
+                print(self.phaseTimers.getReportString())
+                metrics = self.simClock.getMetrics()
+                metrics[ProgramMetrics.instrumentation] = self.phaseTimers.getSummary()
+                if self.fitnessEvaluator != None and self.fitnessEvaluator.cache != None:
+                    print(self.fitnessEvaluator.cache.getInfoString())
+                    metrics.update(self.fitnessEvaluator.cache.getMetrics())
+                if not self.headless: os.system('spd-say '+finishMessage)
                 if not self.trialNumber == None: 
-                    self.analytics.saveFinishingTime(self.genStateImagined.maxGens, self.runWhichCI, self.runWhichTerrain, self.trialNumber, self.numImaginaryRobots, totalTimeTaken)                    
+                    self.finishingResult = (self.genStateImagined.maxGens, self.runWhichCI, self.runWhichTerrain, self.trialNumber, self.numImaginaryRobots, totalTimeTaken, metrics)
+                    if self.saveResults: self.analytics.saveFinishingTime(*self.finishingResult)                    
                 break
             
             #---draw all objects            
             self.draw()                            
-            clock.tick(self.fps)
+            self.phaseTimers.lap(PhaseTimers.DRAW)
+            self.tickClock(clock)
+            self.phaseTimers.lap(PhaseTimers.CLOCK_TICK)
+            if self.phaseTimers.isCountSampleDue(): self.phaseTimers.sampleCounts(self.getSpaces()); self.phaseTimers.lap(PhaseTimers.INSTRUMENTATION)
+            self.phaseTimers.endIteration(runStepAtStart)
+        self.trace.save(self.fileOps.dir.tracesFolder, self.fileOps.getUniqueNameForTrace(self.runWhichCI, self.runWhichTerrain, self.trialNumber))
 
     #--------------------------------------------------------------------------------------------
     #------------------------------------ helper functions --------------------------------------
     #--------------------------------------------------------------------------------------------
     def generateInfoString(self):     
-        elapsedTime = ', time: '+str(int(time.time() - self.startTime))+'s'
+        elapsedTime = ', time: '+str(int(self.simClock.now()))+'s (wall: '+str(int(time.time() - self.startTime))+'s)'
         self.infoString = self.genStateImagined.getInfoString() + ("" if self.trialNumber==None else ", trial: "+str(self.trialNumber+1)) +  ", terrain: " + self.runWhichTerrain.lower() + elapsedTime
+        if self.showPhaseTimings: self.infoString = [self.infoString, 'Loop time: ' + self.phaseTimers.getInfoString()]
             
+    def isRealFrame(self):#frames in the real robot's states are real robot activity. The rest is imagination
+        return self.runState == RunStep.REAL_MOTOR_EXEC or self.runState == RunStep.REAL_GENERATION
+    
+    def getSpaces(self):
+        return [self.space, self.imaginationSpace]
+    
+    def getStaticShapes(self):
+        return self.boundaryObjects + self.worldObjects + self.imaginationObjects
+    
+    def stepPhysics(self):#a space is stepped only in its own phase or while its robots aren't frozen (e.g. the real robot settling before its first generation)
+        isRealFrame = self.isRealFrame()
+        activeSpaces = []
+        if isRealFrame or not self.areRobotsStatic(self.robots): activeSpaces.append(self.space)
+        if not isRealFrame or not self.areRobotsStatic(self.imaginaryRobots): activeSpaces.append(self.imaginationSpace)
+        for space in activeSpaces:
+            self.stepSpace(space)
+        self.simClock.tick(isRealFrame)
+    
+    def areRobotsStatic(self, robots):
+        for robo in robots:
+            if not robo.isStatic(): return False
+        return True
+    
     def moveCameraBy(self, dist):
         self.cameraXY += Vec2d(dist, 0)
         self.prevRobotPos = self.robots[0].getPosition()
@@ -451,21 +605,49 @@ class ImaginationTwin(Worlds):#inherits
         if abs(robotMovedByX) > self.moveCameraAtThisDistDiff:
             self.moveCameraBy(robotMovedByX)                            
         
+    def getBoundaryEdges(self):#x of the inner faces of the side walls and of the finish line, and y of the inner faces of the floor and ceiling walls, in the real world's coordinates
+        return ([self.wallThickness, self.worldWidth - self.wallThickness, self.finishLine], [self.wallThickness, self.worldHeight - self.wallThickness])
+        
     def __addFinishLine__(self):
         self.createBox(self.finishLine, self.wallThickness+142, 2, self.worldHeight-47, self.finishLineColor, self.robotBodyShapeFilter)
     
-    def createGround(self, groundX, groundY, grColor):
-        self.createBox(groundX+self.worldWidth/2, groundY+self.wallThickness+self.wallThickness/2, self.worldWidth-2*self.wallThickness, self.wallThickness, grColor, None)
+    def createGround(self, groundX, groundY, grColor, space=None):
+        self.createBox(groundX+self.worldWidth/2, groundY+self.wallThickness+self.wallThickness/2, self.worldWidth-2*self.wallThickness, self.wallThickness, grColor, None, space)
+        
+    def getTerrainObjects(self):#description of the terrain to run, in the format createTerrainObjects takes. None for flat ground
+        if self.runWhichTerrain == Terrains.FLAT_GROUND: return None #no need to create any obstacles
+        if self.runWhichTerrain == Terrains.RANDOM_BOXES_LOW_DENSE: return self.loadOrGenerateTerrainObjects(self.generateRandomBoxesTerrainObjects)
+        if self.runWhichTerrain == Terrains.RANDOM_SPHERES_LOW_DENSE: return self.loadOrGenerateTerrainObjects(self.generateSpheresTerrainObjects)
+        if self.runWhichTerrain == Terrains.STAIRCASE_UP_DOWN: return self.generateStaircaseUpDownTerrainObjects()
+        if self.runWhichTerrain == Terrains.ALTERNATOR: return self.generateAlternatorTerrainObjects()
+        
+    def compileTerrainObjects(self, terrainObjects):#the stored description stays as it is. Only the shapes built into the spaces are merged
+        compiler = TerrainCompiler()
+        compiledObjects = compiler.compile(terrainObjects)
+        if compiledObjects != None: print(compiler.getReductionString())
+        return compiledObjects
         
     def createTerrainObjects(self, terrainObjects): #terrainObjects = {RECTANGLE: [{COL: val}, {ROW: val} ...], CIRCLE: [{}, {} ...]}
+        self.createTerrainObjectsInSpace(terrainObjects, 0, self.space)
+        self.createTerrainObjectsInSpace(terrainObjects, self.imaginaryWorldYOffset, self.imaginationSpace)
+        
+    def createTerrainObjectsInSpace(self, terrainObjects, yOffset, space):
+        if terrainObjects == None: return
         for shapeType in terrainObjects:#find rectangles or circles
             for o in terrainObjects[shapeType]:#iterate list of dicts that represent objects              
                 if shapeType == ShapeTypes.RECTANGLE:           
-                    self.createBox(o[ShapeProperties.COL], o[ShapeProperties.ROW], o[ShapeProperties.WIDTH], o[ShapeProperties.HEIGHT], self.imaginationColor, None)
-                    self.createBox(o[ShapeProperties.COL], self.imaginaryWorldYOffset+o[ShapeProperties.ROW], o[ShapeProperties.WIDTH], o[ShapeProperties.HEIGHT], self.imaginationColor, None)
+                    self.createBox(o[ShapeProperties.COL], yOffset+o[ShapeProperties.ROW], o[ShapeProperties.WIDTH], o[ShapeProperties.HEIGHT], self.imaginationColor, None, space)
                 if shapeType == ShapeTypes.CIRCLE:
-                    self.createSphere(o[ShapeProperties.COL], o[ShapeProperties.ROW], o[ShapeProperties.WIDTH])
-                    self.createSphere(o[ShapeProperties.COL], self.imaginaryWorldYOffset+o[ShapeProperties.ROW], o[ShapeProperties.WIDTH])
+                    self.createSphere(o[ShapeProperties.COL], yOffset+o[ShapeProperties.ROW], o[ShapeProperties.WIDTH], space)
+    
+    def getTerrainObjectSizes(self):
+        sizes = []
+        if self.terrainObjects == None: return sizes
+        for shapeType in self.terrainObjects:
+            for o in self.terrainObjects[shapeType]:
+                if shapeType == ShapeTypes.RECTANGLE: sizes.append(max(o[ShapeProperties.WIDTH], o[ShapeProperties.HEIGHT]))
+                if shapeType == ShapeTypes.CIRCLE: sizes.append(2 * o[ShapeProperties.WIDTH])
+        return sizes
     
     def loadOrCreateTerrain(self):        
         filename = self.fileOps.getUniqueNameForTerrainTrials(self.runWhichTerrain, self.trialNumber)#, self.numImaginaryRobots)
@@ -475,65 +657,67 @@ class ImaginationTwin(Worlds):#inherits
         else: terrainObjects = None
         return terrainObjects, filename, fileExists
         
-    def createTerrainRandomBoxesLowDense(self):
+    def loadOrGenerateTerrainObjects(self, generateTerrainObjects):#generateTerrainObjects is the function that creates fresh randomized objects
         terrainObjects = None; fileExists = False
         if not self.trialNumber == None:
             terrainObjects, filename, fileExists = self.loadOrCreateTerrain()
         if terrainObjects == None or self.trialNumber == None: #then create fresh randomized objects
-            terrainObjects = {ShapeTypes.RECTANGLE: []}
-            numObjects = 100; debrisStartCol = 200; debrisMaxHt = 80; boxMinSz = 5; boxMaxSz = 30
-            for _ in range(numObjects):
-                col = random.randint(debrisStartCol, self.worldWidth-2*self.wallThickness)
-                row = random.randint(self.debrisElevFromBottomWall+2*self.wallThickness, self.debrisElevFromBottomWall+debrisMaxHt)
-                wid = random.randint(boxMinSz, boxMaxSz)
-                ht = random.randint(boxMinSz, boxMaxSz)
-                rect = {ShapeProperties.COL: col}; rect[ShapeProperties.ROW] = row; rect[ShapeProperties.WIDTH] = wid; rect[ShapeProperties.HEIGHT] = ht
-                terrainObjects[ShapeTypes.RECTANGLE].append(rect)
-        self.createTerrainObjects(terrainObjects)
+            terrainObjects = generateTerrainObjects()
         #---write
         if not fileExists and not self.trialNumber == None:#write to file only if it's one of the trials
             self.fileOps.savePickleFile(self.fileOps.dir.terrainObjectsFolder, filename, terrainObjects)
+        return terrainObjects
+    
+    def prepareTerrainFile(self):#stores this trial's randomized terrain without building the world, so parallel workers of a trial all load the same terrain
+        self.getTerrainObjects()
+        
+    def generateRandomBoxesTerrainObjects(self):
+        terrainObjects = {ShapeTypes.RECTANGLE: []}
+        numObjects = 100; debrisStartCol = 200; debrisMaxHt = 80; boxMinSz = 5; boxMaxSz = 30
+        for _ in range(numObjects):
+            col = random.randint(debrisStartCol, self.worldWidth-2*self.wallThickness)
+            row = random.randint(self.debrisElevFromBottomWall+2*self.wallThickness, self.debrisElevFromBottomWall+debrisMaxHt)
+            wid = random.randint(boxMinSz, boxMaxSz)
+            ht = random.randint(boxMinSz, boxMaxSz)
+            rect = {ShapeProperties.COL: col}; rect[ShapeProperties.ROW] = row; rect[ShapeProperties.WIDTH] = wid; rect[ShapeProperties.HEIGHT] = ht
+            terrainObjects[ShapeTypes.RECTANGLE].append(rect)
+        return terrainObjects
             
-    def createAlternatorTerrain(self):  
+    def generateAlternatorTerrainObjects(self):  
+        terrainObjects = {ShapeTypes.RECTANGLE: []}
         w = 20; h1 = 60; h2 = 150; r1 = 55; r2 = 130
         alternate = True
         for col in range(200, self.worldWidth-100, w*3):            
             r = r1 if alternate else r2
             h = h1 if alternate else h2
-            self.createBox(col, r, w, h, self.imaginationColor, None)
-            self.createBox(col, self.imaginaryWorldYOffset+r, w, h, self.imaginationColor, None)
+            terrainObjects[ShapeTypes.RECTANGLE].append({ShapeProperties.COL: col, ShapeProperties.ROW: r, ShapeProperties.WIDTH: w, ShapeProperties.HEIGHT: h})
             alternate = False if alternate else True  
+        return terrainObjects
     
-    def createStaircaseUpDownTerrain(self):
+    def generateStaircaseUpDownTerrainObjects(self):
+        terrainObjects = {ShapeTypes.RECTANGLE: []}
         w = 45; h = 35; row = 45; rowIncr = h
         downward = False
         for col in range(220, self.worldWidth-200, w):
-            self.createBox(col, row, w, h, self.imaginationColor, None)
-            self.createBox(col, row+self.imaginaryWorldYOffset, w, h, self.imaginationColor, None)
+            terrainObjects[ShapeTypes.RECTANGLE].append({ShapeProperties.COL: col, ShapeProperties.ROW: row, ShapeProperties.WIDTH: w, ShapeProperties.HEIGHT: h})
             if col > self.worldWidth-500: downward = True  
             if downward: row = row - rowIncr
             else: row = row + rowIncr
+        return terrainObjects
     
-    def createSpheresTerrain(self):
-        terrainObjects = None; fileExists = False
-        if not self.trialNumber == None:
-            terrainObjects, filename, fileExists = self.loadOrCreateTerrain()
-        if terrainObjects == None or self.trialNumber == None: #then create fresh randomized objects
-            terrainObjects = {ShapeTypes.CIRCLE: []}
-            numObjects = 50; minSize = 5; maxSize = 20
-            minX = 200; maxX = self.worldWidth-150; yPosition = 40
-            for _ in range(numObjects):
-                xPos = random.randint(minX, maxX)
-                sphereSize = random.randint(minSize, maxSize)
-                circ = {ShapeProperties.COL: xPos}; circ[ShapeProperties.ROW] = yPosition; circ[ShapeProperties.WIDTH] = sphereSize
-                terrainObjects[ShapeTypes.CIRCLE].append(circ)
-        self.createTerrainObjects(terrainObjects)
-        #---write
-        if not fileExists and not self.trialNumber == None:#write to file only if it's one of the trials
-            self.fileOps.savePickleFile(self.fileOps.dir.terrainObjectsFolder, filename, terrainObjects)
+    def generateSpheresTerrainObjects(self):
+        terrainObjects = {ShapeTypes.CIRCLE: []}
+        numObjects = 50; minSize = 5; maxSize = 20
+        minX = 200; maxX = self.worldWidth-150; yPosition = 40
+        for _ in range(numObjects):
+            xPos = random.randint(minX, maxX)
+            sphereSize = random.randint(minSize, maxSize)
+            circ = {ShapeProperties.COL: xPos}; circ[ShapeProperties.ROW] = yPosition; circ[ShapeProperties.WIDTH] = sphereSize
+            terrainObjects[ShapeTypes.CIRCLE].append(circ)
+        return terrainObjects
                                                        
-    def createBox(self, x, y, wd, ht, colour, fil):
-        body = pymunk.Body(body_type = pymunk.Body.KINEMATIC)
+    def createBox(self, x, y, wd, ht, colour, fil, space=None):#space defaults to the real world's space
+        body = pymunk.Body(body_type = pymunk.Body.STATIC)
         body.position = Vec2d(x, y)
         body.width = wd
         body.height = ht
@@ -545,45 +729,51 @@ class ImaginationTwin(Worlds):#inherits
         except:
             pass
         shape.friction = self.highFriction
-        self.space.add(shape)
-        self.worldObjects.append(shape)  
+        self.addTerrainObject(space, shape)
         
-    def createSphere(self, xPosition, yPosition, radius):
-        sphereMass = 5000
-        sphereInertia = pymunk.moment_for_circle(sphereMass, 0, radius, (0, 0))
-        body = pymunk.Body(sphereMass, sphereInertia, body_type=pymunk.Body.KINEMATIC)
+    def createSphere(self, xPosition, yPosition, radius, space=None):#space defaults to the real world's space
+        body = pymunk.Body(body_type=pymunk.Body.STATIC)
         #x = random.randint(115, 350)
         body.position = xPosition, yPosition
         shape = pymunk.Circle(body, radius, (0, 0))
         #shape.elasticity = 0.95
         shape.friction = 20
         shape.color = self.imaginationColor
-        self.space.add(body, shape)
-        self.worldObjects.append(shape)          
+        self.addTerrainObject(space, shape)
+    
+    def addTerrainObject(self, space, *objects):#the shape is last. It's tracked per space for camera moves and deletion
+        if space == None or space == self.space: 
+            self.space.add(*objects); self.worldObjects.append(objects[-1])
+        else: 
+            space.add(*objects); self.imaginationObjects.append(objects[-1])
         
-    def setImaginaryRobotPositionAndAnglesToRealRobot(self):
-        pos = self.robots[self.cons.mainRobotID].getPositions()
-        angles = self.robots[self.cons.mainRobotID].getUniqueBodyAngles()
+    def createFitnessEvaluator(self):
+        from FitnessEvaluation import BatchFitnessEvaluator, CandidatePopulation #imported here since FitnessEvaluation builds its scenes from this module
+        numWorkers = MainProgramParameters.NUM_EVALUATION_WORKERS
+        if multiprocessing.current_process().daemon: numWorkers = 0 #worlds run by the parallel trial runner can't start processes of their own
+        self.fitnessEvaluator = BatchFitnessEvaluator(self.legsCode, self.terrainObjects, self.numImaginaryRobots, numWorkers, MainProgramParameters.EVALUATION_CACHE_SIZE, self.getBoundaryEdges(), MainProgramParameters.EVALUATION_CACHE_MIN_SAMPLES)
+        self.candidatePopulation = CandidatePopulation(self.fitnessEvaluator, self.imaginaryRobots[0], self.numImaginaryRobots)
         for robo in self.imaginaryRobots:
-            p = pos[:]; a = angles[:] #copying values instead of references
-            robo.setBodyPositionAndAngles(p, a, Vec2d(0, self.imaginaryWorldYOffset))
-            robo.saveGenStartPos()
-            robo.stopMotion()        
+            robo.makeRobotStatic() #they stay put, so the imagination space isn't stepped for nothing
+        
+    def setImaginaryRobotPositionAndAnglesToRealRobot(self):#exact positions, angles and velocities of the real robot
+        snapshot = self.robots[self.cons.mainRobotID].takeSnapshot()
+        restoreSnapshotToRobots(snapshot, self.imaginaryRobots, Vec2d(0, self.imaginaryWorldYOffset))
+        self.imaginaryStateBuffer.saveGenStartPositions()
+        self.imaginaryStateBuffer.stopMotion()
                 
     def delete(self):
         super(ImaginationTwin, self).delete()   
         for ob in self.worldObjects:
             self.space.remove(ob)
         self.worldObjects[:] = []  
-    
-    def updatePosition(self):  
-        updateBy = super(ImaginationTwin, self).updatePosition()    
-        self.cumulativePosUpdateBy += updateBy
-        if updateBy != (0, 0):
-            for ob in self.worldObjects:
-                ob.body.position += updateBy   
-            for obj in self.imaginaryRobots:
-                obj.updatePosition(updateBy)       
+        for ob in self.imaginationObjects:
+            self.imaginationSpace.remove(ob)
+        self.imaginationObjects[:] = []
+        self.deleteImaginaryRobots()
+        if self.fitnessEvaluator != None: 
+            self.fitnessEvaluator.close()
+            self.fitnessEvaluator = None; self.candidatePopulation = None
     
     def updateColor(self):
         for robo in self.robots:#for the main robot
@@ -596,13 +786,16 @@ class ImaginationTwin(Worlds):#inherits
             else: self.imaginaryRobots[i].setImaginaryRobotColor()
             
     def createImaginaryRobots(self):      
+        if self.robotPool == None: self.robotPool = RobotPool(self.numImaginaryRobots)
         for _ in range(0, self.numImaginaryRobots, 1):
-            self.imaginaryRobots.append(RobotBody(self.space, self.robotInitPos + Vec2d(0, self.imaginaryWorldYOffset), self.legsCode, self.fps))#deliberately placing it outside screen since it'll be brought back on screen in robot's position soon
+            self.imaginaryRobots.append(self.robotPool.acquire(self.imaginationSpace, self.robotInitPos + Vec2d(0, self.imaginaryWorldYOffset), self.legsCode, self.fps))#reused from an earlier initialize, or from earlier worlds sharing the pool. Deliberately placing it outside screen since it'll be brought back on screen in robot's position soon
+        self.imaginaryStateBuffer = RobotStateBuffer(self.imaginaryRobots) if len(self.imaginaryRobots) > 0 else None #the CIs read and write the whole population through it
             
     def deleteImaginaryRobots(self):
         for r in self.imaginaryRobots:
-            r.delete()
-        self.imaginaryRobots[:] = []    
+            self.robotPool.release(r) #kept for the next createImaginaryRobots instead of being rebuilt
+        self.imaginaryRobots[:] = []
+        self.imaginaryStateBuffer = None
 
 #------------------------------------------------------------------------------------------------
 #------------------------------------------------------------------------------------------------
@@ -617,44 +810,45 @@ class Heaven(Worlds):#inherits
         self.screenHeight = 620 #keep at at least 350        
         self.worldWidth = 900 #overriding
         self.worldHeight = 620 #overriding        
+        self.sensedObjects = OccupancyGrid(self.worldWidth, self.worldHeight) #what the robots' TactileSensors sensed. Not drawn, since these robots don't show their imagination
         self.numRobots = 24 #378
     
     def runWorld(self): #may get overridden in child class
-        clock = pygame.time.Clock()
+        clock = self.createClock()
         simulating = True
         while simulating:
-            for event in pygame.event.get():
-                if event.type == QUIT or (event.type == KEYDOWN and event.key in (K_q, K_ESCAPE)):
+            for event in self.getEvents():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key in (pygame.K_q, pygame.K_ESCAPE)):
                     simulating = False #sys.exit(0)
-                if event.type == KEYDOWN:
-                    if event.key == K_UP: self.cameraXY += Vec2d(0, -self.cameraMoveDist[1])
-                    if event.key == K_DOWN: self.cameraXY += Vec2d(0, self.cameraMoveDist[1])
-                    if event.key == K_LEFT: self.cameraXY += Vec2d(self.cameraMoveDist[0], 0)
-                    if event.key == K_RIGHT: self.cameraXY += Vec2d(-self.cameraMoveDist[0], 0)                    
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_UP: self.cameraXY += Vec2d(0, -self.cameraMoveDist[1])
+                    if event.key == pygame.K_DOWN: self.cameraXY += Vec2d(0, self.cameraMoveDist[1])
+                    if event.key == pygame.K_LEFT: self.cameraXY += Vec2d(self.cameraMoveDist[0], 0)
+                    if event.key == pygame.K_RIGHT: self.cameraXY += Vec2d(-self.cameraMoveDist[0], 0)                    
 #                     if event.key == K_n: 
 #                         print('Getting ready to display action network...'); 
 #                         self.actions.displayNetwork()
             if not simulating: 
                 break               
             #---Update physics
-            dt = 1.0 / float(self.fps) / float(self.iterations)
-            for _ in range(self.iterations): #iterations to get a more stable simulation
-                self.space.step(dt)
-            #---Update world based on player focus
-            self.updatePosition()
+            self.stepPhysics()
+            #---Update view based on player focus
+            self.updateCamera()
             for robo in self.robots:
                 robo.run()
             #---draw all objects
             self.draw()            
-            clock.tick(self.fps)
+            self.tickClock(clock)
         #---actions to do after simulation
         #self.actions.saveNetwork() 
 
     def initialize(self):
         super(Heaven, self).initialize() 
+        self.createContactRecorder(self.space, self.robots, includeChassis=True) #the robots' TactileSensors read it
         self.removeBoundary()
     
     def initializeRobots(self):#overriding  
+        from LearningRobot import LearningRobot #imported here since only these worlds use it
         widthSep = 100; heightSep = 100; counter = 0
         for i in range(100, self.worldHeight, heightSep):
             if counter >= self.numRobots: break
@@ -675,12 +869,6 @@ class Heaven(Worlds):#inherits
         for ob in self.worldObjects:
             self.space.remove(ob)
         self.worldObjects[:] = []  
-     
-    def updatePosition(self):  
-        updateBy = super(Heaven, self).updatePosition()    
-        if updateBy != (0, 0):
-            for ob in self.worldObjects:
-                ob.body.position += updateBy     
                             
                             
 #------------------------------------------------------------------------------------------------
@@ -697,14 +885,9 @@ class ActualImagination(Worlds):#inherits
         self.screenHeight = 620 #keep at at least 350        
         self.worldWidth = 3000 #overriding
         self.worldHeight = 300
-        self.sensedObjects = []
-        #---create array representation of world for imagination
-        for _ in range(0, self.worldWidth, 1):
-            col = []
-            for _ in range(0, self.worldHeight, 1):
-                col.append(0)
-            self.sensedObjects.append(col)
+        self.sensedObjects = OccupancyGrid(self.worldWidth, self.worldHeight) #array representation of world for imagination
         self.imaginaryWorldYOffset = self.worldHeight 
+        self.overlay = SensedWorldOverlay(self.sensedObjects, self.imaginaryWorldYOffset) #draws what the robot sensed and its sensor markers, without adding bodies to the space
         self.numRobots = 1
         #self.numImaginaryRobots = 4 #min 4 robots required for ComputationalIntelligence
         self.imaginaryRobots = []
@@ -719,44 +902,43 @@ class ActualImagination(Worlds):#inherits
         
     def initialize(self):
         super(ActualImagination, self).initialize()       
+        self.createContactRecorder(self.space, self.robots, includeChassis=True) #the robot's TactileSensors read it
         self.createGround(0, self.debrisElevFromBottomWall, self.groundColor)
         self.createWorldBoundary(0, self.imaginaryWorldYOffset, self.imaginationColor)
         self.createFewObjects()       
         #self.createGround(0, self.imaginaryWorldYOffset, self.imaginationGroundColor)        
-        self.cumulativePosUpdateBy = Vec2d(0,0)            
     
     def runWorld(self): #may get overridden in child class
-        clock = pygame.time.Clock()
+        clock = self.createClock()
         simulating = True
         while simulating:
-            for event in pygame.event.get():
-                if event.type == QUIT or (event.type == KEYDOWN and event.key in (K_q, K_ESCAPE)):
+            for event in self.getEvents():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key in (pygame.K_q, pygame.K_ESCAPE)):
                     simulating = False #sys.exit(0)
-                if event.type == KEYDOWN:
-                    if event.key == K_UP: self.cameraXY += Vec2d(0, -self.cameraMoveDist[1])
-                    if event.key == K_DOWN: self.cameraXY += Vec2d(0, self.cameraMoveDist[1])
-                    if event.key == K_LEFT: self.cameraXY += Vec2d(self.cameraMoveDist[0], 0)
-                    if event.key == K_RIGHT: self.cameraXY += Vec2d(-self.cameraMoveDist[0], 0)                    
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_UP: self.cameraXY += Vec2d(0, -self.cameraMoveDist[1])
+                    if event.key == pygame.K_DOWN: self.cameraXY += Vec2d(0, self.cameraMoveDist[1])
+                    if event.key == pygame.K_LEFT: self.cameraXY += Vec2d(self.cameraMoveDist[0], 0)
+                    if event.key == pygame.K_RIGHT: self.cameraXY += Vec2d(-self.cameraMoveDist[0], 0)                    
 #                     if event.key == K_n: 
 #                         print('Getting ready to display action network...'); 
 #                         self.actions.displayNetwork()
             if not simulating: 
                 break               
             #---Update physics
-            dt = 1.0 / float(self.fps) / float(self.iterations)
-            for _ in range(self.iterations): #iterations to get a more stable simulation
-                self.space.step(dt)
-            #---Update world based on player focus
-            self.updatePosition()
+            self.stepPhysics()
+            #---Update view based on player focus
+            self.updateCamera()
             for robo in self.robots:
                 robo.run()
             #---draw all objects
             self.draw()            
-            clock.tick(self.fps)
+            self.tickClock(clock)
         #---actions to do after simulation
         #self.actions.saveNetwork() 
     
     def initializeRobots(self):#overriding  
+        from LearningRobot import LearningRobot #imported here since only these worlds use it
         widthSep = 100; heightSep = 100; counter = 0
         for i in range(100, self.worldHeight, heightSep):
             if counter >= self.numRobots: break
@@ -778,12 +960,6 @@ class ActualImagination(Worlds):#inherits
         for ob in self.worldObjects:
             self.space.remove(ob)
         self.worldObjects[:] = []  
-     
-    def updatePosition(self):  
-        updateBy = super(ActualImagination, self).updatePosition()    
-        if updateBy != (0, 0):
-            for ob in self.worldObjects:
-                ob.body.position += updateBy     
                                     
     def createGround(self, groundX, groundY, grColor):
         self.createBox(groundX+self.worldWidth/2, groundY+self.wallThickness+self.wallThickness/2, self.worldWidth-2*self.wallThickness, self.wallThickness, grColor)
@@ -794,7 +970,7 @@ class ActualImagination(Worlds):#inherits
         self.createBox(120, 60, w, h, self.groundColor)
         
     def createBox(self, x, y, wd, ht, colour):
-        body = pymunk.Body(body_type = pymunk.Body.KINEMATIC); body.position = Vec2d(x, y); body.width = wd; body.height = ht
+        body = pymunk.Body(body_type = pymunk.Body.STATIC); body.position = Vec2d(x, y); body.width = wd; body.height = ht
         shape = pymunk.Poly.create_box(body, (wd, ht)); shape.color = colour; shape.friction = self.highFriction; 
         self.space.add(shape); self.worldObjects.append(shape)   
         
@@ -811,14 +987,9 @@ class MovementAccuracyTestWorld(Worlds):#inherits
         self.screenHeight = 620 #keep at at least 350        
         self.worldWidth = 3000 #overriding
         self.worldHeight = 300
-        self.sensedObjects = []
-        #---create array representation of world for imagination
-        for _ in range(0, self.worldWidth, 1):
-            col = []
-            for _ in range(0, self.worldHeight, 1):
-                col.append(0)
-            self.sensedObjects.append(col)
+        self.sensedObjects = OccupancyGrid(self.worldWidth, self.worldHeight) #array representation of world for imagination
         self.imaginaryWorldYOffset = self.worldHeight 
+        self.overlay = SensedWorldOverlay(self.sensedObjects, self.imaginaryWorldYOffset) #draws what the robot sensed and its sensor markers, without adding bodies to the space
         self.numRobots = 1
         self.imaginaryRobots = []
         self.debrisElevFromBottomWall = 0
@@ -834,11 +1005,11 @@ class MovementAccuracyTestWorld(Worlds):#inherits
         
     def initialize(self):
         super(MovementAccuracyTestWorld, self).initialize()       
+        self.createContactRecorder(self.space, self.robots) #for the legs' points of contact
         self.createGround(0, self.debrisElevFromBottomWall, self.groundColor)
         self.createWorldBoundary(0, self.imaginaryWorldYOffset, self.imaginationColor)
         #self.createFewObjects()       
         #self.createGround(0, self.imaginaryWorldYOffset, self.imaginationGroundColor)        
-        self.cumulativePosUpdateBy = Vec2d(0,0)            
     
     def runWorld(self): #may get overridden in child class
         #---first test scenario
@@ -848,7 +1019,7 @@ class MovementAccuracyTestWorld(Worlds):#inherits
         analytics = TestAnalyticsForMovementAccuracy()
         folderToStoreResults = "testAccuracyOfRepeatedSimilarMotorRates/"
         originalPosition = self.robots[0].getPositions()
-        originalAngles = self.robots[0].getUniqueBodyAngles()
+        originalSnapshot = self.robots[0].takeSnapshot()
         numTrials = 20
         numSimulations = 100
         durationToRun = 50
@@ -869,7 +1040,7 @@ class MovementAccuracyTestWorld(Worlds):#inherits
                     self.runSimulation(durationToRun)
                     position = self.robots[0].getPosition()#end positions
                     ratesAndPositions.append([position[0], position[1]])
-                    self.resetRobotToOriginalPosition(originalPosition, originalAngles)                    
+                    self.resetRobotToOriginalPosition(originalSnapshot)                    
                 analytics.saveDataToDisk(folderToStoreResults, filename1, ratesAndPositions)
                 analytics.saveDataToDisk(folderToStoreResults, filename2, self.legsTouchSurface)
                 analytics.saveDataToDisk(folderToStoreResults, filename3, self.robotAngles)
@@ -900,24 +1071,22 @@ class MovementAccuracyTestWorld(Worlds):#inherits
             analytics.backwardForwardPercentages(originalPosition[0][0], xPositions, variances)
     
     def runSimulation(self, durationToRun):
-        clock = pygame.time.Clock()
+        clock = self.createClock()
         simulating = True
         self.robots[0].startMotion()    
         legsContact = [] #[[l1,l2,l3,l4], [] ...] 
         chAngle = []        
         counter = 0
         while simulating:
-            for event in pygame.event.get():
-                if event.type == QUIT or (event.type == KEYDOWN and event.key in (K_q, K_ESCAPE)):
+            for event in self.getEvents():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key in (pygame.K_q, pygame.K_ESCAPE)):
                     simulating = False #sys.exit(0)                   
             if not simulating: 
                 break               
             #---Update physics
-            dt = 1.0 / float(self.fps) / float(self.iterations)
-            for _ in range(self.iterations): #iterations to get a more stable simulation
-                self.space.step(dt)
-            #---Update world based on player focus
-            self.updatePosition()
+            self.stepPhysics()
+            #---Update view based on player focus
+            self.updateCamera()
             #---get tactile info
             tactileInputPerLeg = self.robots[0].getNumContactPointsForEachLeg() #[numTouchLeg1, numTouchleg2, ...4]
             legsContact.append(tactileInputPerLeg)  
@@ -929,7 +1098,7 @@ class MovementAccuracyTestWorld(Worlds):#inherits
             self.infoString = self.simInfoString + ', Frame: ' + str(counter) 
             #---draw all objects
             self.draw()            
-            clock.tick(self.fps)
+            self.tickClock(clock)
             counter = counter + 1
             if counter >= durationToRun: break
         #---actions to do after simulation  
@@ -948,10 +1117,9 @@ class MovementAccuracyTestWorld(Worlds):#inherits
         for robo in self.robots:
             robo.makeRobotDynamic()
             
-    def resetRobotToOriginalPosition(self, pos, angles):
+    def resetRobotToOriginalPosition(self, snapshot):
+        restoreSnapshotToRobots(snapshot, self.robots)
         for robo in self.robots:
-            p = pos[:]; a = angles[:] #copying values instead of references
-            robo.setBodyPositionAndAngles(p, a, Vec2d(0, 0))
             robo.saveGenStartPos()
             robo.stopMotion()          
 
@@ -965,12 +1133,6 @@ class MovementAccuracyTestWorld(Worlds):#inherits
         for ob in self.worldObjects:
             self.space.remove(ob)
         self.worldObjects[:] = []  
-     
-    def updatePosition(self):  
-        updateBy = super(MovementAccuracyTestWorld, self).updatePosition()    
-        if updateBy != (0, 0):
-            for ob in self.worldObjects:
-                ob.body.position += updateBy     
                                     
     def createGround(self, groundX, groundY, grColor):
         self.createBox(groundX+self.worldWidth/2, groundY+self.wallThickness+self.wallThickness/2, self.worldWidth-2*self.wallThickness, self.wallThickness, grColor)
@@ -981,7 +1143,7 @@ class MovementAccuracyTestWorld(Worlds):#inherits
 #         self.createBox(120, 60, w, h, self.groundColor)
         
     def createBox(self, x, y, wd, ht, colour):
-        body = pymunk.Body(body_type = pymunk.Body.KINEMATIC); body.position = Vec2d(x, y); body.width = wd; body.height = ht
+        body = pymunk.Body(body_type = pymunk.Body.STATIC); body.position = Vec2d(x, y); body.width = wd; body.height = ht
         shape = pymunk.Poly.create_box(body, (wd, ht)); shape.color = colour; shape.friction = self.highFriction; 
         self.space.add(shape); self.worldObjects.append(shape)   
         
\ No newline at end of file
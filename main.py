@@ -15,15 +15,20 @@
 # >>> python3 main.py
 
 import os
+import time
+import random
 import logging, traceback
+import multiprocessing
 from Analytics import ProgramAnalytics
 from Enums import RunCI, Terrains, Run, MainProgramParameters
-from Worlds import ImaginationTwin, ActualImagination, Heaven, MovementAccuracyTestWorld
     
 class MainSimulator(object):
-    def __init__(self, legs, simulationToRun):
+    def __init__(self, legs, simulationToRun, headless=MainProgramParameters.HEADLESS):
+        from Worlds import ImaginationTwin, ActualImagination, Heaven, MovementAccuracyTestWorld #imported when worlds are built rather than with this module, so the program starts faster
+        from WalkingRobot import RobotPool
         self.worlds = []
         self.worldOrdinal = -1        
+        self.headless = headless #True runs every registered world without display, drawing or frame rate cap
         #---registration of the worlds to runWorld
         #--------------------------------------------------------
         #-------------------- SINGLE RUNS -----------------------
@@ -65,6 +70,28 @@ class MainSimulator(object):
         if simulationToRun == Run.ACTUAL_IMAGINATION: self.worlds.append(Heaven(legs))
         if simulationToRun == Run.HEAVEN: self.worlds.append(ActualImagination(legs))  
         if simulationToRun == Run.MOVEMENT_ACCURACY_CHECKER: self.worlds.append(MovementAccuracyTestWorld(legs))           
+        for w in self.worlds: w.headless = self.headless
+        twins = [w for w in self.worlds if isinstance(w, ImaginationTwin)]
+        if len(twins) > 0: #nextWorld() runs them one after another, so each reuses the robots the previous one built
+            robotPool = RobotPool(max([w.numImaginaryRobots for w in twins]))
+            for w in twins: w.robotPool = robotPool
+    
+    def runInParallel(self, numWorkers=None):#runs the registered ImaginationTwin worlds headless across a pool of processes. numWorkers=None uses all cores. Other worlds are left for nextWorld() to run afterwards
+        from Worlds import ImaginationTwin
+        worldSpecs = []
+        for w in self.worlds:
+            if not isinstance(w, ImaginationTwin): print(w.__class__.__name__, 'will run after the parallel trials, since only ImaginationTwin worlds can run in parallel'); continue
+            worldSpecs.append((w.legsCode, w.runWhichCI, w.runWhichTerrain, w.trialNumber))
+            w.prepareTerrainFile() #create trial terrains here, so workers of the same trial don't each generate a different one
+        self.worlds = [w for w in self.worlds if not isinstance(w, ImaginationTwin)] #nextWorld() runs the rest serially, in their registered order
+        self.worldOrdinal = -1
+        analytics = ProgramAnalytics(); numCompleted = 0; startTime = time.time()
+        with multiprocessing.Pool(numWorkers, initializer=random.seed, maxtasksperchild=1) as pool:#random.seed reseeds each forked worker, since they'd otherwise share the parent's random state
+            for worldSpec, finishingResult in pool.imap_unordered(runWorldSpecHeadless, worldSpecs):
+                numCompleted += 1
+                if finishingResult != None: analytics.saveFinishingTime(*finishingResult) #only the parent writes runMetrics
+                elapsedTime = time.time() - startTime
+                print('Completed', numCompleted, '/', len(worldSpecs), ':', worldSpec[1:], '. Wall time', int(elapsedTime), 's. Estimated time left', int(elapsedTime / numCompleted * (len(worldSpecs) - numCompleted)), 's')
     
     def nextWorld(self):
         self.worldOrdinal += 1
@@ -76,6 +103,17 @@ class MainSimulator(object):
             w.delete()    
         return self.worldOrdinal < len(self.worlds)#any more worlds to process?
 
+def runWorldSpecHeadless(worldSpec):#runs in a worker process of MainSimulator.runInParallel
+    from Worlds import ImaginationTwin
+    legs, runWhichCI, runWhichTerrain, trialNum = worldSpec
+    w = ImaginationTwin(legs, runWhichCI, runWhichTerrain, trialNum)
+    w.headless = True
+    w.saveResults = False #the parent process saves, so no two workers write runMetrics files
+    w.initialize()
+    w.runWorld()
+    w.delete()
+    return worldSpec, w.finishingResult
+
 #-----------------------------------------------
 #-----------------------------------------------
 #             PROGRAM STARTS HERE
@@ -88,12 +126,14 @@ if __name__ == '__main__':
     sim = None
     #sim = MainSimulator(legs, Run.IMAGINATION_TWIN)
     #sim = MainSimulator(legs, Run.IMAGINATION_TWIN_TRIAL_MULTI_RUNS)    
+    #sim = MainSimulator(legs, Run.IMAGINATION_TWIN_TRIAL_MULTI_RUNS, headless=True) #unthrottled batch run without a display
     #sim = MainSimulator(legs, Run.ACTUAL_IMAGINATION)
     #sim = MainSimulator(legs, Run.HEAVEN)
     #sim = MainSimulator(legs, Run.MOVEMENT_ACCURACY_CHECKER)
     
     try:
         if sim != None:
+            if MainProgramParameters.NUM_PARALLEL_WORKERS != 1: sim.runInParallel(MainProgramParameters.NUM_PARALLEL_WORKERS)
             while sim.nextWorld():
                 pass
     except BaseException as e:
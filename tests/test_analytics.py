@@ -0,0 +1,32 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import os
+import time
+from Analytics import FileOperations, ProgramAnalytics
+from Enums import Directories, ProgramMetrics
+
+def saveLegacyPickle(fileOps, numGens, nameOfCI, terrainName, trialNumber, timeTaken, savedAt):#a run saved the way it was before RunMetricsStore existed
+    m = ProgramMetrics()
+    filename = fileOps.getUniqueNameForFinishingTime(numGens, nameOfCI, terrainName, trialNumber, 30)
+    fileOps.savePickleFile(Directories.programMetricsFolder, filename, {m.numGens: numGens, m.timeToCrossFinishLine: timeTaken, m.runWhichCI: nameOfCI,
+                                                                       m.runWhichTerrain: terrainName, m.trialNumber: trialNumber, m.numImaginaryRobots: 30})
+    os.utime(os.path.join(Directories.programMetricsFolder, filename), (savedAt, savedAt))
+
+def test_savedRunLoadsAlongsideLegacyPickles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fileOps = FileOperations()
+    fileOps.createDirectoryIfNotExisting(Directories.programMetricsFolder)
+    anHourAgo = time.time() - 3600
+    saveLegacyPickle(fileOps, 2, 'DE', 'FLAT_GROUND', 0, 100.0, anHourAgo)
+    saveLegacyPickle(fileOps, 2, 'PSO', 'FLAT_GROUND', 0, 200.0, anHourAgo)
+    saveLegacyPickle(fileOps, 2, 'RANDOM', 'FLAT_GROUND', 0, 300.0, anHourAgo) #same configuration as the run saved below, which should replace it
+    analytics = ProgramAnalytics()
+    monkeypatch.setattr(analytics, 'performHypothesisTesting', lambda completionTimesByCI: None) #plots and statistics aren't under test
+    analytics.saveFinishingTime(2, 'RANDOM', 'FLAT_GROUND', 0, 30, 50.0)
+    analytics.loadProgramRunData()
+    times = {d[ProgramMetrics.runWhichCI]: d[ProgramMetrics.timeToCrossFinishLine] for d in analytics.data}
+    assert times == {'DE': 100.0, 'PSO': 200.0, 'RANDOM': 50.0}
+    analytics.loadProgramRunData() #importing again adds nothing
+    assert len(analytics.data) == 3
@@ -0,0 +1,40 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import pymunk
+from StatesAndSensors import ContactRecorder, SubstepController
+
+class BoxRobot:#just the attributes ContactRecorder.watch reads
+    def __init__(self, space, x):
+        body = pymunk.Body(1, 100); body.position = (x, 5)
+        self.chassis_shape = pymunk.Poly.create_box(body, (10, 10))
+        self.legs = []
+        space.add(body, self.chassis_shape)
+
+def createSpaceWithRobotsOnGround(numRobots):
+    space = pymunk.Space(); space.gravity = (0, -900)
+    space.add(pymunk.Segment(space.static_body, (-100, 0), (100, 0), 1))
+    return space, [BoxRobot(space, -80 + 30 * i) for i in range(numRobots)]
+
+def countCallbacksPerFrame(numRobots, substeps, monkeypatch):
+    space, robots = createSpaceWithRobotsOnGround(numRobots)
+    recorder = ContactRecorder()
+    calls = []
+    recordContact = recorder.recordContact
+    monkeypatch.setattr(recorder, 'recordContact', lambda arbiter, space, data: calls.append(1) or recordContact(arbiter, space, data))
+    recorder.watch(space, robots, includeChassis=True)
+    controller = SubstepController(substeps, substeps, False, 5)
+    numFrames = 60
+    for frame in range(numFrames): controller.step(space, 1 / 60.0, recorder)
+    return len(calls) / numFrames, recorder
+
+def test_callbacksScaleWithContactsNotSubsteps(monkeypatch):
+    assert countCallbacksPerFrame(1, 1, monkeypatch)[0] == countCallbacksPerFrame(1, 20, monkeypatch)[0] == 1
+    assert countCallbacksPerFrame(3, 20, monkeypatch)[0] == 3
+
+def test_countsHoldTheLastSubstepsContacts(monkeypatch):
+    callbacksPerFrame, recorder = countCallbacksPerFrame(2, 10, monkeypatch)
+    assert recorder.touchCounts.tolist() == [[1], [1]]
+    assert recorder.getPointCounts(0).tolist() == [2] #a box resting flat on a segment touches it at both corners
+    assert all(abs(y) < 2 for x, y in recorder.getPoints(1, 0)) #points are on the ground
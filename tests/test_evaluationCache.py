@@ -0,0 +1,49 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+from FitnessEvaluation import EvaluationCache
+from Enums import ShapeTypes, ShapeProperties, ProgramMetrics
+
+class Snapshot:#the attributes of a RobotSnapshot that the cache reads
+    def __init__(self, chassisX, chassisY=50):
+        self.bodyStates = [((chassisX, chassisY), 0.0, (0.0, 0.0), 0.0), ((chassisX + 20, chassisY - 5), 0.5, (0.0, 0.0), 0.0)]
+        self.motorRates = [0.0]
+
+TERRAIN = {ShapeTypes.RECTANGLE: [{ShapeProperties.COL: 1000, ShapeProperties.ROW: 20, ShapeProperties.WIDTH: 10, ShapeProperties.HEIGHT: 10}]}
+BOUNDARY_EDGES = ([20, 5980, 5500], [20, 980]) #walls and finish line, floor and ceiling
+
+def getKey(cache, chassisX, rates=(1.0, -1.0), numFrames=50):
+    return cache.getKey(cache.getStateKey(Snapshot(chassisX), numFrames), rates)
+
+def test_samePoseIsAHitWhereverTheTerrainAroundItIsTheSame():
+    cache = EvaluationCache(10, TERRAIN, BOUNDARY_EDGES)
+    assert getKey(cache, 300) == getKey(cache, 600) #only flat ground within the window of either
+    assert getKey(cache, 300) == getKey(cache, 300.4) #within a position quantum
+    assert getKey(cache, 300) != getKey(cache, 950) #the box is in the window
+    assert getKey(cache, 950) != getKey(cache, 960) #at a different distance from the box
+    assert getKey(cache, 5400) != getKey(cache, 5100) #the finish line is in the window
+    assert getKey(cache, 300) != getKey(cache, 300, rates=(1.0, 1.0))
+    assert getKey(cache, 300) != getKey(cache, 300, numFrames=60)
+
+def test_leastRecentlyUsedEntryIsEvicted():
+    cache = EvaluationCache(2, TERRAIN, BOUNDARY_EDGES)
+    keys = [getKey(cache, 300, rates=(rate, rate)) for rate in (1.0, 2.0, 3.0)]
+    cache.add(keys[0], (1, 0), 1.0); cache.add(keys[1], (2, 0), 2.0)
+    assert cache.get(keys[0]) == ((1, 0), 1.0) #now the most recently used
+    cache.add(keys[2], (3, 0), 3.0)
+    assert cache.get(keys[1]) == None and cache.get(keys[0]) != None and cache.get(keys[2]) != None
+    assert cache.evictions == 1 and len(cache.entries) == 2
+    assert cache.getMetrics()[ProgramMetrics.evaluationCacheHits] == 3
+
+def test_entryIsResimulatedUntilItHasMinSamples():
+    cache = EvaluationCache(10, TERRAIN, BOUNDARY_EDGES, minSamples=2)
+    key = getKey(cache, 300)
+    cache.add(key, (10, 0), 10.0)
+    assert cache.get(key) == None
+    assert cache.getMeanFitnessVariance() == None
+    cache.add(key, (12, 2), 12.0)
+    assert cache.get(key) == ((11, 1), 11.0)
+    assert cache.getFitnessVariance(key) == 2.0
+    metrics = cache.getMetrics()
+    assert metrics[ProgramMetrics.evaluationCacheMeanSamples] == 2 and metrics[ProgramMetrics.evaluationCacheMeanFitnessVariance] == 2.0
@@ -0,0 +1,25 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import time
+from Instrumentation import PhaseTimers
+from Enums import RunStep
+
+def test_iterationsAreBucketedPerRunStep(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(time, 'perf_counter', lambda: clock[0])
+    timers = PhaseTimers()
+    for iterationSeconds, runStep in [(0.003, RunStep.IMAGINARY_GENERATION), (0.003, RunStep.IMAGINARY_GENERATION), (0.2, RunStep.IMAGINARY_GENERATION), (0.0004, RunStep.REAL_MOTOR_EXEC)]:
+        timers.begin()
+        clock[0] += iterationSeconds
+        timers.lap(PhaseTimers.PHYSICS)
+        timers.endIteration(runStep)
+    summary = timers.getSummary()
+    edges = summary['phaseHistogramEdgesMs']
+    imagined = summary['runStepHistograms']['IMAGINARY_GENERATION']
+    assert imagined[edges.index(5)] == 2 #3 ms is under the 5 ms edge
+    assert imagined[edges.index(500)] == 1
+    assert sum(imagined) == summary['runStepIterations']['IMAGINARY_GENERATION'] == 3
+    assert summary['runStepHistograms']['REAL_MOTOR_EXEC'][edges.index(0.5)] == 1
+    assert summary['phaseHistograms'][PhaseTimers.PHYSICS] == [a + b for a, b in zip(imagined, summary['runStepHistograms']['REAL_MOTOR_EXEC'])] #one phase per iteration here
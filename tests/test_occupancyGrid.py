@@ -0,0 +1,35 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+from StatesAndSensors import OccupancyGrid
+
+def test_markPointsReturnsOnlyNewPointsInsideTheWorld():
+    grid = OccupancyGrid(100, 50)
+    assert sorted(grid.markPoints([(3, 4), (3, 4), (70, 20), (-1, 5), (100, 0), (5, 50)])) == [(3, 4), (70, 20)]
+    assert grid.markPoints([(3, 4), (10, 10)]) == [(10, 10)]
+    assert grid.markPoints([]) == [] and grid.numOccupied == 3
+    assert grid.isOccupied(3, 4) and not grid.isOccupied(4, 4) and not grid.isOccupied(-1, 5)
+
+def test_coarserLevelsMarkTheCellsHoldingSensedPoints():
+    grid = OccupancyGrid(100, 50, cellSizes=(4, 16))
+    grid.markPoints([(17, 33)])
+    assert grid.cellSizes == [1, 4, 16]
+    assert grid.getLevel(4).shape == (25, 13) and grid.getLevel(4)[4, 8] == 1 and grid.getLevel(4).sum() == 1
+    assert grid.getLevel(16)[1, 2] == 1 and grid.getLevel(16).sum() == 1
+    assert grid.getOccupiedPoints(16).tolist() == [[16, 32]]
+
+def test_regionQueriesAtEachResolution():
+    grid = OccupancyGrid(100, 50, cellSizes=(4,))
+    grid.markPoints([(17, 33)])
+    assert grid.isRegionOccupied(10, 30, 18, 34) and not grid.isRegionOccupied(0, 0, 17, 50)
+    assert grid.isRegionOccupied(0, 0, 17, 50, cellSize=4) #the cell from x=16 holds the point, so the coarse check includes it
+    assert not grid.isRegionOccupied(20, 0, 200, 200, cellSize=4)
+    assert grid.isRegionOccupied(-50, -50, 200, 200)
+
+def test_clearForgetsEveryLevel():
+    grid = OccupancyGrid(100, 50)
+    grid.markPoints([(17, 33), (90, 1)])
+    grid.clear()
+    assert grid.numOccupied == 0 and all(grid.getLevel(s).sum() == 0 for s in grid.cellSizes)
+    assert grid.markPoints([(17, 33)]) == [(17, 33)]
@@ -0,0 +1,75 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import random
+import numpy as np
+import pymunk
+from WalkingRobot import RobotBody, RobotStateBuffer
+from ComputationalIntelligence import PopulationEngine, RandomBest, SimpleDE, SimplePSO
+from Enums import MainProgramParameters, Constants
+
+def createWalkedRobots(numRobots, useStateBuffer):#robots that walked one generation on random rates, so their fitnesses differ
+    random.seed(7)
+    space = pymunk.Space(); space.gravity = (0, -900)
+    ground = pymunk.Segment(space.static_body, (0, 10), (50000, 10), 5); ground.friction = 1
+    space.add(ground)
+    robots = [RobotBody(space, (100 + 200 * i, 60), MainProgramParameters.LEGS, 30) for i in range(numRobots)]
+    for frame in range(30): space.step(1 / 60.0) #settle
+    for robo in robots: robo.setRandomLegMotorRates(); robo.saveGenStartPos()
+    if useStateBuffer: RobotStateBuffer(robots)
+    for robo in robots: robo.startMotion()
+    for frame in range(120): space.step(1 / 60.0)
+    return robots
+
+def test_pullAndPushWithAndWithoutTheStateBuffer():
+    for useStateBuffer in (False, True):
+        robots = createWalkedRobots(4, useStateBuffer)
+        pop = PopulationEngine(robots)
+        assert (pop.stateBuffer != None) == useStateBuffer
+        pop.pull()
+        assert pop.fitnesses.tolist() == [robo.getFitness() for robo in robots]
+        assert pop.rates.tolist() == [list(robo.getLegMotorRates()) for robo in robots]
+        pop.rates[:] = np.arange(16).reshape(4, 4)
+        pop.push(np.array([False, True, False, True]))
+        assert [list(robo.getLegMotorRates()) for robo in robots][1::2] == [[4, 5, 6, 7], [12, 13, 14, 15]]
+        assert list(robots[0].getLegMotorRates()) != [0, 1, 2, 3]
+
+def test_findFittestKeepsThePreviousFittestOnTies():
+    pop = PopulationEngine(createWalkedRobots(4, False))
+    pop.fitnesses = np.array([1.0, 3.0, 3.0, 2.0])
+    assert pop.findFittest(Constants.UNDETERMINED) == 1 and pop.findFittest(2) == 2
+    pop.fitnesses = np.zeros(4)
+    assert pop.findFittest(Constants.UNDETERMINED) == Constants.UNDETERMINED
+    assert pop.othersThan(2).tolist() == [True, True, False, True] and pop.othersThan(Constants.UNDETERMINED).all()
+
+def test_randomRatesAndDonorsAreValid():
+    pop = PopulationEngine(createWalkedRobots(5, False))
+    rates = pop.randomRates(200)
+    for leg in range(pop.numLegs): assert set(rates[:, leg]) <= set(pop.rateRanges[leg])
+    for trial in range(50):
+        donors = pop.chooseOtherRobots(3)
+        for i in range(pop.numRobots): assert len(set(donors[i]) | {i}) == 4 #three distinct robots, none of them robot i
+
+def test_eachCIKeepsTheFittestAndStaysWithinTheRateBounds():
+    for CI in (RandomBest, SimpleDE, SimplePSO):
+        robots = createWalkedRobots(6, True)
+        ci = CI(robots)
+        ratesBefore = [list(robo.getLegMotorRates()) for robo in robots]
+        ci.run()
+        fittest = ci.getFittestRobot()
+        assert fittest == int(np.argmax([robo.getFitness() for robo in robots]))
+        assert list(robots[fittest].getLegMotorRates()) == ratesBefore[fittest]
+        minRate, maxRate = robots[0].getMinMaxLegRates()
+        assert all(minRate <= rate <= maxRate for robo in robots for rate in robo.getLegMotorRates())
+
+def test_theStateBufferDoesNotChangeTheCIsChoices():
+    for CI in (RandomBest, SimpleDE, SimplePSO):
+        chosenRates = []
+        for useStateBuffer in (False, True):
+            robots = createWalkedRobots(6, useStateBuffer)
+            random.seed(11) #seeds the CI's generator
+            ci = CI(robots)
+            for gen in range(3): ci.run()
+            chosenRates.append([list(robo.getLegMotorRates()) for robo in robots])
+        assert chosenRates[0] == chosenRates[1]
@@ -0,0 +1,45 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import random
+import pymunk
+from WalkingRobot import RobotBody, RobotPool
+from Enums import MainProgramParameters
+
+def createSpace():
+    space = pymunk.Space(); space.gravity = (0, -900)
+    ground = pymunk.Segment(space.static_body, (-1000, 300), (1000, 300), 5); ground.friction = 20
+    space.add(ground)
+    return space
+
+def walk(robots, space, numFrames):
+    for robo in robots: robo.startMotion()
+    for frame in range(numFrames): space.step(1 / 50.0)
+    return [tuple(body.position) for robo in robots for body in robo.getBodies()]
+
+def acquireRobots(pool, space):
+    return [pool.acquire(space, (100 + 60 * i, 330), MainProgramParameters.LEGS, 50) for i in range(3)]
+
+def test_pooledRobotsMoveExactlyLikeNewOnes():
+    random.seed(3)
+    newRobots = acquireRobots(RobotPool(3), createSpace())
+    expected = walk(newRobots, newRobots[0].space, 300)
+    pool = RobotPool(3)
+    random.seed(1)
+    usedRobots = acquireRobots(pool, createSpace())
+    walk(usedRobots, usedRobots[0].space, 200) #leaves velocities, sleep timers and joint impulses behind
+    for robo in usedRobots: pool.release(robo)
+    random.seed(3)
+    reusedRobots = acquireRobots(pool, createSpace())
+    assert reusedRobots == usedRobots and pool.numReused == 3
+    assert walk(reusedRobots, reusedRobots[0].space, 300) == expected
+
+def test_poolKeepsAtMostMaxRobots():
+    pool = RobotPool(2)
+    space = createSpace()
+    robots = acquireRobots(pool, space)
+    for robo in robots: pool.release(robo)
+    assert pool.numPooled == 2 and len(space.shapes) == 1 and len(space.constraints) == 0 #only the ground is left
+    acquireRobots(pool, space)
+    assert pool.numReused == 2 and pool.numCreated == 4
@@ -0,0 +1,49 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import pickle
+import random
+import pymunk
+from WalkingRobot import RobotPool, restoreSnapshotToRobots
+from Enums import MainProgramParameters
+
+def createSpace():
+    space = pymunk.Space(); space.gravity = (0, -900)
+    ground = pymunk.Segment(space.static_body, (-1000, 300), (1000, 300), 5); ground.friction = 20
+    space.add(ground)
+    return space
+
+def getState(robo):
+    return [(tuple(b.position), b.angle, tuple(b.velocity), b.angular_velocity) for b in robo.getBodies()] + [leg.motor.rate for leg in robo.legs]
+
+def test_restoringASnapshotGivesTheExactState():
+    random.seed(3)
+    space = createSpace()
+    robo = RobotPool(1).acquire(space, (100, 330), MainProgramParameters.LEGS, 50)
+    robo.startMotion()
+    for frame in range(100): space.step(1 / 50.0)
+    snapshot = pickle.loads(pickle.dumps(robo.takeSnapshot())) #as sent to an evaluation worker
+    expected = getState(robo)
+    robo.setRandomLegMotorRates(); robo.startMotion()
+    for frame in range(50): space.step(1 / 50.0)
+    assert getState(robo) != expected
+    robo.restoreSnapshot(snapshot)
+    assert getState(robo) == expected and robo.obj_body.startPosition == robo.obj_body.position
+
+def test_restoringWithAnOffsetMovesEveryRobotTogether():
+    random.seed(3)
+    space = createSpace()
+    robo = RobotPool(1).acquire(space, (100, 330), MainProgramParameters.LEGS, 50)
+    robo.startMotion()
+    for frame in range(100): space.step(1 / 50.0)
+    snapshot = robo.takeSnapshot()
+    otherSpace = createSpace()
+    others = [RobotPool(2).acquire(otherSpace, (400, 330), MainProgramParameters.LEGS, 50) for i in range(2)]
+    restoreSnapshotToRobots(snapshot, others, (10, -500))
+    for other in others:
+        for (pos, angle, vel, angularVel), body in zip(snapshot.bodyStates, other.getBodies()):
+            assert tuple(body.position) == (pos[0] + 10, pos[1] - 500)
+            assert (body.angle, tuple(body.velocity), body.angular_velocity) == (angle, vel, angularVel)
+        assert [leg.motor.rate for leg in other.legs] == snapshot.motorRates
+        assert other.obj_body.startPosition == other.obj_body.position
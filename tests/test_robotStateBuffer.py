@@ -0,0 +1,43 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import random
+import pymunk
+from WalkingRobot import RobotBody, RobotStateBuffer
+from Enums import MainProgramParameters
+
+def createRobotsOnGround(numRobots):
+    space = pymunk.Space(); space.gravity = (0, -900)
+    ground = pymunk.Segment(space.static_body, (0, 10), (5000, 10), 5); ground.friction = 1
+    space.add(ground)
+    return space, [RobotBody(space, (100 + 200 * i, 60), MainProgramParameters.LEGS, 30) for i in range(numRobots)]
+
+def runFrames(space, numFrames):
+    for frame in range(numFrames): space.step(1 / 60.0)
+
+def test_bufferMatchesEachRobotsOwnState():
+    random.seed(5)
+    space, robots = createRobotsOnGround(4)
+    runFrames(space, 30) #settle
+    for robo in robots: robo.setRandomLegMotorRates()
+    buffer = RobotStateBuffer(robots)
+    buffer.saveGenStartPositions()
+    assert [buffer.genStartPositions[i].tolist() for i in range(4)] == [list(robo.robotGenStartPos) for robo in robots]
+    buffer.startMotion()
+    assert [leg.motor.rate for leg in robots[2].legs] == list(robots[2].getLegMotorRates())
+    runFrames(space, 120)
+    buffer.refreshChassisPositions()
+    assert buffer.getFitnesses().tolist() == [robo.getFitness() for robo in robots]
+    assert buffer.getDisplacements()[1].tolist() == list(robots[1].getPosition() - robots[1].robotGenStartPos)
+    buffer.stopMotion()
+    assert all(leg.motor.rate == 0 for robo in robots for leg in robo.legs)
+
+def test_robotsRatesAreRowsOfTheBuffer():
+    random.seed(5)
+    space, robots = createRobotsOnGround(3)
+    buffer = RobotStateBuffer(robots)
+    robots[1].setLegMotorRates([1, 2, 3, 4])
+    assert buffer.motorRates[1].tolist() == [1, 2, 3, 4]
+    buffer.motorRates[2] = [-1, -2, -3, -4]
+    assert list(robots[2].getLegMotorRates()) == [-1, -2, -3, -4]
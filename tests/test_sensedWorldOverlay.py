@@ -0,0 +1,20 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import pygame
+from Rendering import SensedWorldOverlay
+from StatesAndSensors import OccupancyGrid
+
+def drawOverlay(showPoints):
+    grid = OccupancyGrid(300, 300)
+    grid.markPoints([(10, 10)])
+    overlay = SensedWorldOverlay(grid, 0)
+    overlay.showPoints = showPoints
+    surface = pygame.Surface((200, 200))
+    overlay.draw(surface, None, (0, 0)) #no markers, so no draw options are needed
+    return surface.get_at((10, 190))[:3] #pymunk draws with positive y up
+
+def test_sensedPointsAreDrawnOnlyWhenShown():
+    assert drawOverlay(True) == (200, 200, 200)
+    assert drawOverlay(False) == (0, 0, 0)
@@ -0,0 +1,31 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import os
+import random
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+from Worlds import ImaginationTwin
+from Instrumentation import TraceRecorder
+from Enums import MainProgramParameters, RunCI, Terrains
+
+def getFramesOfRunStep(useFitnessEvaluator, runStepName, monkeypatch):#physics frames at which each span of runStepName began, in one epoch's worth of run
+    monkeypatch.setattr(MainProgramParameters, 'NUM_EVALUATION_WORKERS', 0)
+    monkeypatch.setattr(MainProgramParameters, 'EVALUATION_CACHE_SIZE', 1000 if useFitnessEvaluator else 0) #the evaluator runs in this process when there are no workers
+    random.seed(3)
+    world = ImaginationTwin(MainProgramParameters.LEGS, RunCI.RANDOM, Terrains.FLAT_GROUND, None)
+    world.headless = True; world.saveResults = False; world.numImaginaryRobots = 5
+    world.initialize()
+    world.trace = TraceRecorder(enabled=True)
+    epochFrames = world.genStateImagined.maxGens * (world.moveMotorsStateImagined.maxDuration + 1)
+    world.runWorld(3 * epochFrames)
+    frames = [e['args']['physicsFrame'] for e in world.trace.events if e.get('ph') == 'B' and e['name'] == runStepName and e['pid'] == TraceRecorder.WALL_CLOCK_PID]
+    world.delete()
+    return frames
+
+def test_epochTakesTheSameSimulatedTimeWithTheFitnessEvaluator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) #the world saves its trace into the working directory
+    framesInImaginationSpace = getFramesOfRunStep(False, 'REAL_MOTOR_EXEC', monkeypatch)
+    framesInFitnessEvaluator = getFramesOfRunStep(True, 'REAL_MOTOR_EXEC', monkeypatch)
+    assert len(framesInImaginationSpace) > 0
+    assert framesInFitnessEvaluator[:len(framesInImaginationSpace)] == framesInImaginationSpace #every epoch both runs reached began at the same frame
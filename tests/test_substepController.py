@@ -0,0 +1,36 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import pymunk
+from StatesAndSensors import SubstepController
+
+def createSpaceWithBox(position, velocity=(0, 0)):
+    space = pymunk.Space(); space.gravity = (0, 0)
+    ground = pymunk.Segment(space.static_body, (-1000, 0), (1000, 0), 5)
+    body = pymunk.Body(1, pymunk.moment_for_box(1, (10, 10))); body.position = position; body.velocity = velocity
+    space.add(ground, body, pymunk.Poly.create_box(body, (10, 10)))
+    return space
+
+def test_fixedSubstepsUnlessAdaptive():
+    controller = SubstepController(10, 4, False, 5)
+    assert controller.step(createSpaceWithBox((0, 100), (5000, 0)), 1 / 50.0) == 10
+    assert controller.step(pymunk.Space(), 1 / 50.0) == 10
+
+def test_adaptiveSubstepsFollowSpeedAndContacts():
+    controller = SubstepController(10, 4, True, 5, decideEveryNFrames=1)
+    assert controller.step(pymunk.Space(), 1 / 50.0) == 4 #nothing dynamic to solve
+    assert controller.step(createSpaceWithBox((0, 100)), 1 / 50.0) == 4 #still, and touching nothing
+    assert controller.step(createSpaceWithBox((0, 100), (150, 0)), 1 / 50.0) == 4 #3 pixels a frame needs 3 sub-steps, under the floor
+    assert controller.step(createSpaceWithBox((0, 100), (350, 0)), 1 / 50.0) == 7
+    assert controller.step(createSpaceWithBox((0, 100), (5000, 0)), 1 / 50.0) == 10
+    touching = createSpaceWithBox((0, 9)) #overlaps the ground
+    controller.step(touching, 1 / 50.0)
+    assert controller.touchingPairs[touching] == 1 and controller.step(touching, 1 / 50.0) == 8 #one pair for one body adds substepsPerContact
+
+def test_decisionIsReusedForDecideEveryNFrames():
+    controller = SubstepController(10, 4, True, 5, decideEveryNFrames=3)
+    space = createSpaceWithBox((0, 100))
+    assert controller.step(space, 1 / 50.0) == 4 #the first frame decides
+    space.bodies[0].velocity = (5000, 0)
+    assert [controller.step(space, 1 / 50.0) for frame in range(3)] == [4, 4, 10]
@@ -0,0 +1,58 @@
+# Author: Navin Ipe
+# Created: October 2026
+# License: Proprietary. No part of this code may be copied or used in any form without the permission of the author
+
+import numpy as np
+from TerrainCompiler import TerrainCompiler
+from Enums import ShapeTypes, ShapeProperties
+
+def box(x0, y0, x1, y1):
+    return TerrainCompiler().getRectangle(x0, y0, x1, y1)
+
+def circle(x, y, radius):
+    return {ShapeProperties.COL: x, ShapeProperties.ROW: y, ShapeProperties.WIDTH: radius}
+
+def getCoverage(rectangles):#how many rectangles cover each unit square of a 100 x 100 area. The test rectangles have integer edges
+    coverage = np.zeros((100, 100), dtype=int)
+    for r in rectangles:
+        x0, y0, x1, y1 = [int(round(v)) for v in TerrainCompiler().getBounds(r)]
+        coverage[x0:x1, y0:y1] += 1
+    return coverage
+
+STAIRCASE = [box(0, 0, 10, 10), box(10, 0, 20, 20), box(20, 0, 30, 30), box(30, 0, 40, 20), box(40, 0, 50, 10)]
+OVERLAPPING = [box(0, 0, 40, 10), box(5, 2, 15, 8), box(30, 0, 60, 10), box(50, 5, 55, 30)]
+
+def test_everyDecompositionCoversTheSameArea():
+    for rectangles in (STAIRCASE, OVERLAPPING):
+        compiler = TerrainCompiler()
+        covered = getCoverage(rectangles) > 0
+        assert (getCoverage(compiler.compileRectangles(rectangles)) > 0).tolist() == covered.tolist()
+        xs = np.unique([b for r in rectangles for b in compiler.getBounds(r)[0::2]])
+        ys = np.unique([b for r in rectangles for b in compiler.getBounds(r)[1::2]])
+        cells = np.zeros((len(xs) - 1, len(ys) - 1), dtype=bool)
+        for r in rectangles:
+            x0, y0, x1, y1 = compiler.getBounds(r)
+            cells[np.searchsorted(xs, x0):np.searchsorted(xs, x1), np.searchsorted(ys, y0):np.searchsorted(ys, y1)] = True
+        for decomposed in (compiler.decompose(cells, xs, ys), [compiler.transpose(r) for r in compiler.decompose(cells.T, ys, xs)]):
+            assert getCoverage(decomposed).tolist() == covered.astype(int).tolist() #disjoint, and nothing missing
+
+def test_pickingTheFewestRectangles():
+    compiler = TerrainCompiler()
+    assert len(compiler.compileRectangles(STAIRCASE)) == 3 and compiler.rectangleMethod == TerrainCompiler.ROWS #the staircase is 3 horizontal runs
+    tower = [box(0, 0, 10, 10), box(0, 10, 10, 20), box(0, 20, 10, 30)]
+    assert compiler.compileRectangles(tower) == [box(0, 0, 10, 30)]
+    nested = [box(0, 0, 50, 50), box(10, 10, 20, 20)]
+    assert compiler.compileRectangles(nested) == [box(0, 0, 50, 50)] and compiler.rectangleMethod == TerrainCompiler.PRUNED
+
+def test_circlesInsideBiggerCirclesAreDropped():
+    circles = [circle(0, 0, 10), circle(3, 4, 5), circle(8, 0, 5), circle(50, 50, 1)]
+    assert TerrainCompiler().compileCircles(circles) == [circles[0], circles[2], circles[3]] #(8, 0) pokes out of the big circle
+
+def test_compileCountsShapesAndLeavesTheInputUntouched():
+    terrainObjects = {ShapeTypes.RECTANGLE: list(OVERLAPPING), ShapeTypes.CIRCLE: [circle(0, 0, 10), circle(1, 1, 2)]}
+    compiler = TerrainCompiler()
+    compiled = compiler.compile(terrainObjects)
+    assert len(terrainObjects[ShapeTypes.RECTANGLE]) == 4 and len(terrainObjects[ShapeTypes.CIRCLE]) == 2
+    assert compiler.inputShapes == 6 and compiler.outputShapes == len(compiled[ShapeTypes.RECTANGLE]) + 1
+    assert compiler.outputShapes < compiler.inputShapes
+    assert compiler.compile(None) == None and compiler.inputShapes == 0